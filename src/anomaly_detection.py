@@ -3,36 +3,70 @@ import cv2
 from shapely.geometry import Point, Polygon
 from collections import deque
 from utils import config
+from utils.geometry import feet_points
+from src.queue_length import QueueEstimator
+from src.world_kalman import WorldKalman
 
 class AnomalyDetector:
-    def __init__(self):
+    def __init__(self, settings=config, scene=None):
         """
         Initializes the Anomaly Detector.
+        Args:
+            settings: Scene settings (utils.config or a config.scene_settings() copy).
+            scene (SceneBundle): Compiled scene; its zone label map replaces the forbidden zone polygon tests.
         """
-        # Store recent positions to calculate speed: {track_id: deque([(x, y), ...])}
+        self.settings = settings
+        self.scene = scene
+        # Store recent positions to calculate speed: {track_id: deque([(x, y, t), ...])}
+        # t is the frame timestamp in seconds, so dropped / skipped frames don't distort speeds
         self.track_history = {} 
+        self.frames_analyzed = 0
         
         self.forbidden_zones = {}
-        for zone_id, poly_coords in config.FORBIDDEN_ZONES.items():
+        for zone_id, poly_coords in ({} if scene is not None else self.settings.FORBIDDEN_ZONES).items():
             self.forbidden_zones[zone_id] = Polygon(poly_coords) 
 
         # Stats for dynamic thresholds: { lane_id: {'speeds': [], 'vectors': []} }
         self.lane_stats = {}
 
+        # Per-lane queue lengths (m) and CONGESTION alerts
+        self.queues = QueueEstimator(settings, scene)
+
+        # Smoothed world position / velocity per track (SPEED_ESTIMATOR = "kalman")
+        self.kalman = WorldKalman(settings) if settings.SPEED_ESTIMATOR == "kalman" else None
 
-    def analyze(self, detections, lane_assignments):
+
+    def analyze(self, detections, lane_assignments, timestamp=None):
         """
         Detects anomalies in the current frame.
         Args:
             detections (sv.Detections): Current tracked detections.
             lane_assignments (dict): Current lane assignments.
+            timestamp (float): Capture time of the frame in seconds. Defaults to frames analyzed / FPS.
         Returns:
             list: List of anomalies [{'type': 'SPEEDING', 'id': int, 'value': float, 'bbox': list}, ...]
         """
         anomalies = []
+
+        if timestamp is None:
+            timestamp = self.frames_analyzed / self.settings.FPS
+        self.frames_analyzed += 1
         
         if detections.tracker_id is None:
-            return anomalies
+            anomalies.extend(self.queues.update(np.zeros((0, 2)), np.zeros(0, dtype=np.int64), np.zeros(0), np.zeros(0, dtype=bool), timestamp))
+            return anomalies, {}
+
+        feet = feet_points(detections.xyxy)
+        if self.scene is not None:
+            zone_labels = self.scene.lookup(self.scene.zone_map, feet)
+
+        # Per-track inputs of the queue estimation, filled in the loop below (speeds up front with the Kalman filter)
+        lanes = np.full(len(detections), -1, dtype=np.int64)
+        if self.kalman is not None:
+            speeds, speed_known = self.kalman.update(detections.tracker_id, feet, timestamp)
+        else:
+            speeds = np.zeros(len(detections))
+            speed_known = np.zeros(len(detections), dtype=bool)
 
         for i, tracker_id in enumerate(detections.tracker_id):
             tid = int(tracker_id)
@@ -42,30 +76,37 @@ class AnomalyDetector:
             x1, y1, x2, y2 = bbox
             center_x = (x1 + x2) / 2
             center_y = (y1 + y2) / 2
-            current_pos = (center_x, center_y)
+            current_pos = (center_x, center_y, timestamp)
 
             # --- Update History ---
             if tid not in self.track_history:
-                self.track_history[tid] = deque(maxlen=config.SPEED_HISTORY_WINDOW)
+                self.track_history[tid] = deque(maxlen=self.settings.SPEED_HISTORY_WINDOW)
             self.track_history[tid].append(current_pos)
 
             # --- 1. Speed Detection (Absolute & Relative) ---
             strength = 0.0
             is_speeding = False
-            speed_kmh = self._calculate_speed(tid)
+            if self.kalman is not None:
+                speed_kmh = float(speeds[i]) if speed_known[i] else 0.0
+            else:
+                speed_kmh = self._calculate_speed(tid)
+                speeds[i] = speed_kmh
+                speed_known[i] = len(self.track_history[tid]) >= self.settings.SPEED_HISTORY_WINDOW // 2
             
             # A) Absolute Threshold
-            if speed_kmh > config.SPEED_THRESHOLD:
+            if speed_kmh > self.settings.SPEED_THRESHOLD:
                 is_speeding = True
                 strength = speed_kmh
             
-            # B) Relative Threshold (> 1.3x Lane Average)
+            # B) Relative Threshold (> RELATIVE_SPEED_FACTOR x Lane Average)
             current_lane = lane_assignments.get(tid, {}).get('current_lane')
             avg_lane_speed = self._get_lane_avg_speed(current_lane)
+            if current_lane is not None:
+                lanes[i] = current_lane
             
             # Only apply relative check if the car is moving significantly (e.g. > 30km/h)
             # This prevents flagging slow cars just because the average is also very slow.
-            if avg_lane_speed > 0 and speed_kmh > 30 and speed_kmh > 1.3 * avg_lane_speed:
+            if avg_lane_speed > 0 and speed_kmh > self.settings.RELATIVE_SPEED_MIN and speed_kmh > self.settings.RELATIVE_SPEED_FACTOR * avg_lane_speed:
                 is_speeding = True
                 strength = max(strength, speed_kmh) # Keep the speed value
             
@@ -83,7 +124,7 @@ class AnomalyDetector:
 
 
             # --- 2. Pedestrian in Road ---
-            if class_id == config.PEDESTRIAN_CLASS_ID:
+            if class_id == self.settings.PEDESTRIAN_CLASS_ID:
                 # Check if the pedestrian is inside any defined lane
                 # We can check if they have been assigned a lane
                 assignment = lane_assignments.get(tid)
@@ -98,6 +139,13 @@ class AnomalyDetector:
             # --- 3. Forbidden Zones ---
             # Check if vehicle center is in a forbidden zone
             # (pedestrians or cars)
+            if self.scene is not None and zone_labels[i] >= 0:
+                anomalies.append({
+                    'type': 'FORBIDDEN_ZONE',
+                    'id': tid,
+                    'value': f"Zone {int(zone_labels[i])}",
+                    'bbox': bbox
+                })
             point = Point(center_x, y2) # Use bottom center (feet)
             for zone_id, poly in self.forbidden_zones.items():
                 if poly.contains(point):
@@ -119,13 +167,13 @@ class AnomalyDetector:
                     
                     # Check against dominant flow
                     # Warm-up: Only check if we have enough samples to be sure of the direction
-                    if len(self.lane_stats[current_lane]['vectors']) > 20: 
+                    if len(self.lane_stats[current_lane]['vectors']) > self.settings.WRONG_DIRECTION_MIN_SAMPLES: 
                         dominant_vector = self._get_lane_dominant_vector(current_lane)
                         if dominant_vector is not None:
                             # Cosine similarity
                             dot_prod = np.dot(motion_vector, dominant_vector)
                             # cos(150 deg) approx -0.866
-                            if dot_prod < -0.86: 
+                            if dot_prod < self.settings.WRONG_DIRECTION_COSINE: 
                                 anomalies.append({
                                     'type': 'WRONG_DIRECTION',
                                     'id': tid,
@@ -133,28 +181,38 @@ class AnomalyDetector:
                                     'bbox': bbox
                                 })
 
-        
-        current_speeds = {tid: self._calculate_speed(tid) for tid in detections.tracker_id} if detections.tracker_id is not None else {}
+
+        # --- 5. Congestion (all lanes at once) ---
+        anomalies.extend(self.queues.update(feet, lanes, speeds, speed_known, timestamp, self.scene))
+
+        current_speeds = {tid: float(speed) if known else 0.0 for tid, speed, known in zip(detections.tracker_id, speeds, speed_known)}
         return anomalies, current_speeds
 
+    def end_track(self, tid):
+        """Drops the per-track state (position history, Kalman filter row) of a track the tracker has ended."""
+        self.track_history.pop(int(tid), None)
+        if self.kalman is not None:
+            self.kalman.end_track(tid)
+
     def _calculate_speed(self, tid):
         """
         Calculates speed in km/h based on regression over history.
         """
         history = self.track_history[tid]
-        if len(history) < config.SPEED_HISTORY_WINDOW // 2: # Wait for at least half window
+        if len(history) < self.settings.SPEED_HISTORY_WINDOW // 2: # Wait for at least half window
             return 0.0
         
         # Convert history dequqe to list of points
-        points = np.array(history)
+        samples = np.array(history)
+        points, sample_times = samples[:, :2], samples[:, 2]
         
         # Map to World Coordinates
-        if config.HOMOGRAPHY_MATRIX is not None:
-            world_points = np.array([self._apply_homography(p, config.HOMOGRAPHY_MATRIX) for p in points])
+        if self.settings.HOMOGRAPHY_MATRIX is not None:
+            world_points = np.array([self._apply_homography(p, self.settings.HOMOGRAPHY_MATRIX) for p in points])
         else:
             # Simple scaling assumption (less accurate)
             # Center everything at 0,0 to avoid huge numbers
-            world_points = points * config.CAMERA_CALIBRATION_FACTOR
+            world_points = points * self.settings.CAMERA_CALIBRATION_FACTOR
             
         # We need to regress Distance vs Time.
         # Since vehicles move in 2D, we can approximate "distance traveled" 
@@ -165,16 +223,15 @@ class AnomalyDetector:
         start_point = world_points[0]
         distances = np.linalg.norm(world_points - start_point, axis=1) # [0, d1, d2, ...]
         
-        # Time points (seconds)
-        # 0, 1/FPS, 2/FPS...
+        # Time points (seconds) relative to the first sample
         num_points = len(distances)
-        times = np.arange(num_points) / config.FPS
+        times = sample_times - sample_times[0]
         
         # Linear Regression: Distance = Speed * Time + c
         # Use np.polyfit(times, distances, 1) -> Returns [slope, intercept]
         # slope is Speed in meters/second
         
-        if num_points < 2:
+        if num_points < 2 or times[-1] <= 0:
             return 0.0
             
         slope, intercept = np.polyfit(times, distances, 1)
@@ -202,17 +259,17 @@ class AnomalyDetector:
     def _get_motion_vector(self, tid):
         """Returns normalized motion vector (dx, dy) based on history or None if not moving."""
         history = self.track_history[tid]
-        if len(history) < config.SPEED_HISTORY_WINDOW // 4:
+        if len(history) < self.settings.SPEED_HISTORY_WINDOW // 4:
             return None
             
         # Use first and last point of window
-        p_start = np.array(history[0])
-        p_end = np.array(history[-1])
+        p_start = np.array(history[0][:2])
+        p_end = np.array(history[-1][:2])
         
         # Determine vector in World Coordinates if possible
-        if config.HOMOGRAPHY_MATRIX is not None:
-            p_start = self._apply_homography(p_start, config.HOMOGRAPHY_MATRIX)
-            p_end = self._apply_homography(p_end, config.HOMOGRAPHY_MATRIX)
+        if self.settings.HOMOGRAPHY_MATRIX is not None:
+            p_start = self._apply_homography(p_start, self.settings.HOMOGRAPHY_MATRIX)
+            p_end = self._apply_homography(p_end, self.settings.HOMOGRAPHY_MATRIX)
             
         vec = p_end - p_start
         norm = np.linalg.norm(vec)
@@ -0,0 +1,319 @@
+import lap
+import numpy as np
+import supervision as sv
+
+from utils.geometry import box_iou_batch
+
+# Track states (a removed track stays one frame in the lost list, like in the reference ByteTrack)
+TRACKED, LOST, REMOVED = 1, 2, 3
+LOW_SCORE_THRESH = 0.1 # Detections between this and the activation threshold only extend existing tracks
+
+# Constant-velocity Kalman filter on (center x, center y, aspect ratio, height) and their velocities
+STD_WEIGHT_POSITION = 1.0 / 20
+STD_WEIGHT_VELOCITY = 1.0 / 160
+MOTION = np.eye(8)
+MOTION[:4, 4:] = np.eye(4)
+DIAGONAL = np.arange(8)
+
+def kalman_initiate(xyah):
+    """(K, 4) measurements -> (K, 8) means and (K, 8, 8) covariances of new tracks."""
+    height = xyah[:, 3]
+    position = (2 * STD_WEIGHT_POSITION * height).astype(np.float64)
+    velocity = (10 * STD_WEIGHT_VELOCITY * height).astype(np.float64)
+    mean = np.zeros((len(xyah), 8))
+    mean[:, :4] = xyah
+    std = np.column_stack([position, position, np.full_like(position, 1e-2), position,
+                           velocity, velocity, np.full_like(position, 1e-5), velocity])
+    covariance = np.zeros((len(xyah), 8, 8))
+    covariance[:, DIAGONAL, DIAGONAL] = std ** 2
+    return mean, covariance
+
+def kalman_predict(mean, covariance):
+    """One time step for a stack of tracks."""
+    height = mean[:, 3]
+    position, velocity = STD_WEIGHT_POSITION * height, STD_WEIGHT_VELOCITY * height
+    std = np.column_stack([position, position, np.full_like(height, 1e-2), position,
+                           velocity, velocity, np.full_like(height, 1e-5), velocity])
+    mean = mean @ MOTION.T
+    covariance = MOTION @ covariance @ MOTION.T
+    covariance[:, DIAGONAL, DIAGONAL] += std ** 2
+    return mean, covariance
+
+def kalman_update(mean, covariance, xyah):
+    """Correction with (K, 4) measurements; the 4x4 innovation systems are solved as one batch."""
+    height = mean[:, 3]
+    std = np.column_stack([STD_WEIGHT_POSITION * height, STD_WEIGHT_POSITION * height,
+                           np.full_like(height, 1e-1), STD_WEIGHT_POSITION * height])
+    projected_cov = covariance[:, :4, :4].copy()
+    projected_cov[:, DIAGONAL[:4], DIAGONAL[:4]] += std ** 2
+    gain = np.linalg.solve(projected_cov, covariance[:, :4, :]).transpose(0, 2, 1) # (K, 8, 4)
+    innovation = xyah - mean[:, :4]
+    mean = mean + np.einsum('kij,kj->ki', gain, innovation)
+    covariance = covariance - gain @ projected_cov @ gain.transpose(0, 2, 1)
+    return mean, covariance
+
+def state_boxes(mean):
+    """(K, 8) Kalman means -> (K, 4) [x1, y1, x2, y2] boxes."""
+    width = mean[:, 2] * mean[:, 3]
+    x1 = mean[:, 0] - width / 2
+    y1 = mean[:, 1] - mean[:, 3] / 2
+    return np.column_stack([x1, y1, x1 + width, y1 + mean[:, 3]])
+
+def iou_cost(boxes_a, boxes_b):
+    """1 - IoU as float32 (boxes rounded to float32 first, as the supervision tracker does)."""
+    ious = box_iou_batch(np.asarray(boxes_a, dtype=np.float32), np.asarray(boxes_b, dtype=np.float32))
+    return 1 - ious.astype(np.float32)
+
+def fuse_score(cost, scores):
+    """Weights the IoU similarity with the detection confidences."""
+    return 1 - (1 - cost) * np.asarray(scores, dtype=np.float32)[None, :]
+
+def linear_assignment(cost, thresh):
+    """
+    Minimum-cost matching. Costs above thresh are clipped just above it (so they never beat a valid pair) and
+    dropped after the assignment.
+    Returns:
+        tuple: ((K, 2) [row, col] matches sorted by row, unmatched rows, unmatched columns)
+    """
+    rows, cols = cost.shape
+    if cost.size == 0:
+        return np.empty((0, 2), dtype=np.int64), np.arange(rows), np.arange(cols)
+    clipped = np.minimum(cost, thresh + 1e-4).astype(np.float64)
+    _, row_to_col, _ = lap.lapjv(clipped, extend_cost=True)
+    matched_rows = np.flatnonzero(row_to_col >= 0)
+    matched_rows = matched_rows[cost[matched_rows, row_to_col[matched_rows]] <= thresh]
+    matches = np.column_stack([matched_rows, row_to_col[matched_rows]]).astype(np.int64)
+    return matches, unmatched(rows, matches[:, 0]), unmatched(cols, matches[:, 1])
+
+def unmatched(count, matched):
+    """
+    Indices in range(count) not in matched, in the iteration order of a Python set difference. That is the order
+    of the reference implementation, and it decides which new track gets the lower ID.
+    """
+    return np.array(tuple(set(range(count)) - set(matched.tolist())), dtype=np.int64)
+
+class ByteTrack:
+    def __init__(self, track_activation_threshold=0.25, lost_track_buffer=30, minimum_matching_threshold=0.8,
+                 frame_rate=30, initial_capacity=256):
+        """
+        ByteTrack with the state of all tracks in preallocated NumPy arrays (Kalman means / covariances, ids,
+        states, frame counters), indexed by slot. Prediction, IoU and the Kalman updates are batched over the
+        tracks of each association step; assignments use lap.lapjv. The association logic follows
+        supervision's ByteTrack step by step, so both give the same IDs on the same detections.
+        Each update() fills self.events with the track IDs started, lost and ended in that frame.
+        """
+        self.track_activation_threshold = track_activation_threshold
+        self.minimum_matching_threshold = minimum_matching_threshold
+        self.det_thresh = track_activation_threshold + 0.1 if track_activation_threshold + 0.1 < 1 else track_activation_threshold
+        self.max_time_lost = int(frame_rate / 30.0 * lost_track_buffer)
+        self.frame_id = 0
+        self.next_id = 1
+
+        self.mean = np.zeros((initial_capacity, 8))
+        self.covariance = np.zeros((initial_capacity, 8, 8))
+        self.state = np.zeros(initial_capacity, dtype=np.int8)
+        self.activated = np.zeros(initial_capacity, dtype=bool)
+        self.track_id = np.full(initial_capacity, -1, dtype=np.int64) # External ID (-1 until confirmed)
+        self.start_frame = np.zeros(initial_capacity, dtype=np.int64)
+        self.last_frame = np.zeros(initial_capacity, dtype=np.int64)
+        self.tracklet_len = np.zeros(initial_capacity, dtype=np.int64)
+        self.score = np.zeros(initial_capacity)
+        self.free = np.ones(initial_capacity, dtype=bool)
+
+        # Slot lists in the order of the reference implementation (the order breaks assignment ties)
+        self.tracked = np.empty(0, dtype=np.int64)
+        self.lost = np.empty(0, dtype=np.int64)
+        self.removed = np.empty(0, dtype=np.int64) # Removed in the previous frame
+        self.events = {'started': [], 'lost': [], 'ended': []}
+
+    @property
+    def tracked_tracks(self):
+        """Slots of the tracks currently followed (confirmed or not), like sv.ByteTrack.tracked_tracks."""
+        return self.tracked
+
+    def _allocate(self, count):
+        slots = np.flatnonzero(self.free)[:count]
+        if len(slots) < count:
+            self._grow(len(self.free) - len(slots) + count)
+            slots = np.flatnonzero(self.free)[:count]
+        self.free[slots] = False
+        return slots
+
+    def _grow(self, needed):
+        capacity = max(needed, 2 * len(self.free))
+        extra = capacity - len(self.free)
+        self.mean = np.concatenate([self.mean, np.zeros((extra, 8))])
+        self.covariance = np.concatenate([self.covariance, np.zeros((extra, 8, 8))])
+        self.state = np.concatenate([self.state, np.zeros(extra, dtype=np.int8)])
+        self.activated = np.concatenate([self.activated, np.zeros(extra, dtype=bool)])
+        self.track_id = np.concatenate([self.track_id, np.full(extra, -1, dtype=np.int64)])
+        self.start_frame = np.concatenate([self.start_frame, np.zeros(extra, dtype=np.int64)])
+        self.last_frame = np.concatenate([self.last_frame, np.zeros(extra, dtype=np.int64)])
+        self.tracklet_len = np.concatenate([self.tracklet_len, np.zeros(extra, dtype=np.int64)])
+        self.score = np.concatenate([self.score, np.zeros(extra)])
+        self.free = np.concatenate([self.free, np.ones(extra, dtype=bool)])
+
+    def _new_ids(self, slots):
+        ids = np.arange(self.next_id, self.next_id + len(slots))
+        self.next_id += len(slots)
+        self.track_id[slots] = ids
+        self.events['started'].extend(ids.tolist())
+
+    def _match(self, slots, det_xyah, det_scores):
+        """
+        Updates the matched tracks with their detections. Followed tracks are extended (and confirmed),
+        lost ones re-activated.
+        Returns:
+            tuple: (slots extended, slots re-activated), in match order.
+        """
+        followed = self.state[slots] == TRACKED
+        self.mean[slots], self.covariance[slots] = kalman_update(self.mean[slots], self.covariance[slots], det_xyah)
+        self.last_frame[slots] = self.frame_id
+        self.score[slots] = det_scores
+        self.state[slots] = TRACKED
+
+        extended, refound = slots[followed], slots[~followed]
+        self.tracklet_len[extended] += 1
+        self.tracklet_len[refound] = 0
+        self.activated[extended] = True
+        self._new_ids(extended[self.track_id[extended] < 0])
+        return extended, refound
+
+    def update_with_tensors(self, xyxy, scores):
+        """
+        Runs one frame of ByteTrack.
+        Args:
+            xyxy (np.ndarray): (N, 4) detection boxes.
+            scores (np.ndarray): (N,) detection confidences.
+        Returns:
+            np.ndarray: Slots of the confirmed tracks followed in this frame.
+        """
+        self.frame_id += 1
+        self.events = {'started': [], 'lost': [], 'ended': []}
+        previous = np.concatenate([self.tracked, self.lost])
+
+        xyxy = np.asarray(xyxy, dtype=np.float64).reshape(-1, 4)
+        scores = np.asarray(scores, dtype=np.float64).reshape(-1)
+        valid = np.isfinite(xyxy).all(axis=1) & np.isfinite(scores) & (xyxy[:, 2] > xyxy[:, 0]) & (xyxy[:, 3] > xyxy[:, 1])
+        xyxy, scores = xyxy[valid], scores[valid]
+
+        # Detection boxes as the reference tracker stores them: float32 (x, y, w, h)
+        tlwh = xyxy.copy()
+        tlwh[:, 2:] -= tlwh[:, :2]
+        tlwh = tlwh.astype(np.float32)
+        det_boxes = tlwh.copy()
+        det_boxes[:, 2:] += det_boxes[:, :2]
+        det_xyah = tlwh.copy()
+        det_xyah[:, :2] += det_xyah[:, 2:] / 2
+        det_xyah[:, 2] /= det_xyah[:, 3]
+
+        high = np.flatnonzero(scores >= self.track_activation_threshold)
+        low = np.flatnonzero((scores > LOW_SCORE_THRESH) & (scores < self.track_activation_threshold))
+
+        confirmed = self.activated[self.tracked]
+        unconfirmed, pool = self.tracked[~confirmed], self.tracked[confirmed]
+        pool = np.concatenate([pool, self.lost[~np.isin(self.lost, pool)]])
+        if len(pool):
+            self.mean[pool[self.state[pool] != TRACKED], 7] = 0
+            self.mean[pool], self.covariance[pool] = kalman_predict(self.mean[pool], self.covariance[pool])
+        pool_boxes = state_boxes(self.mean[pool])
+
+        # First association: all tracks vs high-confidence detections (IoU weighted by confidence)
+        cost = fuse_score(iou_cost(pool_boxes, det_boxes[high]), scores[high])
+        matches, unmatched_pool, unmatched_high = linear_assignment(cost, self.minimum_matching_threshold)
+        activated, refound = self._match(pool[matches[:, 0]], det_xyah[high[matches[:, 1]]], scores[high[matches[:, 1]]])
+        activated, refound = [activated], [refound]
+
+        # Second association: remaining followed tracks vs low-confidence detections (plain IoU)
+        remaining = unmatched_pool[self.state[pool[unmatched_pool]] == TRACKED]
+        cost = iou_cost(pool_boxes[remaining], det_boxes[low])
+        matches, unmatched_remaining, _ = linear_assignment(cost, 0.5)
+        extended, refind = self._match(pool[remaining[matches[:, 0]]], det_xyah[low[matches[:, 1]]], scores[low[matches[:, 1]]])
+        activated.append(extended)
+        refound.append(refind)
+        newly_lost = pool[remaining[unmatched_remaining]]
+        self.state[newly_lost] = LOST
+        self.events['lost'].extend(self.track_id[newly_lost].tolist())
+
+        # Unconfirmed tracks (seen once) vs the high-confidence detections left
+        left = high[unmatched_high]
+        cost = fuse_score(iou_cost(state_boxes(self.mean[unconfirmed]), det_boxes[left]), scores[left])
+        matches, unmatched_unconfirmed, unmatched_left = linear_assignment(cost, 0.7)
+        extended, _ = self._match(unconfirmed[matches[:, 0]], det_xyah[left[matches[:, 1]]], scores[left[matches[:, 1]]])
+        activated.append(extended)
+        removed = [unconfirmed[unmatched_unconfirmed]]
+        self.state[removed[0]] = REMOVED
+
+        # New tracks from the confident detections nobody claimed
+        new = left[unmatched_left]
+        new = new[scores[new] >= self.det_thresh]
+        slots = self._allocate(len(new))
+        self.mean[slots], self.covariance[slots] = kalman_initiate(det_xyah[new])
+        self.state[slots] = TRACKED
+        self.activated[slots] = self.frame_id == 1
+        self.track_id[slots] = -1
+        if self.frame_id == 1:
+            self._new_ids(slots)
+        self.tracklet_len[slots] = 1
+        self.start_frame[slots] = self.last_frame[slots] = self.frame_id
+        self.score[slots] = scores[new]
+        activated.append(slots)
+
+        # Expire the tracks lost for too long
+        expired = self.lost[self.frame_id - self.last_frame[self.lost] > self.max_time_lost]
+        self.state[expired] = REMOVED
+        removed.append(expired)
+
+        tracked = self.tracked[self.state[self.tracked] == TRACKED]
+        tracked = unique_in_order(np.concatenate([tracked] + activated + refound))
+        lost = self.lost[~np.isin(self.lost, tracked)]
+        lost = np.concatenate([lost, newly_lost])
+        lost = lost[~np.isin(lost, self.removed)]
+        self.removed = np.concatenate(removed)
+        self.tracked, self.lost = self._remove_duplicates(tracked, lost)
+
+        # Tracks that left both lists have ended; their slots are reused once the removed list lets go of them
+        current = np.concatenate([self.tracked, self.lost])
+        gone = np.setdiff1d(np.concatenate([previous, slots]), current)
+        self.events['ended'].extend(self.track_id[gone[self.track_id[gone] >= 0]].tolist())
+        in_use = np.flatnonzero(~self.free)
+        self.free[in_use[~np.isin(in_use, np.concatenate([current, self.removed]))]] = True
+        return self.tracked[self.activated[self.tracked]]
+
+    def _remove_duplicates(self, tracked, lost):
+        """Drops the younger of a followed / lost track pair that overlap almost completely (IoU > 0.95)."""
+        cost = iou_cost(state_boxes(self.mean[tracked]), state_boxes(self.mean[lost]))
+        pairs_a, pairs_b = np.nonzero(cost < 0.05)
+        age_a = self.last_frame[tracked[pairs_a]] - self.start_frame[tracked[pairs_a]]
+        age_b = self.last_frame[lost[pairs_b]] - self.start_frame[lost[pairs_b]]
+        drop_a = np.zeros(len(tracked), dtype=bool)
+        drop_b = np.zeros(len(lost), dtype=bool)
+        drop_b[pairs_b[age_a > age_b]] = True
+        drop_a[pairs_a[age_a <= age_b]] = True
+        return tracked[~drop_a], lost[~drop_b]
+
+    def update_with_detections(self, detections):
+        """
+        Same contract as sv.ByteTrack.update_with_detections: the detections matched to a confirmed track,
+        with tracker_id set.
+        """
+        if detections.confidence is None:
+            raise ValueError("Detections confidence must be provided for tracking.")
+        slots = self.update_with_tensors(detections.xyxy, detections.confidence)
+        if len(slots) == 0:
+            tracked_detections = sv.Detections.empty()
+            tracked_detections.tracker_id = np.array([], dtype=int)
+            return tracked_detections
+
+        cost = 1 - box_iou_batch(detections.xyxy, state_boxes(self.mean[slots])).astype(np.float32)
+        matches, _, _ = linear_assignment(cost, 0.5)
+        tracker_id = np.full(len(detections), -1, dtype=int)
+        tracker_id[matches[:, 0]] = self.track_id[slots[matches[:, 1]]]
+        tracked_detections = detections[tracker_id != -1]
+        tracked_detections.tracker_id = tracker_id[tracker_id != -1]
+        return tracked_detections
+
+def unique_in_order(slots):
+    """Slots without repeats, keeping the first occurrence of each."""
+    _, first = np.unique(slots, return_index=True)
+    return slots[np.sort(first)]
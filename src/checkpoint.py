@@ -0,0 +1,95 @@
+import os
+import pickle
+import threading
+
+CHECKPOINT_VERSION = 2
+
+# Stages whose state is saved; the detector is stateless and reloaded from its weights
+STAGES = ['tracker', 'lane_assigner', 'od_aggregator', 'heatmap', 'anomaly_detector', 'evaluator', 'stabilizer', 'motion_gate']
+# Attributes rebuilt when the pipeline is constructed: from the scene settings / ground truth, and the output writers
+# (whose files are restored from state['outputs'])
+REBUILT_ATTRIBUTES = {'settings', 'scene', 'polygons', 'forbidden_zones', 'lane_polygons', 'ground_truth', 'ignored_regions',
+                      'writer'}
+PIPELINE_ATTRIBUTES = ['active_tracks', 'tracks_seen', 'last_result']
+
+def pipeline_state(pipeline):
+    """
+    Snapshot of everything a TrafficPipeline accumulates: tracker (ByteTrack tracks and ID counters),
+    lane assignments, speed / direction history, evaluator accumulators, stabilizer reference, motion gate
+    background, the summaries of the live tracks, and how far the streamed anomaly / track / OD / lane density files got
+    (flushed here, so a resume can cut off what was written after the checkpoint).
+    """
+    state = {name: getattr(pipeline, name) for name in PIPELINE_ATTRIBUTES}
+    state['outputs'] = pipeline.output_positions()
+    for name in STAGES:
+        stage = getattr(pipeline, name)
+        if stage is not None:
+            state[name] = {key: value for key, value in vars(stage).items() if key not in REBUILT_ATTRIBUTES}
+    return state
+
+def restore_pipeline_state(pipeline, state):
+    """Loads a pipeline_state() snapshot into a freshly constructed pipeline with the same settings."""
+    for name in PIPELINE_ATTRIBUTES:
+        setattr(pipeline, name, state[name])
+    pipeline.restore_outputs(state['outputs'])
+    for name in STAGES:
+        stage = getattr(pipeline, name)
+        if stage is not None and name in state:
+            vars(stage).update(state[name])
+
+def write_atomic(path, data):
+    """Writes bytes to a temporary file and renames it over path, so a crash never leaves a partial checkpoint."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def load_checkpoint(path):
+    with open(path, 'rb') as f:
+        checkpoint = pickle.load(f)
+    if checkpoint.get('version') != CHECKPOINT_VERSION:
+        raise ValueError(f"Unsupported checkpoint version in {path}: {checkpoint.get('version')}")
+    return checkpoint
+
+class CheckpointWriter:
+    def __init__(self, path):
+        """
+        Writes checkpoints on a background thread. The state is serialized on the caller's thread (a consistent
+        snapshot between two frames); the file write and fsync happen off the processing loop.
+        If a write is still running when the next checkpoint arrives, only the newest one is kept.
+        """
+        self.path = path
+        self.pending = None
+        self.closed = False
+        self.written = 0
+        self.condition = threading.Condition()
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.thread = threading.Thread(target=self._write_loop, name="checkpoint-writer", daemon=True)
+        self.thread.start()
+
+    def save(self, checkpoint):
+        checkpoint = dict(checkpoint, version=CHECKPOINT_VERSION)
+        data = pickle.dumps(checkpoint, protocol=pickle.HIGHEST_PROTOCOL)
+        with self.condition:
+            self.pending = data
+            self.condition.notify()
+
+    def _write_loop(self):
+        while True:
+            with self.condition:
+                while self.pending is None and not self.closed:
+                    self.condition.wait()
+                if self.pending is None:
+                    return
+                data, self.pending = self.pending, None
+            write_atomic(self.path, data)
+            self.written += 1
+
+    def close(self):
+        """Waits for the last checkpoint to be on disk."""
+        with self.condition:
+            self.closed = True
+            self.condition.notify()
+        self.thread.join()
@@ -1,17 +1,57 @@
-from ultralytics import YOLO
 import supervision as sv
 import numpy as np
 import cv2
 from utils import config
+from src.inference_backends import create_engine
 
 class VehicleDetector:
-    def __init__(self, model_weights=config.MODEL_WEIGHTS):
+    def __init__(self, model_weights=config.MODEL_WEIGHTS, backend=None, settings=config):
         """
         Initialize the Vehicle Detector model.
+        Args:
+            model_weights (str): YOLOv8 weights (.pt).
+            backend (str): "torch" (ultralytics/PyTorch), "onnx" (ONNX Runtime), "onnx-int8" (quantized
+                           model from tools/quantize_detector.py) or "openvino".
+                           Defaults to config.DETECTOR_BACKEND. The CPU backends export the weights once
+                           and cache the artifact next to them.
+            settings: Scene settings (utils.config or a config.scene_settings() copy).
         """
-        print(f"Loading YOLOv8 model: {model_weights}...")
-        self.model = YOLO(model_weights)
+        self.settings = settings
+        self.backend = backend or settings.DETECTOR_BACKEND
+        self.model = None
+        self.engine = None
+        if self.backend == 'torch':
+            # Imported here: ultralytics / torch take seconds to import and the CPU backends don't need them
+            from ultralytics import YOLO
+            from utils.threads import apply_torch_threads
+            apply_torch_threads()
+            print(f"Loading YOLOv8 model: {model_weights}...")
+            self.model = YOLO(model_weights)
+        else:
+            self.engine = create_engine(model_weights, self.backend, settings.DETECTOR_THREADS,
+                                        settings.CONFIDENCE_THRESHOLD, settings.NMS_IOU_THRESHOLD)
         self.tracker_id = None # Used if we were doing internal tracking, but we use external ByteTrack
+        self.input_size = settings.DETECTOR_INPUT_SIZE # Torch input size (lowered by the latency controller under load)
+
+        # Region of interest: bounding box of all lanes and forbidden zones (+ margin), in full-frame pixels
+        self.roi = scene_roi(settings)
+
+    @property
+    def fixed_input_size(self):
+        """True for the exported CPU backends: their input shape is set at export, so input_size has no effect."""
+        return self.engine is not None
+
+    def warmup(self, frame_shape, runs=config.DETECTOR_WARMUP_RUNS):
+        """
+        Runs the detector on blank frames of the input shape, so the one-time costs of the first inference
+        (lazy initialization, kernel selection, memory allocation) are paid before the processing loop.
+        Args:
+            frame_shape (tuple): (height, width, 3) of the frames to come.
+            runs (int): Number of warm-up inferences.
+        """
+        frame = np.zeros(frame_shape, dtype=np.uint8)
+        for _ in range(runs):
+            self.detect(frame)
 
     def detect(self, frame):
         """
@@ -19,21 +59,116 @@ class VehicleDetector:
         Returns:
             sv.Detections: Detections object containing bounding boxes, confidence, class_id.
         """
-        # Inference with YOLOv8
-        # verbose=False to reduce clutter
-        results = self.model(frame, verbose=False)[0]
-        
-        # Convert to supervision Detections
-        detections = sv.Detections.from_ultralytics(results)
+        # Only the region that can contain lanes / zones is sent to the model
+        crop, offset = self._crop_to_roi(frame, self.roi)
+
+        if self.engine is not None:
+            # CPU backend: vectorized letterbox, inference and NMS straight to sv.Detections
+            detections = self.engine(crop)
+        else:
+            # Inference with YOLOv8
+            # verbose=False to reduce clutter
+            results = self.model(crop, verbose=False, imgsz=self._input_size(crop, frame))[0]
+            
+            # Convert to supervision Detections
+            detections = sv.Detections.from_ultralytics(results)
+
+        return self._postprocess(detections, offset)
+
+    def detect_batch(self, frames, rois=None, settings=None):
+        """
+        Detects on frames of several cameras with one model call (torch backend), so a single detector
+        instance can serve many streams. The exported CPU backends have a fixed batch of 1 and run per frame.
+        Args:
+            frames (list): BGR frames, possibly of different sizes.
+            rois (list): Per-frame ROI (x1, y1, x2, y2) or None for the full frame. Defaults to no cropping.
+            settings (list): Per-frame scene settings whose CONFIDENCE_THRESHOLD / TARGET_CLASSES filter the
+                             frame's detections. Defaults to the detector's settings.
+        Returns:
+            list: sv.Detections per frame.
+        """
+        if not frames:
+            return []
+        rois = rois or [None] * len(frames)
+        settings = settings or [self.settings] * len(frames)
+        crops, offsets = zip(*[self._crop_to_roi(frame, roi) for frame, roi in zip(frames, rois)])
+
+        if self.engine is not None:
+            outputs = [self.engine(crop) for crop in crops]
+        else:
+            # One letterbox size for the whole batch: the largest any crop would get on its own
+            sizes = [self._input_size(crop, frame) for crop, frame in zip(crops, frames)]
+            imgsz = max(max(size) if isinstance(size, list) else size for size in sizes)
+            results = self.model(list(crops), verbose=False, imgsz=imgsz)
+            outputs = [sv.Detections.from_ultralytics(result) for result in results]
+
+        return [self._postprocess(detections, offset, frame_settings)
+                for detections, offset, frame_settings in zip(outputs, offsets, settings)]
+
+    def _postprocess(self, detections, offset, settings=None):
+        settings = settings or self.settings
+        offset_x, offset_y = offset
+
+        # Map boxes back to full-frame coordinates
+        if offset_x or offset_y:
+            detections.xyxy = detections.xyxy + np.array([offset_x, offset_y, offset_x, offset_y], dtype=detections.xyxy.dtype)
         
         # Filter by Confidence
-        detections = detections[detections.confidence > config.CONFIDENCE_THRESHOLD]
+        detections = detections[detections.confidence > settings.CONFIDENCE_THRESHOLD]
         
         # Filter by Class ID (Car, Truck, Bus, Motorcycle, Person)
-        # Note: We must ensure class_id is in config.TARGET_CLASSES
+        # Note: We must ensure class_id is in TARGET_CLASSES
         # sv.Detections.class_id is a numpy array
         
-        mask = np.isin(detections.class_id, config.TARGET_CLASSES)
+        mask = np.isin(detections.class_id, settings.TARGET_CLASSES)
         detections = detections[mask]
         
         return detections
+
+    def _crop_to_roi(self, frame, roi):
+        """
+        Crops the frame to the ROI (clipped to the frame).
+        Returns:
+            tuple: (crop view, (offset_x, offset_y))
+        """
+        if roi is None:
+            return frame, (0, 0)
+        h, w = frame.shape[:2]
+        x1, y1, x2, y2 = roi
+        x1, y1 = max(0, x1), max(0, y1)
+        x2, y2 = min(w, x2), min(h, y2)
+        if x2 <= x1 or y2 <= y1:
+            return frame, (0, 0)
+        return frame[y1:y2, x1:x2], (x1, y1)
+
+    def _input_size(self, crop, frame):
+        """
+        Model input size for a crop. With DETECTION_ROI_MATCH_RESOLUTION the crop keeps the scale the full
+        frame would get (so cropping removes pixels instead of upscaling the crop); sizes are multiples of 32.
+        """
+        if crop is frame or not self.settings.DETECTION_ROI_MATCH_RESOLUTION:
+            return self.input_size
+        scale = self.input_size / max(frame.shape[:2])
+        h, w = crop.shape[:2]
+        return [max(32, int(np.ceil(h * scale / 32)) * 32), max(32, int(np.ceil(w * scale / 32)) * 32)]
+
+def scene_roi(settings=config):
+    """
+    Detection ROI of a scene: bounding box of all its lanes and forbidden zones (+ margin), or None if disabled.
+    """
+    if not settings.DETECTION_ROI_ENABLED:
+        return None
+    return compute_roi(list(settings.LANE_POLYGONS.values()) + list(settings.FORBIDDEN_ZONES.values()),
+                       settings.DETECTION_ROI_MARGIN)
+
+def compute_roi(polygons, margin):
+    """
+    Bounding box (x1, y1, x2, y2) of the union of polygons, grown by margin pixels.
+    Returns None if there are no polygons.
+    """
+    if not polygons:
+        return None
+    points = np.concatenate([np.asarray(poly).reshape(-1, 2) for poly in polygons])
+    x1, y1 = np.floor(points.min(axis=0) - margin).astype(int)
+    x2, y2 = np.ceil(points.max(axis=0) + margin).astype(int)
+    return int(x1), int(y1), int(x2), int(y2)
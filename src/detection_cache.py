@@ -0,0 +1,57 @@
+import numpy as np
+import supervision as sv
+
+class DetectionCache:
+    def __init__(self, fps=None):
+        """
+        Collects per-frame detections so the detector only has to run once per video.
+        Frames are stored as concatenated arrays plus per-frame offsets.
+        Args:
+            fps (float): Frame rate of the source video (stored with the cache).
+        """
+        self.fps = fps
+        self.xyxy = []
+        self.confidence = []
+        self.class_id = []
+        self.counts = []
+
+    def append(self, detections):
+        """Adds the detections of the next frame."""
+        self.xyxy.append(np.asarray(detections.xyxy, dtype=np.float32).reshape(-1, 4))
+        self.confidence.append(np.asarray(detections.confidence, dtype=np.float32).reshape(-1))
+        self.class_id.append(np.asarray(detections.class_id, dtype=np.int32).reshape(-1))
+        self.counts.append(len(detections))
+
+    def __len__(self):
+        return len(self.counts)
+
+    def save(self, path):
+        """Writes the cache to a compressed .npz file."""
+        offsets = np.concatenate([[0], np.cumsum(self.counts)]).astype(np.int64)
+        np.savez_compressed(
+            path,
+            xyxy=np.concatenate(self.xyxy) if self.xyxy else np.zeros((0, 4), dtype=np.float32),
+            confidence=np.concatenate(self.confidence) if self.confidence else np.zeros(0, dtype=np.float32),
+            class_id=np.concatenate(self.class_id) if self.class_id else np.zeros(0, dtype=np.int32),
+            offsets=offsets,
+            fps=np.float64(self.fps if self.fps is not None else np.nan),
+        )
+
+def load_detections(path):
+    """
+    Loads a cache written by DetectionCache.save.
+    Returns:
+        tuple: (list of sv.Detections, one per frame; fps or None)
+    """
+    data = np.load(path)
+    xyxy, confidence, class_id, offsets = data['xyxy'], data['confidence'], data['class_id'], data['offsets']
+    fps = float(data['fps'])
+
+    frames = []
+    for start, end in zip(offsets[:-1], offsets[1:]):
+        frames.append(sv.Detections(
+            xyxy=xyxy[start:end].astype(np.float64),
+            confidence=confidence[start:end],
+            class_id=class_id[start:end],
+        ))
+    return frames, (None if np.isnan(fps) else fps)
@@ -1,31 +1,146 @@
 import json
 import logging
 import numpy as np
-import pandas as pd
-from sklearn.metrics import confusion_matrix, precision_recall_fscore_support
 import xml.etree.ElementTree as ET
 import os
 import sys
 import collections
+import lap
 # Add project root to sys.path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 import utils.config as config
+from utils.geometry import box_iou_batch, box_centers, match_boxes
+from src.streaming_stats import GroupedStats
+
+STATS_KEYS = ['CENTROID_ERROR_STATS', 'SPEED_ERROR_STATS']
+COUNT_KEYS = ['ID_SWITCHES', 'NUM_GT', 'NUM_PREDICTIONS', 'NUM_MATCHES', 'FALSE_POSITIVES', 'MISSES', 'IDTP', 'IOU_SUM',
+              'FRAMES', 'TRACKS', 'CENTROID_ERROR_SUM', 'CENTROID_ERROR_COUNT', 'SPEED_ERROR_SUM', 'SPEED_ERROR_COUNT']
+
+
+def compute_mot_metrics(counts):
+    """
+    Derives MOTA, MOTP and IDF1 from raw MOT counts.
+    Args:
+        counts (dict): Raw accumulators (NUM_GT, MISSES, FALSE_POSITIVES, ID_SWITCHES, IDTP, ...).
+    Returns:
+        dict: The counts plus the derived metrics.
+    """
+    metrics = dict(counts)
+    num_gt = counts['NUM_GT']
+    errors = counts['MISSES'] + counts['FALSE_POSITIVES'] + counts['ID_SWITCHES']
+    metrics['MOTA'] = 1.0 - errors / num_gt if num_gt else 0.0
+    metrics['MOTP'] = counts['IOU_SUM'] / counts['NUM_MATCHES'] if counts['NUM_MATCHES'] else 0.0
+    denom = num_gt + counts['NUM_PREDICTIONS']
+    metrics['IDF1'] = 2 * counts['IDTP'] / denom if denom else 0.0
+    return metrics
+
+
+def aggregate_summaries(summaries):
+    """
+    Combines several Evaluator.summary() results (e.g. one per sequence) into one.
+    Counts are summed and the metrics recomputed, so sequences are weighted by their GT objects.
+    """
+    totals = {key: 0 for key in COUNT_KEYS}
+    anomalies = collections.defaultdict(int)
+    stats = {key: GroupedStats() for key in STATS_KEYS}
+    for summary in summaries:
+        for key in COUNT_KEYS:
+            totals[key] += summary.get(key, 0)
+        for anomaly_type, count in summary.get('ANOMALIES', {}).items():
+            anomalies[anomaly_type] += count
+        for key in STATS_KEYS:
+            if key in summary: # Older summaries only have the sums
+                stats[key].merge(GroupedStats.from_dict(summary[key]))
+
+    aggregated = compute_mot_metrics(totals)
+    aggregated['ANOMALIES'] = dict(anomalies)
+    aggregated['MEAN_CENTROID_ERROR'] = totals['CENTROID_ERROR_SUM'] / totals['CENTROID_ERROR_COUNT'] if totals['CENTROID_ERROR_COUNT'] else None
+    aggregated['MEAN_SPEED_ERROR'] = totals['SPEED_ERROR_SUM'] / totals['SPEED_ERROR_COUNT'] if totals['SPEED_ERROR_COUNT'] else None
+    for key in STATS_KEYS:
+        aggregated[key] = stats[key].to_dict()
+    aggregated['CENTROID_ERROR'] = stats['CENTROID_ERROR_STATS'].all().describe()
+    aggregated['SPEED_ERROR'] = stats['SPEED_ERROR_STATS'].all().describe()
+    return aggregated
+
+
+def speed_bands(speeds, edges):
+    """Band label ('20-40', '80+') of each speed (km/h) for the given band edges."""
+    labels = np.array([f"{low}-{high}" for low, high in zip(edges[:-1], edges[1:])] + [f"{edges[-1]}+"])
+    return labels[np.clip(np.searchsorted(edges, speeds, side='right') - 1, 0, len(edges) - 1)]
+
+
+def print_error_stats(title, unit, grouped):
+    """Prints mean / std / p50 / p90 / p99 of an error, overall and per class, lane and speed band."""
+    print(f"{title} ({unit}):")
+    for key in sorted(grouped.groups, key=lambda key: (key != 'all', key)):
+        d = grouped.groups[key].describe()
+        print(f"  {key:<14} n={d['count']:<7} mean={d['mean']:7.2f} std={d['std']:7.2f} "
+              f"p50={d['p50']:7.2f} p90={d['p90']:7.2f} p99={d['p99']:7.2f}")
+
+
+def compare_detections(reference, candidate, iou_threshold=0.5):
+    """
+    Agreement of a candidate detector with a reference detector, over all frames
+    (e.g. ONNX / INT8 engines vs the PyTorch model). A match needs IoU >= iou_threshold and the same class.
+    Args:
+        reference (list): sv.Detections per frame from the reference detector.
+        candidate (list): sv.Detections per frame from the candidate detector.
+    Returns:
+        dict: recall / precision of the candidate w.r.t. the reference, mean IoU and max confidence difference.
+    """
+    matched, num_ref, num_cand = 0, 0, 0
+    ious, conf_diffs = [], []
+    for ref, cand in zip(reference, candidate):
+        num_ref += len(ref)
+        num_cand += len(cand)
+        idx_r, idx_c, match_ious = match_boxes(ref.xyxy, cand.xyxy, iou_threshold)
+        same_class = ref.class_id[idx_r] == cand.class_id[idx_c]
+        matched += int(same_class.sum())
+        ious.extend(match_ious[same_class].tolist())
+        conf_diffs.extend(np.abs(ref.confidence[idx_r] - cand.confidence[idx_c])[same_class].tolist())
+    return {
+        'recall': matched / num_ref if num_ref else 1.0,
+        'precision': matched / num_cand if num_cand else 1.0,
+        'mean_iou': float(np.mean(ious)) if ious else 0.0,
+        'max_conf_diff': float(np.max(conf_diffs)) if conf_diffs else 0.0,
+        'reference_boxes': num_ref,
+        'candidate_boxes': num_cand,
+    }
+
 
 class Evaluator:
-    def __init__(self):
+    def __init__(self, ground_truth_path=None, settings=config):
+        self.settings = settings
         self.total_frames = 0
         self.total_tracks = set()
         self.anomalies_counts = collections.defaultdict(int)
         self.unique_anomalies = set() # Store (id, type) tuples
         
-        # Ground Truth Data: {frame_idx: {gt_id: {'bbox': [x1, y1, x2, y2], 'speed': float, 'center': (x, y)}}}
+        # Ground Truth Data, stored as arrays so each frame is matched in one vectorized pass:
+        # {frame_idx: {'ids': (N,) int, 'boxes': (N, 4) [x1, y1, x2, y2], 'speeds': (N,) float}}
         self.ground_truth = {}
-        self.speed_errors = [] # List of absolute errors
-        self.centroid_errors = [] # List of distances
+        # Ignored regions of the sequence (N, 4) [x1, y1, x2, y2]. Predictions inside them are not scored.
+        self.ignored_regions = np.zeros((0, 4))
+        # Errors of the matched pairs, in fixed memory, overall and per class / lane / GT speed band
+        self.centroid_stats = GroupedStats() # Center distance (pixels)
+        self.speed_stats = GroupedStats() # Absolute speed error (km/h)
+
+        # CLEAR MOT / identity accumulators
+        self.num_gt = 0
+        self.num_predictions = 0
+        self.num_matches = 0
+        self.false_positives = 0
+        self.misses = 0
+        self.id_switches = 0
+        self.iou_sum = 0.0 # Sum of IoU over matches (MOTP)
+        self.last_match = {} # {gt_id: pred_id} of the last frame each GT object was matched
+        self.id_pair_counts = collections.Counter() # {(gt_id, pred_id): frames overlapping above threshold} (IDF1)
         
         # Load GT if configured
-        if hasattr(config, 'GROUND_TRUTH_PATH') and config.GROUND_TRUTH_PATH and os.path.exists(config.GROUND_TRUTH_PATH):
-            self.load_ground_truth(config.GROUND_TRUTH_PATH)
+        if ground_truth_path is None:
+            ground_truth_path = getattr(settings, 'GROUND_TRUTH_PATH', None)
+        if ground_truth_path and os.path.exists(ground_truth_path):
+            self.load_ground_truth(ground_truth_path)
         else:
             print(f"⚠️ Warning: Ground Truth file not found or not configured.")
 
@@ -35,12 +150,20 @@ class Evaluator:
         try:
             tree = ET.parse(xml_path)
             root = tree.getroot()
+
+            ignored = []
+            ignored_region = root.find('ignored_region')
+            if ignored_region is not None:
+                for box in ignored_region.findall('box'):
+                    left, top = float(box.get('left')), float(box.get('top'))
+                    ignored.append([left, top, left + float(box.get('width')), top + float(box.get('height'))])
+            self.ignored_regions = np.array(ignored, dtype=np.float64).reshape(-1, 4)
             
             for frame in root.findall('frame'):
                 frame_num = int(frame.get('num'))
                 frame_idx = frame_num - 1 # 0-indexed
                 
-                self.ground_truth[frame_idx] = {}
+                ids, boxes, speeds = [], [], []
                 
                 target_list = frame.find('target_list')
                 if target_list is not None:
@@ -59,24 +182,25 @@ class Evaluator:
                             except:
                                 speed = 0.0
 
-                            x1, y1 = left, top
-                            x2, y2 = left + width, top + height
-                            center_x = left + width / 2
-                            center_y = top + height / 2
-                            
-                            self.ground_truth[frame_idx][tid] = {
-                                'bbox': [x1, y1, x2, y2],
-                                'speed': speed, 
-                                'center': (center_x, center_y)
-                            }
-            print(f"✅ Ground Truth loaded: {len(self.ground_truth)} frames.")
+                            ids.append(tid)
+                            boxes.append([left, top, left + width, top + height])
+                            speeds.append(speed)
+
+                self.ground_truth[frame_idx] = {
+                    'ids': np.array(ids, dtype=int),
+                    'boxes': np.array(boxes, dtype=np.float64).reshape(-1, 4),
+                    'speeds': np.array(speeds, dtype=np.float64),
+                }
+            print(f"✅ Ground Truth loaded: {len(self.ground_truth)} frames, {len(self.ignored_regions)} ignored regions.")
             
         except Exception as e:
             print(f"❌ Error loading XML: {e}")
 
-    def update(self, detections, frame_anomalies, frame_idx=None, current_speeds=None):
+    def update(self, detections, frame_anomalies, frame_idx=None, current_speeds=None, lanes=None):
         """
         Updates evaluation statistics for a frame.
+        Args:
+            lanes (np.ndarray): Lane id of each detection (-1 = none), for the per-lane error breakdown.
         """
         self.total_frames += 1
         
@@ -95,59 +219,160 @@ class Evaluator:
 
         # Compare with Ground Truth if available and frame_idx provided
         if self.ground_truth and frame_idx is not None:
-            self._evaluate_frame(detections, frame_idx, current_speeds)
+            self._evaluate_frame(detections, frame_idx, current_speeds, lanes)
 
-    def _evaluate_frame(self, detections, frame_idx, current_speeds):
+    def _evaluate_frame(self, detections, frame_idx, current_speeds, lanes=None):
+        """
+        Matches the frame's tracks to the GT objects with an optimal (Hungarian/LAPJV) assignment
+        on the IoU matrix and accumulates CLEAR MOT and identity statistics.
+        """
         if frame_idx not in self.ground_truth:
             return
 
-        gt_targets = self.ground_truth[frame_idx]
-        if not gt_targets:
-            return
+        gt = self.ground_truth[frame_idx]
+        gt_ids, gt_boxes = gt['ids'], gt['boxes']
 
-        if detections.tracker_id is None:
+        if detections.tracker_id is not None and len(detections.tracker_id) > 0:
+            pred_ids = np.asarray(detections.tracker_id, dtype=int)
+            pred_boxes = np.asarray(detections.xyxy, dtype=np.float64)
+            pred_classes = np.asarray(detections.class_id, dtype=int)
+            pred_lanes = np.asarray(lanes, dtype=int) if lanes is not None else np.full(len(pred_ids), -1)
+        else:
+            pred_ids = np.zeros(0, dtype=int)
+            pred_boxes = np.zeros((0, 4))
+            pred_classes = pred_lanes = np.zeros(0, dtype=int)
+
+        ious = box_iou_batch(pred_boxes, gt_boxes) # (P, G)
+
+        # Unmatched predictions centred in an ignored region are neither hits nor false positives
+        if len(self.ignored_regions) and len(pred_ids):
+            centers = box_centers(pred_boxes)
+            regions = self.ignored_regions
+            inside = ((centers[:, None, 0] >= regions[None, :, 0]) & (centers[:, None, 0] <= regions[None, :, 2]) &
+                      (centers[:, None, 1] >= regions[None, :, 1]) & (centers[:, None, 1] <= regions[None, :, 3])).any(axis=1)
+            keep = ~inside | (ious >= self.settings.EVAL_IOU_THRESHOLD).any(axis=1)
+            pred_ids, pred_boxes, ious = pred_ids[keep], pred_boxes[keep], ious[keep]
+            pred_classes, pred_lanes = pred_classes[keep], pred_lanes[keep]
+
+        num_gt, num_pred = len(gt_ids), len(pred_ids)
+        self.num_gt += num_gt
+        self.num_predictions += num_pred
+
+        if num_gt == 0 or num_pred == 0:
+            self.false_positives += num_pred
+            self.misses += num_gt
             return
-            
-        for i, tid in enumerate(detections.tracker_id):
-            x1, y1, x2, y2 = detections.xyxy[i]
-            pred_center = ((x1 + x2)/2, (y1 + y2)/2)
-            
-            min_dist = float('inf')
-            closest_gt_id = None
-            
-            for gt_id, gt_data in gt_targets.items():
-                gt_center = gt_data['center']
-                dist = np.linalg.norm(np.array(pred_center) - np.array(gt_center))
-                if dist < min_dist:
-                    min_dist = dist
-                    closest_gt_id = gt_id
-            
-            if min_dist < 100: # Reasonable range in pixels
-                self.centroid_errors.append(min_dist)
-                
-                # Check speed error if we matched a GT vehicle and have a speed estimate
-                if closest_gt_id is not None and current_speeds and tid in current_speeds:
-                    pred_speed = current_speeds[tid]
-                    gt_speed = gt_targets[closest_gt_id]['speed']
-                    
-                    # Ensure positive speeds
-                    error = abs(pred_speed - gt_speed)
-                    self.speed_errors.append(error)
 
-    def generate_report(self, all_tracks_data):
+        # Optimal one-to-one assignment; pairs below the IoU threshold are never matched
+        _, pred_to_gt, _ = lap.lapjv(1.0 - ious, extend_cost=True, cost_limit=1.0 - self.settings.EVAL_IOU_THRESHOLD)
+        pred_idx = np.nonzero(pred_to_gt >= 0)[0]
+        gt_idx = pred_to_gt[pred_idx]
+        valid = ious[pred_idx, gt_idx] >= self.settings.EVAL_IOU_THRESHOLD
+        pred_idx, gt_idx = pred_idx[valid], gt_idx[valid]
+
+        num_matches = len(pred_idx)
+        self.num_matches += num_matches
+        self.false_positives += num_pred - num_matches
+        self.misses += num_gt - num_matches
+        self.iou_sum += float(ious[pred_idx, gt_idx].sum())
+
+        # Identity switches: a GT object matched to a different track than last time
+        for p, g in zip(pred_ids[pred_idx].tolist(), gt_ids[gt_idx].tolist()):
+            previous = self.last_match.get(g)
+            if previous is not None and previous != p:
+                self.id_switches += 1
+            self.last_match[g] = p
+
+        # Identity co-occurrence for IDF1 (every pair that could be a match in this frame)
+        candidate_pred, candidate_gt = np.nonzero(ious >= self.settings.EVAL_IOU_THRESHOLD)
+        self.id_pair_counts.update(zip(gt_ids[candidate_gt].tolist(), pred_ids[candidate_pred].tolist()))
+
+        # Localisation and speed errors of the matched pairs
+        gt_speeds = gt['speeds'][gt_idx]
+        breakdowns = {
+            'class': pred_classes[pred_idx],
+            'lane': pred_lanes[pred_idx],
+            'speed': speed_bands(gt_speeds, self.settings.EVAL_SPEED_BANDS),
+        }
+        distances = np.linalg.norm(box_centers(pred_boxes[pred_idx]) - box_centers(gt_boxes[gt_idx]), axis=1)
+        self.centroid_stats.update(distances, breakdowns)
+
+        if current_speeds:
+            matched_ids = pred_ids[pred_idx].tolist()
+            has_speed = np.array([p in current_speeds for p in matched_ids], dtype=bool)
+            pred_speeds = np.array([current_speeds.get(p, 0.0) for p in matched_ids], dtype=np.float64)
+            self.speed_stats.update(np.abs(pred_speeds - gt_speeds)[has_speed],
+                                    {name: labels[has_speed] for name, labels in breakdowns.items()})
+
+    def _identity_true_positives(self):
+        """
+        Solves the global GT-ID <-> track-ID bipartite matching that maximises co-occurring frames (IDTP).
+        """
+        if not self.id_pair_counts:
+            return 0
+        gt_keys = sorted({g for g, _ in self.id_pair_counts})
+        pred_keys = sorted({p for _, p in self.id_pair_counts})
+        gt_index = {g: i for i, g in enumerate(gt_keys)}
+        pred_index = {p: j for j, p in enumerate(pred_keys)}
+
+        counts = np.zeros((len(gt_keys), len(pred_keys)))
+        for (g, p), n in self.id_pair_counts.items():
+            counts[gt_index[g], pred_index[p]] = n
+
+        # Maximise overlap == minimise (max - overlap); zero-overlap pairs are discarded afterwards
+        _, row_to_col, _ = lap.lapjv(counts.max() - counts, extend_cost=True)
+        rows = np.nonzero(row_to_col >= 0)[0]
+        return int(counts[rows, row_to_col[rows]].sum())
+
+    def get_mot_metrics(self):
+        """
+        Returns the accumulated MOT metrics.
+        Returns:
+            dict: MOTA, MOTP (mean IoU of matches), IDF1, ID switches and the raw counts.
+        """
+        return compute_mot_metrics({
+            'ID_SWITCHES': self.id_switches,
+            'NUM_GT': self.num_gt,
+            'NUM_PREDICTIONS': self.num_predictions,
+            'NUM_MATCHES': self.num_matches,
+            'FALSE_POSITIVES': self.false_positives,
+            'MISSES': self.misses,
+            'IDTP': self._identity_true_positives(),
+            'IOU_SUM': self.iou_sum,
+        })
+
+    def summary(self):
+        """
+        Returns a JSON-serializable summary with the raw accumulators, so runs can be aggregated.
+        """
+        summary = self.get_mot_metrics()
+        summary.update({
+            'FRAMES': self.total_frames,
+            'TRACKS': len(self.total_tracks) if isinstance(self.total_tracks, set) else int(self.total_tracks),
+            'ANOMALIES': dict(self.anomalies_counts),
+            'CENTROID_ERROR_SUM': self.centroid_stats.all().mean * self.centroid_stats.all().count,
+            'CENTROID_ERROR_COUNT': self.centroid_stats.all().count,
+            'SPEED_ERROR_SUM': self.speed_stats.all().mean * self.speed_stats.all().count,
+            'SPEED_ERROR_COUNT': self.speed_stats.all().count,
+            'CENTROID_ERROR_STATS': self.centroid_stats.to_dict(),
+            'SPEED_ERROR_STATS': self.speed_stats.to_dict(),
+        })
+        return summary
+
+    def generate_report(self, total_tracks):
         """
         Generates a summary report.
         Args:
-            all_tracks_data (dict): Dictionary of all tracks.
+            total_tracks (int): Number of distinct tracks of the run.
         """
-        self.total_tracks = len(all_tracks_data)
+        self.total_tracks = total_tracks
         
         print("\n--- EVALUATION REPORT ---")
         print(f"Total Frames Processed: {self.total_frames}")
         print(f"Total Unique Tracks: {self.total_tracks}")
         print(f"Total Anomalies Detected: {sum(self.anomalies_counts.values())}")
         
-        known_anomalies = ['SPEEDING', 'WRONG_DIRECTION', 'FORBIDDEN_ZONE', 'PEDESTRIAN_IN_ROAD']
+        known_anomalies = ['SPEEDING', 'WRONG_DIRECTION', 'FORBIDDEN_ZONE', 'PEDESTRIAN_IN_ROAD', 'CONGESTION']
         for k in known_anomalies:
             v = self.anomalies_counts.get(k, 0)
             print(f"  - {k}: {v}")
@@ -156,15 +381,20 @@ class Evaluator:
             if k not in known_anomalies:
                 print(f"  - {k}: {v}")
             
-        if self.centroid_errors:
-            avg_centroid_error = np.mean(self.centroid_errors)
-            print(f"Mean Centroid Position Error (vs GT): {avg_centroid_error:.2f} pixels")
-            
-            if self.speed_errors:
-                mae_speed = np.mean(self.speed_errors)
-                print(f"Mean Absolute Speed Error (vs GT): {mae_speed:.2f} km/h")
+        if self.centroid_stats.all().count:
+            print(f"Mean Centroid Position Error (vs GT): {self.centroid_stats.all().mean:.2f} pixels")
+            print_error_stats("Centroid Position Error", "pixels", self.centroid_stats)
+
+            if self.speed_stats.all().count:
+                print(f"Mean Absolute Speed Error (vs GT): {self.speed_stats.all().mean:.2f} km/h")
+                print_error_stats("Absolute Speed Error", "km/h", self.speed_stats)
         else:
             print("No Ground Truth comparison performed (or no matches found).")
+
+        if self.num_gt:
+            mot = self.get_mot_metrics()
+            print(f"MOTA: {mot['MOTA']*100:.2f}% | MOTP (IoU): {mot['MOTP']:.3f} | IDF1: {mot['IDF1']*100:.2f}%")
+            print(f"  ID Switches: {mot['ID_SWITCHES']} | FP: {mot['FALSE_POSITIVES']} | FN: {mot['MISSES']} | GT: {mot['NUM_GT']}")
             
         print("-------------------------")
         
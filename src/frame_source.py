@@ -0,0 +1,253 @@
+import glob
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+from utils import config
+
+IMAGE_EXTENSIONS = ['*.jpg', '*.jpeg', '*.png', '*.bmp']
+
+class FrameSource:
+    """
+    Common interface of all frame sources. Iterating yields (frame_idx, frame) where frame_idx
+    is the index of the frame in the original sequence (so it lines up with the ground truth).
+    `timestamp` holds the capture time (seconds) of the frame last yielded.
+    """
+    width = 0
+    height = 0
+    fps = 0.0
+    total_frames = 0 # None for live streams and videos without a usable frame count
+    timestamp = 0.0
+
+    def backlog(self):
+        """Number of frames decoded and waiting to be processed."""
+        return 0
+
+    def release(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+
+class VideoFileSource(FrameSource):
+    def __init__(self, video_path, start=0, end=None, stride=1):
+        """
+        Reads a video file with cv2.VideoCapture.
+        Args:
+            video_path (str): Path to the video.
+            start (int): First frame to read (the capture seeks to it).
+            end (int): Frame index to stop before (None = until the end).
+            stride (int): Read every N-th frame; skipped frames are only grabbed, not decoded.
+        The frames are read until cap.read() fails: CAP_PROP_FRAME_COUNT is 0, negative or only an estimate
+        for many containers, so it is only used for total_frames (None when it isn't positive).
+        """
+        self.cap = cv2.VideoCapture(video_path)
+        if not self.cap.isOpened():
+            raise IOError(f"Could not open video {video_path}")
+
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+        length = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        length = length if length > 0 else None
+
+        self.start = max(0, start)
+        self.end = end # None = until cap.read() fails
+        self.stride = max(1, stride)
+        known_end = length if end is None else (end if length is None else min(end, length))
+        self.total_frames = None if known_end is None else max(0, (known_end - self.start + self.stride - 1) // self.stride)
+
+        if self.start > 0:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, self.start)
+
+    def __iter__(self):
+        frame_idx = self.start
+        while self.end is None or frame_idx < self.end:
+            ret, frame = self.cap.read()
+            if not ret:
+                break
+            self.timestamp = frame_idx / self.fps if self.fps else 0.0
+            yield frame_idx, frame
+
+            # grab() advances the stream without decoding the pixels
+            for _ in range(self.stride - 1):
+                if not self.cap.grab():
+                    return
+            frame_idx += self.stride
+
+    def count_frames(self):
+        """
+        Frames left from the current position to the end (or `end`), counted by grabbing them, for videos
+        whose container doesn't report a usable frame count. Consumes the capture: call it on a probe.
+        """
+        count = 0
+        while (self.end is None or self.start + count < self.end) and self.cap.grab():
+            count += 1
+        return count
+
+    def release(self):
+        self.cap.release()
+
+class ImageSequenceSource(FrameSource):
+    def __init__(self, folder, fps=None, start=0, end=None, stride=1,
+                 workers=config.PREFETCH_WORKERS, prefetch=config.PREFETCH_QUEUE_SIZE):
+        """
+        Reads an image folder (e.g. a DETRAC sequence) directly, decoding ahead with a thread pool.
+        Args:
+            folder (str): Folder with the images (sorted by filename).
+            fps (float): Frame rate of the sequence (defaults to config.FPS).
+            start, end, stride: Frame range and step, as in VideoFileSource.
+            workers (int): Threads decoding images in parallel (cv2.imread releases the GIL).
+            prefetch (int): Maximum decoded frames waiting in the queue.
+        """
+        images = []
+        for ext in IMAGE_EXTENSIONS:
+            images.extend(glob.glob(os.path.join(folder, ext)))
+        images.sort()
+        if not images:
+            raise IOError(f"No images found in {folder}")
+
+        self.start = max(0, start)
+        self.end = len(images) if end is None else min(end, len(images))
+        self.stride = max(1, stride)
+        self.frame_indices = list(range(self.start, self.end, self.stride))
+        self.paths = [images[i] for i in self.frame_indices]
+        self.total_frames = len(self.paths)
+
+        self.fps = fps or config.FPS
+        self.workers = max(1, workers)
+        self.prefetch = max(1, prefetch)
+        self.pool = None
+        self.pending = deque()
+
+        first = cv2.imread(images[self.start] if self.start < len(images) else images[0])
+        self.height, self.width = first.shape[:2]
+
+    def __iter__(self):
+        self.pool = ThreadPoolExecutor(max_workers=self.workers)
+        pending = self.pending = deque() # Futures in frame order; its length bounds the prefetch queue
+        next_item = 0
+        try:
+            while next_item < self.total_frames or pending:
+                while next_item < self.total_frames and len(pending) < self.prefetch:
+                    pending.append((self.frame_indices[next_item], self.pool.submit(cv2.imread, self.paths[next_item])))
+                    next_item += 1
+
+                frame_idx, future = pending.popleft()
+                frame = future.result()
+                if frame is not None:
+                    self.timestamp = frame_idx / self.fps
+                    yield frame_idx, frame
+        finally:
+            for _, future in pending:
+                future.cancel()
+            self.release()
+
+    def backlog(self):
+        return sum(1 for _, future in self.pending if future.done())
+
+    def release(self):
+        if self.pool is not None:
+            self.pool.shutdown(wait=False)
+            self.pool = None
+
+class LiveSource(FrameSource):
+    def __init__(self, url, buffer_size=config.LIVE_BUFFER_SIZE, fps=None):
+        """
+        Reads a live stream (RTSP / HTTP URL, device index or pipe) on a background thread.
+        Only the latest `buffer_size` frames are kept: when processing falls behind, the oldest frames
+        are dropped (backpressure) instead of growing memory. Each frame gets its capture timestamp,
+        so speeds stay correct regardless of drops.
+        Args:
+            url (str): Stream URL, or a device index such as "0".
+            buffer_size (int): Maximum frames waiting to be processed.
+            fps (float): Nominal frame rate if the stream doesn't report one.
+        """
+        self.url = int(url) if str(url).isdigit() else url
+        self.cap = cv2.VideoCapture(self.url)
+        if not self.cap.isOpened():
+            raise IOError(f"Could not open stream {url}")
+
+        self.width = int(self.cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        self.height = int(self.cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or fps or config.FPS
+        self.total_frames = None
+        self.stride = 1
+
+        self.buffer = deque(maxlen=max(1, buffer_size)) # (frame_idx, timestamp, frame); full deque drops the oldest
+        self.condition = threading.Condition()
+        self.captured = 0
+        self.dropped = 0
+        self.ended = False
+        self.stopped = False
+        self.start_time = time.monotonic()
+
+        self.thread = threading.Thread(target=self._read_loop, name="live-capture", daemon=True)
+        self.thread.start()
+
+    def _read_loop(self):
+        frame_idx = 0
+        while not self.stopped:
+            ret, frame = self.cap.read()
+            # Monotonic clock: immune to wall-clock adjustments
+            timestamp = time.monotonic() - self.start_time
+            if not ret:
+                break
+            with self.condition:
+                if len(self.buffer) == self.buffer.maxlen:
+                    self.dropped += 1
+                self.buffer.append((frame_idx, timestamp, frame))
+                self.captured += 1
+                self.condition.notify()
+            frame_idx += 1
+
+        # Released here, by the only thread that uses the capture: release() can't do it while a read is blocked
+        self.cap.release()
+        with self.condition:
+            self.ended = True
+            self.condition.notify_all()
+
+    def __iter__(self):
+        while True:
+            with self.condition:
+                while not self.buffer and not self.ended:
+                    self.condition.wait()
+                if not self.buffer:
+                    return
+                frame_idx, timestamp, frame = self.buffer.popleft()
+            self.timestamp = timestamp
+            yield frame_idx, frame
+
+    def backlog(self):
+        return len(self.buffer)
+
+    def release(self):
+        self.stopped = True
+        self.thread.join(timeout=2.0)
+        if self.thread.is_alive():
+            # Still blocked in cap.read() on a stalled stream: releasing the capture under it can crash OpenCV.
+            # The reader releases it itself when the read returns (daemon thread, so it doesn't hold up exit).
+            print(f"⚠️ Stream {self.url} is not responding; its capture is released when the pending read returns.")
+            return
+        self.cap.release()
+
+def is_live_source(path):
+    """Stream URLs (rtsp://, http://, ...) and device indices are read as live sources."""
+    path = str(path)
+    return path.isdigit() or '://' in path
+
+def open_frame_source(path, start=0, end=None, stride=1, fps=None):
+    """
+    Returns the right FrameSource for a path: a live stream, an image folder or a video file.
+    """
+    if is_live_source(path):
+        return LiveSource(path, fps=fps)
+    if os.path.isdir(path):
+        return ImageSequenceSource(path, fps=fps, start=start, end=end, stride=stride)
+    return VideoFileSource(path, start=start, end=end, stride=stride)
@@ -0,0 +1,140 @@
+import os
+
+import cv2
+import numpy as np
+
+from src.output_writers import CSVWriter
+from utils import config
+from utils.geometry import feet_points
+
+DENSITY_COLUMNS = ['interval_start', 'interval_end', 'lane', 'mean_occupancy', 'density_veh_per_km']
+
+def lane_lengths(lane_polygons, homography):
+    """
+    Approximate length (m) of each lane: the long side of the minimum-area rectangle around its polygon
+    projected to the ground plane. NaN without a homography.
+    """
+    lengths = {}
+    for lane_id, poly in lane_polygons.items():
+        if homography is None:
+            lengths[lane_id] = np.nan
+            continue
+        pixels = np.asarray(poly, dtype=np.float32).reshape(-1, 1, 2)
+        world = cv2.perspectiveTransform(pixels, np.asarray(homography, dtype=np.float64)).reshape(-1, 2)
+        (_, _), (w, h), _ = cv2.minAreaRect(world.astype(np.float32))
+        lengths[lane_id] = float(max(w, h))
+    return lengths
+
+class OccupancyHeatmap:
+    def __init__(self, width, height, settings=config, output_dir=None):
+        """
+        Where vehicles dwell, and how full each lane is over time. Each frame adds the feet points of all tracks
+        to a grid downscaled by HEATMAP_CELL_SIZE (one np.add.at call) and the per-lane track counts of the
+        LaneAssigner to running sums (one np.bincount call), so the cost doesn't grow with Python work per vehicle.
+        Every HEATMAP_INTERVAL_SECONDS a row per lane (mean occupancy, density) is streamed to lane_density.csv;
+        every HEATMAP_SNAPSHOT_SECONDS the heatmap is saved as a compressed .npz and a color .png.
+        Args:
+            width, height (int): Frame size.
+            settings: Scene settings (lanes, homography, FPS, intervals).
+            output_dir (str): Folder of the snapshots and the density CSV (None = only kept in memory).
+        """
+        self.settings = settings
+        self.output_dir = output_dir
+        self.width, self.height = width, height
+        self.cell_size = settings.HEATMAP_CELL_SIZE
+        self.grid = np.zeros((-(-height // self.cell_size), -(-width // self.cell_size)), dtype=np.uint32)
+
+        self.lane_ids = sorted(settings.LANE_POLYGONS)
+        self.num_labels = max(self.lane_ids, default=-1) + 1 # bincount length: lane ids index the sums directly
+        self.lane_lengths = lane_lengths(settings.LANE_POLYGONS, settings.HOMOGRAPHY_MATRIX)
+        self.occupancy_sum = np.zeros(self.num_labels, dtype=np.int64) # Track-frames per lane in the open interval
+        self.interval_frames = 0
+        self.interval_index = None
+        self.snapshot_index = None
+        self.frames = 0
+        self.writer = None
+        if output_dir:
+            self.writer = CSVWriter(os.path.join(output_dir, 'lane_density.csv'), DENSITY_COLUMNS, settings)
+
+    def stream_time(self, frame_idx, timestamp=None):
+        return timestamp if timestamp is not None else frame_idx / self.settings.FPS
+
+    def update(self, detections, frame_lanes, frame_idx, timestamp=None):
+        """
+        Args:
+            detections (sv.Detections): Tracked detections of the frame.
+            frame_lanes (np.ndarray): Lane id of each detection (-1 = none), LaneAssigner.frame_lanes.
+        """
+        now = self.stream_time(frame_idx, timestamp)
+        self._roll(now)
+
+        if len(detections):
+            feet = feet_points(detections.xyxy)
+            cols = np.clip(feet[:, 0] // self.cell_size, 0, self.grid.shape[1] - 1).astype(np.intp)
+            rows = np.clip(feet[:, 1] // self.cell_size, 0, self.grid.shape[0] - 1).astype(np.intp)
+            np.add.at(self.grid, (rows, cols), 1)
+            in_lane = frame_lanes[(frame_lanes >= 0) & (frame_lanes < self.num_labels)]
+            self.occupancy_sum += np.bincount(in_lane, minlength=self.num_labels)
+        self.interval_frames += 1
+        self.frames += 1
+
+    def _roll(self, now):
+        """Closes the density interval / writes a snapshot when the stream time leaves them."""
+        interval_index = int(now // self.settings.HEATMAP_INTERVAL_SECONDS)
+        snapshot_index = int(now // self.settings.HEATMAP_SNAPSHOT_SECONDS)
+        if self.interval_index is None:
+            self.interval_index, self.snapshot_index = interval_index, snapshot_index
+            return
+        if interval_index != self.interval_index:
+            self.flush_interval()
+            self.interval_index = interval_index
+        if snapshot_index != self.snapshot_index:
+            self.save_snapshot(self.snapshot_index)
+            self.snapshot_index = snapshot_index
+
+    def lane_occupancy(self):
+        """{lane_id: (mean tracks in the lane, vehicles per km)} over the open interval."""
+        frames = max(self.interval_frames, 1)
+        occupancy = {}
+        for lane_id in self.lane_ids:
+            mean = self.occupancy_sum[lane_id] / frames
+            occupancy[lane_id] = (mean, mean / (self.lane_lengths[lane_id] / 1000.0))
+        return occupancy
+
+    def flush_interval(self):
+        """Writes the open interval's per-lane rows to lane_density.csv and resets the sums."""
+        if self.writer is not None and self.interval_index is not None and self.interval_frames:
+            seconds = self.settings.HEATMAP_INTERVAL_SECONDS
+            start = self.interval_index * seconds
+            self.writer.write_rows({'interval_start': start, 'interval_end': start + seconds, 'lane': lane_id,
+                                    'mean_occupancy': mean, 'density_veh_per_km': round(density, 2)}
+                                   for lane_id, (mean, density) in self.lane_occupancy().items())
+        self.occupancy_sum[:] = 0
+        self.interval_frames = 0
+
+    def render(self):
+        """Heatmap as a BGR image of the frame size (log scale, so a few stopped vehicles don't wash out the rest)."""
+        scaled = np.log1p(self.grid.astype(np.float32))
+        peak = scaled.max()
+        normalized = (scaled / peak * 255).astype(np.uint8) if peak > 0 else np.zeros(self.grid.shape, dtype=np.uint8)
+        image = cv2.applyColorMap(normalized, cv2.COLORMAP_JET)
+        return cv2.resize(image, (self.width, self.height), interpolation=cv2.INTER_NEAREST)
+
+    def save_snapshot(self, snapshot_index):
+        """Writes heatmap_<seconds>.npz (raw counts) and .png up to the end of the snapshot period."""
+        if not self.output_dir:
+            return
+        seconds = (snapshot_index + 1) * self.settings.HEATMAP_SNAPSHOT_SECONDS
+        stem = os.path.join(self.output_dir, f"heatmap_{int(seconds):06d}")
+        os.makedirs(self.output_dir, exist_ok=True)
+        np.savez_compressed(stem + '.npz', counts=self.grid, cell_size=self.cell_size, frames=self.frames,
+                            frame_size=np.array([self.width, self.height]))
+        cv2.imwrite(stem + '.png', self.render())
+
+    def close(self):
+        """Writes the last (partial) interval and a final snapshot."""
+        self.flush_interval()
+        if self.writer is not None:
+            self.writer.close()
+        if self.snapshot_index is not None:
+            self.save_snapshot(self.snapshot_index)
@@ -0,0 +1,201 @@
+import os
+
+import cv2
+import numpy as np
+import supervision as sv
+
+from utils import config
+from utils.geometry import box_iou_batch
+
+MAX_WH = 7680 # Class offset for batched (class-aware) NMS, larger than any image side
+MAX_NMS_CANDIDATES = 30000
+
+def exported_model_path(model_weights, model_format):
+    """
+    Path where ultralytics writes the exported model, next to the weights.
+    """
+    stem, _ = os.path.splitext(model_weights)
+    if model_format == 'onnx':
+        return stem + '.onnx'
+    if model_format == 'openvino':
+        return os.path.join(stem + '_openvino_model', os.path.basename(stem) + '.xml')
+    raise ValueError(f"Unsupported export format: {model_format}")
+
+def quantized_model_path(model_weights):
+    """
+    Path of the INT8 model produced by tools/quantize_detector.py, next to the weights.
+    """
+    stem, _ = os.path.splitext(model_weights)
+    return stem + '.int8.onnx'
+
+def export_model(model_weights, model_format, imgsz=config.DETECTOR_INPUT_SIZE):
+    """
+    Exports the YOLOv8 weights once to ONNX / OpenVINO IR and reuses the cached artifact afterwards.
+    The export is redone if the weights are newer than the artifact.
+    """
+    path = exported_model_path(model_weights, model_format)
+    if os.path.exists(path) and (not os.path.exists(model_weights) or os.path.getmtime(path) >= os.path.getmtime(model_weights)):
+        return path
+
+    from ultralytics import YOLO
+    print(f"Exporting {model_weights} to {model_format} (one-time)...")
+    YOLO(model_weights).export(format=model_format, imgsz=imgsz, dynamic=False, half=False, simplify=True)
+    if not os.path.exists(path):
+        raise RuntimeError(f"Export did not produce {path}")
+    return path
+
+def letterbox(frame, size):
+    """
+    Resizes keeping the aspect ratio and pads to `size` (h, w) with gray, like the ultralytics preprocessing.
+    Returns:
+        tuple: (NCHW float32 blob in [0, 1] RGB, scale, (pad_x, pad_y))
+    """
+    h, w = frame.shape[:2]
+    target_h, target_w = size
+    scale = min(target_h / h, target_w / w)
+    new_w, new_h = int(round(w * scale)), int(round(h * scale))
+    pad_x, pad_y = (target_w - new_w) / 2, (target_h - new_h) / 2
+
+    resized = cv2.resize(frame, (new_w, new_h), interpolation=cv2.INTER_LINEAR) if (new_w, new_h) != (w, h) else frame
+    top, left = int(round(pad_y - 0.1)), int(round(pad_x - 0.1))
+    canvas = np.full((target_h, target_w, 3), 114, dtype=np.uint8)
+    canvas[top:top + new_h, left:left + new_w] = resized
+
+    # BGR HWC uint8 -> RGB CHW float32, in one pass
+    blob = canvas[:, :, ::-1].transpose(2, 0, 1)[None].astype(np.float32) * (1.0 / 255.0)
+    return np.ascontiguousarray(blob), scale, (left, top)
+
+def non_max_suppression(boxes, scores, class_ids, iou_threshold, max_det=300):
+    """
+    Class-aware greedy NMS. Boxes of different classes are shifted apart so one pass handles all classes.
+    Returns:
+        np.ndarray: Indices of the kept boxes, by descending score.
+    """
+    offset_boxes = boxes + (class_ids[:, None] * MAX_WH).astype(boxes.dtype)
+    order = np.argsort(-scores, kind='stable')[:MAX_NMS_CANDIDATES]
+    keep = []
+    while order.size > 0 and len(keep) < max_det:
+        best = order[0]
+        keep.append(best)
+        if order.size == 1:
+            break
+        ious = box_iou_batch(offset_boxes[best:best + 1], offset_boxes[order[1:]])[0]
+        order = order[1:][ious <= iou_threshold]
+    return np.array(keep, dtype=int)
+
+def decode_yolov8(output, frame_shape, scale, pad, conf_threshold, iou_threshold):
+    """
+    Turns the raw YOLOv8 head output (1, 4 + num_classes, N) into sv.Detections in frame coordinates.
+    """
+    predictions = output[0].T # (N, 4 + num_classes)
+    class_scores = predictions[:, 4:]
+    class_ids = class_scores.argmax(axis=1)
+    scores = class_scores[np.arange(len(class_ids)), class_ids]
+
+    mask = scores > conf_threshold
+    if not mask.any():
+        return sv.Detections.empty()
+    predictions, class_ids, scores = predictions[mask], class_ids[mask], scores[mask]
+
+    # cx, cy, w, h -> x1, y1, x2, y2 (input space)
+    xy, wh = predictions[:, :2], predictions[:, 2:4]
+    boxes = np.concatenate([xy - wh / 2, xy + wh / 2], axis=1)
+
+    keep = non_max_suppression(boxes, scores, class_ids, iou_threshold)
+    boxes, scores, class_ids = boxes[keep], scores[keep], class_ids[keep]
+
+    # Undo the letterbox
+    boxes -= np.array([pad[0], pad[1], pad[0], pad[1]], dtype=boxes.dtype)
+    boxes /= scale
+    h, w = frame_shape[:2]
+    boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, w)
+    boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, h)
+
+    return sv.Detections(
+        xyxy=boxes.astype(np.float32),
+        confidence=scores.astype(np.float32),
+        class_id=class_ids.astype(int),
+    )
+
+class OnnxYoloBackend:
+    def __init__(self, model_path, num_threads=config.DETECTOR_THREADS):
+        """
+        Runs an exported YOLOv8 ONNX model with ONNX Runtime on the CPU.
+        Args:
+            model_path (str): Path to the .onnx file.
+            num_threads (int): Intra-op threads used by ONNX Runtime.
+        """
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = num_threads
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        print(f"Loading ONNX Runtime session: {model_path} ({num_threads} threads)...")
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self.input_size = tuple(model_input.shape[2:4]) # (h, w)
+
+    def infer(self, blob):
+        return self.session.run(None, {self.input_name: blob})[0]
+
+class OpenVinoYoloBackend:
+    def __init__(self, model_path, num_threads=config.DETECTOR_THREADS):
+        """
+        Runs an exported YOLOv8 OpenVINO IR model on the CPU.
+        Args:
+            model_path (str): Path to the .xml file.
+            num_threads (int): Inference threads used by OpenVINO.
+        """
+        import openvino as ov
+
+        core = ov.Core()
+        core.set_property('CPU', {'INFERENCE_NUM_THREADS': num_threads})
+        print(f"Loading OpenVINO model: {model_path} ({num_threads} threads)...")
+        self.model = core.compile_model(model_path, 'CPU')
+        self.output = self.model.output(0)
+        shape = self.model.input(0).shape
+        self.input_size = (int(shape[2]), int(shape[3]))
+
+    def infer(self, blob):
+        return self.model([blob])[self.output]
+
+class YoloEngine:
+    def __init__(self, backend, confidence_threshold=config.CONFIDENCE_THRESHOLD, iou_threshold=config.NMS_IOU_THRESHOLD):
+        """
+        Shared preprocessing / decoding around a raw inference backend (ONNX Runtime or OpenVINO).
+        Args:
+            backend: OnnxYoloBackend or OpenVinoYoloBackend.
+            confidence_threshold (float): Minimum class score kept by the decoder.
+            iou_threshold (float): NMS IoU.
+        """
+        self.backend = backend
+        self.confidence_threshold = confidence_threshold
+        self.iou_threshold = iou_threshold
+
+    def __call__(self, frame):
+        blob, scale, pad = letterbox(frame, self.backend.input_size)
+        output = self.backend.infer(blob)
+        return decode_yolov8(output, frame.shape, scale, pad, self.confidence_threshold, self.iou_threshold)
+
+def create_engine(model_weights, backend, num_threads=config.DETECTOR_THREADS,
+                  confidence_threshold=config.CONFIDENCE_THRESHOLD, iou_threshold=config.NMS_IOU_THRESHOLD):
+    """
+    Builds the CPU inference engine for a backend name ("onnx", "onnx-int8" or "openvino"),
+    decoding with the given thresholds (the detector's scene settings).
+    """
+    if backend == 'onnx':
+        model = OnnxYoloBackend(export_model(model_weights, 'onnx'), num_threads)
+    elif backend == 'onnx-int8':
+        path = quantized_model_path(model_weights)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Quantized model {path} not found. Run tools/quantize_detector.py first.")
+        model = OnnxYoloBackend(path, num_threads)
+    elif backend == 'openvino':
+        model = OpenVinoYoloBackend(export_model(model_weights, 'openvino'), num_threads)
+    else:
+        raise ValueError(f"Unknown detector backend: {backend}")
+    return YoloEngine(model, confidence_threshold, iou_threshold)
@@ -4,21 +4,26 @@ from shapely.geometry import Point, Polygon
 from utils import config
 
 class LaneAssigner:
-    def __init__(self, lane_polygons=config.LANE_POLYGONS):
+    def __init__(self, lane_polygons=config.LANE_POLYGONS, scene=None):
         """
         Initializes the Lane Assigner with lane polygon definitions.
         Args:
             lane_polygons (dict): Dictionary mapping lane_id to polygon coordinates (numpy array).
+            scene (SceneBundle): Compiled scene; its lane label map replaces the polygon tests.
         """
+        self.scene = scene
         self.polygons = {}
-        for lane_id, cols in lane_polygons.items():
+        for lane_id, cols in ({} if scene is not None else lane_polygons).items():
             # Convert numpy array to Shapely Polygon
             # cols is expected to be [[x,y], [x,y], ...]
             self.polygons[lane_id] = Polygon(cols)
             
         # Dictionary to store lane assignments for each track_id
-        # Structure: {track_id: {'entry_lane': id, 'exit_lane': id, 'history': []}}
+        # Structure: {track_id: {'entry_lane': id, 'exit_lane': id, 'current_lane': id,
+        #                        'lane_runs': [[lane_id, frames], ...], 'last_seen': frame_count}}
         self.assignments = {} 
+        self.frame_count = 0 # Frames assigned so far (track ages are measured in these)
+        self.frame_lanes = np.zeros(0, dtype=np.int64) # Lane of each detection of the last frame (-1 = none)
 
     def assign(self, detections):
         """
@@ -28,9 +33,16 @@ class LaneAssigner:
         Returns:
             dict: Updated assignments dictionary.
         """
+        self.frame_count += 1
+        self.frame_lanes = np.full(len(detections), -1, dtype=np.int64)
         if detections.tracker_id is None:
             return self.assignments
 
+        # Lanes of all feet points (bottom center) in one lookup when the scene is compiled
+        if self.scene is not None:
+            feet = np.column_stack([(detections.xyxy[:, 0] + detections.xyxy[:, 2]) / 2, detections.xyxy[:, 3]])
+            lane_labels = self.scene.lookup(self.scene.lane_map, feet)
+
         # Iterate through detections
         for i, tracker_id in enumerate(detections.tracker_id):
             tid = int(tracker_id)
@@ -41,7 +53,8 @@ class LaneAssigner:
                     'entry_lane': None, 
                     'exit_lane': None,
                     'current_lane': None, # current frame status
-                    'history': []
+                    'lane_runs': [], # Run-length lane sequence: a new run only when the lane changes
+                    'last_seen': self.frame_count
                 }
 
             # Calculate "feet" point (bottom center)
@@ -52,6 +65,8 @@ class LaneAssigner:
             point = Point(center_x, bottom_y)
 
             current_lane = None
+            if self.scene is not None and lane_labels[i] >= 0:
+                current_lane = int(lane_labels[i])
             
             # Check inclusion in each lane polygon
             for lane_id, poly in self.polygons.items():
@@ -61,9 +76,16 @@ class LaneAssigner:
             
             track_data = self.assignments[tid]
             
-            # Update history
-            track_data['history'].append(current_lane)
+            # Update the run-length history
+            runs = track_data['lane_runs']
+            if runs and runs[-1][0] == current_lane:
+                runs[-1][1] += 1
+            else:
+                runs.append([current_lane, 1])
             track_data['current_lane'] = current_lane
+            track_data['last_seen'] = self.frame_count
+            if current_lane is not None:
+                self.frame_lanes[i] = current_lane
             
             if current_lane is not None:
                 # If entry lane is not set, this is the first lane seen -> Entry Lane
@@ -74,3 +96,14 @@ class LaneAssigner:
                 track_data['exit_lane'] = current_lane
                         
         return self.assignments
+
+    def end_stale_tracks(self, max_age):
+        """
+        Removes and returns the assignments of tracks not seen for more than max_age frames (all of them with -1).
+        Returns:
+            dict: {track_id: assignment} of the ended tracks.
+        """
+        ended = {tid: data for tid, data in self.assignments.items() if self.frame_count - data['last_seen'] > max_age}
+        for tid in ended:
+            del self.assignments[tid]
+        return ended
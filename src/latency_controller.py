@@ -0,0 +1,99 @@
+import time
+from utils import config
+
+class LatencyController:
+    def __init__(self, target_fps, detector=None):
+        """
+        Keeps a live stream in real time by trading quality for speed.
+        It watches the per-frame processing latency (EWMA) and the source backlog against the frame budget
+        and moves along config.LATENCY_QUALITY_LEVELS (detector input size, detection stride, render stride).
+        At the lowest level, frames are dropped while the backlog stays too long; speeds stay correct because
+        every processed frame keeps its capture timestamp.
+        The exported CPU backends have a fixed input shape, so with them only the strides are adjusted.
+        Args:
+            target_fps (float): Frame rate to keep up with.
+            detector (VehicleDetector): Detector whose input size is adjusted.
+        """
+        self.budget = 1.0 / target_fps
+        self.detector = detector
+        self.levels = config.LATENCY_QUALITY_LEVELS
+        if detector is not None and detector.fixed_input_size:
+            print(f"⚠️ The {detector.backend} detector has a fixed input size: latency control only adjusts "
+                  f"the detection / render strides.")
+            self.levels = stride_levels(self.levels)
+        self.level = 0
+        self.ewma_latency = None
+        self.frames_since_change = 0
+        self.frame_counter = 0
+
+        self.dropped_frames = 0
+        self.changes = [] # [(time, frame_counter, old_level, new_level, reason)]
+        self._apply_level()
+
+    @property
+    def settings(self):
+        return self.levels[self.level]
+
+    def should_drop(self, backlog):
+        """Drops the frame if even the lowest quality level can't keep the backlog short."""
+        if self.level == len(self.levels) - 1 and backlog > config.LATENCY_MAX_BACKLOG:
+            self.dropped_frames += 1
+            return True
+        return False
+
+    def should_detect(self):
+        """True on frames where detection / tracking / analytics run (every detect_stride-th frame)."""
+        return self.frame_counter % self.settings['detect_stride'] == 0
+
+    def should_render(self):
+        """True on frames that get the full visualization (every render_stride-th frame)."""
+        return self.frame_counter % self.settings['render_stride'] == 0
+
+    def update(self, latency, backlog=0):
+        """
+        Records the processing time (s) of the last frame and adapts the quality level.
+        """
+        self.frame_counter += 1
+        self.frames_since_change += 1
+        alpha = config.LATENCY_EWMA_ALPHA
+        self.ewma_latency = latency if self.ewma_latency is None else alpha * latency + (1 - alpha) * self.ewma_latency
+
+        # Hysteresis: wait a while after each change before judging the new level
+        if self.frames_since_change < config.LATENCY_COOLDOWN_FRAMES:
+            return
+
+        overloaded = self.ewma_latency > self.budget * config.LATENCY_HIGH_WATERMARK or backlog > config.LATENCY_MAX_BACKLOG
+        underloaded = self.ewma_latency < self.budget * config.LATENCY_LOW_WATERMARK and backlog == 0
+
+        if overloaded and self.level < len(self.levels) - 1:
+            self._change(self.level + 1, f"latency {self.ewma_latency*1000:.1f} ms, backlog {backlog}")
+        elif underloaded and self.level > 0:
+            self._change(self.level - 1, f"latency {self.ewma_latency*1000:.1f} ms")
+
+    def _change(self, new_level, reason):
+        old_level = self.level
+        self.level = new_level
+        self.frames_since_change = 0
+        self._apply_level()
+        self.changes.append((time.time(), self.frame_counter, old_level, new_level, reason))
+        direction = "⬇️ Degrading" if new_level > old_level else "⬆️ Restoring"
+        print(f"{direction} quality to level {new_level} {self.settings} ({reason}, budget {self.budget*1000:.1f} ms)")
+
+    def _apply_level(self):
+        if 'input_size' in self.settings and self.detector is not None:
+            self.detector.input_size = self.settings['input_size']
+
+    def report(self):
+        print("\n--- LATENCY CONTROL ---")
+        print(f"Final quality level: {self.level} {self.settings}")
+        print(f"Quality changes: {len(self.changes)} | Dropped frames: {self.dropped_frames}")
+        return {'level': self.level, 'changes': len(self.changes), 'dropped_frames': self.dropped_frames}
+
+def stride_levels(levels):
+    """Quality levels without the input size, keeping only the levels that change a stride."""
+    strides = []
+    for level in levels:
+        level = {key: value for key, value in level.items() if key != 'input_size'}
+        if not strides or level != strides[-1]:
+            strides.append(level)
+    return strides
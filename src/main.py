@@ -1,5 +1,8 @@
 import os
 import sys
+import time
+
+STARTUP_BEGIN = time.perf_counter() # Before the heavy imports below
 
 # Add project root to sys.path to resolve imports
 current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -10,113 +13,245 @@ if project_root not in sys.path:
 import cv2
 import numpy as np
 from tqdm import tqdm
-import json
-import pandas as pd
+import argparse
 
 from utils import config
 from utils import visualization
-from src.detection import VehicleDetector
-from src.tracking import TrafficTracker
-from src.lane_assignment import LaneAssigner
-from src.anomaly_detection import AnomalyDetector
-from src.evaluation import Evaluator
-from src.stabilization import VideoStabilizer
-
-def main():
+from src.pipeline import TrafficPipeline
+from src.frame_source import open_frame_source, is_live_source
+from src.latency_controller import LatencyController
+from src.metrics import MetricsServer, PipelineMetrics
+from src.checkpoint import CheckpointWriter, load_checkpoint, pipeline_state, restore_pipeline_state
+from utils.scene_bundle import apply_scene_bundle
+from utils.timing import StartupTimer
+from utils.threads import apply_thread_plan, format_thread_plan, plan_threads
+
+def save_results(pipeline):
+    """
+    Prints the evaluation / motion gate / origin-destination reports and closes the streamed outputs
+    (anomaly CSV, track summaries, last origin-destination bin, heatmaps).
+    """
+    pipeline.evaluator.generate_report(pipeline.tracks_seen)
+    if pipeline.motion_gate is not None:
+        pipeline.motion_gate.report()
+    pipeline.od_aggregator.close(pipeline.lane_assigner)
+    pipeline.od_aggregator.report()
+    if pipeline.heatmap is not None:
+        pipeline.heatmap.close()
+        print(f"Heatmaps and lane density: {pipeline.heatmap.output_dir}")
+
+    # 4. Close the streamed results
+    pipeline.close_outputs()
+    print(f"💾 Results saved to {config.RESULTS_DIR} (anomalies: {config.ANOMALY_RESULTS_PATH}, tracks: {config.TRACKING_RESULTS_PATH})")
+
+def main(video_path=None, start_frame=0, end_frame=None, stride=1, shards=1, streams_path=None, processes=False, resume=False,
+         bundle_path=None, cpu_slots=None, cpu_slot=None, pin=None, metrics_port=None):
     print("🚦 Starting Traffic Analysis System...")
+    timer = StartupTimer(STARTUP_BEGIN)
+    timer.mark("Imports")
+    # Thread budget and affinity of this process, before any detector / OpenCV / BLAS work starts
+    thread_plan = apply_thread_plan(plan_threads(cpu_slots, cpu_slot, pin))
+    print(f"🧵 CPU {format_thread_plan(thread_plan)}")
+    if bundle_path:
+        config.SCENE_BUNDLE_PATH = bundle_path
+
+    # Several cameras served by this process, each with its own scene settings
+    if streams_path:
+        from src.multi_camera import run_multi_camera
+        run_multi_camera(streams_path)
+        print("✅ Multi-camera analysis complete!")
+        return
+
+    video_path = video_path or config.VIDEO_PATH
     
     # 1. Setup & Initialization
-    if not os.path.exists(config.VIDEO_PATH):
-        print(f"❌ Error: Video file not found at {config.VIDEO_PATH}")
+    if not is_live_source(video_path) and not os.path.exists(video_path):
+        print(f"❌ Error: Video file not found at {video_path}")
         print("Please place a video file in the 'data' directory and update config.py if necessary.")
         # Create data dir if not exists
         os.makedirs(config.DATA_DIR, exist_ok=True)
         return
 
-    # Cap video to get info
-    cap = cv2.VideoCapture(config.VIDEO_PATH)
-    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
-    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
-    fps = cap.get(cv2.CAP_PROP_FPS)
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-    print(f"ℹ️ Video Info: {width}x{height} @ {fps} FPS, {total_frames} frames")
+    # Long offline videos: split into time shards processed in parallel
+    if shards > 1:
+        if is_live_source(video_path):
+            print("❌ Error: Sharded processing needs a video file or image folder, not a live stream.")
+            return
+        from src.sharding import run_sharded
+        run_sharded(video_path, shards, start_frame, end_frame)
+        print("✅ Sharded analysis complete!")
+        return
+
+    # Decoding, analytics and rendering in separate processes, sharing frames through shared memory
+    if processes:
+        from src.process_pipeline import run_process_pipeline
+        pipeline = run_process_pipeline(video_path, start_frame, end_frame, stride)
+        print("📊 Generating reports...")
+        save_results(pipeline)
+        print(f"✅ Analysis Complete! Video saved to {config.OUTPUT_VIDEO_PATH}")
+        return
+
+    # Continue an interrupted run from its last checkpoint
+    checkpoint = None
+    output_video_path = config.OUTPUT_VIDEO_PATH
+    if resume:
+        if is_live_source(video_path):
+            print("❌ Error: Live streams can't be resumed.")
+            return
+        if not os.path.exists(config.CHECKPOINT_PATH):
+            print(f"⚠️ No checkpoint at {config.CHECKPOINT_PATH}, starting from the beginning.")
+        else:
+            checkpoint = load_checkpoint(config.CHECKPOINT_PATH)
+            if os.path.abspath(checkpoint['video_path']) != os.path.abspath(video_path):
+                print(f"❌ Error: The checkpoint belongs to {checkpoint['video_path']}, not {video_path}.")
+                return
+            start_frame, end_frame, stride = checkpoint['next_frame'], checkpoint['end_frame'], checkpoint['stride']
+            # A video file can't be appended to: the resumed part is written as a new segment
+            stem, ext = os.path.splitext(config.OUTPUT_VIDEO_PATH)
+            output_video_path = f"{stem}.resume_{start_frame}{ext}"
+            print(f"⏩ Resuming from frame {start_frame} ({checkpoint['frames_done']} frames already processed)")
+
+    # Open the video file or image folder to get info
+    source = open_frame_source(video_path, start=start_frame, end=end_frame, stride=stride)
+    width, height = source.width, source.height
+    fps = source.fps / source.stride # Effective rate of the frames we actually process
+    total_frames = source.total_frames
+    print(f"ℹ️ Video Info: {width}x{height} @ {source.fps} FPS, {total_frames if total_frames is not None else 'unknown'} frames (stride {source.stride})")
+    timer.mark("Open input")
     
     # Update config FPS if needed
     config.FPS = fps
 
+    # Compiled scene: lanes, zones and homography come from the bundle, lookups from its memory-mapped tables
+    if config.SCENE_BUNDLE_PATH:
+        try:
+            apply_scene_bundle(config.SCENE_BUNDLE_PATH, width, height)
+        except ValueError as e:
+            print(f"❌ Error: {e}")
+            return
+        print(f"🗺️ Scene bundle: {config.SCENE_BUNDLE_PATH}")
+
     # Initialize Modules
-    print("▶️ Initializing modules...")
-    detector = VehicleDetector(config.MODEL_WEIGHTS)
-    tracker = TrafficTracker()
-    lane_assigner = LaneAssigner(config.LANE_POLYGONS)
-    anomaly_detector = AnomalyDetector()
-    evaluator = Evaluator() # If ground truth is available
-    stabilizer = VideoStabilizer()
+    pipeline = TrafficPipeline(config.GROUND_TRUTH_PATH, od_output_path=config.OD_RESULTS_PATH,
+                               frame_size=(width, height), heatmap_dir=config.HEATMAP_DIR,
+                               anomaly_output_path=config.ANOMALY_RESULTS_PATH, track_output_path=config.TRACKING_RESULTS_PATH)
+    timer.mark("Load model")
+    if pipeline.detector is not None and config.DETECTOR_WARMUP_RUNS:
+        pipeline.detector.warmup((height, width, 3))
+        timer.mark("Warm-up")
+    frames_done = 0
+    output_videos = [output_video_path]
+    if checkpoint is not None:
+        restore_pipeline_state(pipeline, checkpoint['pipeline'])
+        frames_done = checkpoint['frames_done']
+        output_videos = checkpoint['output_videos'] + output_videos
+    checkpoint_writer = None
+    if config.CHECKPOINT_INTERVAL_FRAMES and not is_live_source(video_path):
+        checkpoint_writer = CheckpointWriter(config.CHECKPOINT_PATH)
+
+    controller = None
+    if config.LATENCY_CONTROL_ENABLED:
+        controller = LatencyController(config.LATENCY_TARGET_FPS or source.fps, pipeline.detector)
     
-    video_writer = visualization.setup_video_writer(config.OUTPUT_VIDEO_PATH, width, height, int(fps))
+    video_writer = visualization.setup_video_writer(output_video_path, width, height, int(fps))
 
-    all_tracks_data = {} # {track_id: {frames: [], ...}}
-    detected_anomalies = []
+    # Live Prometheus endpoint: the loop only bumps counters, the text is built when scraped
+    metrics, metrics_server = None, None
+    metrics_port = metrics_port or config.METRICS_PORT
+    if metrics_port:
+        metrics = PipelineMetrics(pipeline, source, controller)
+        metrics_server = MetricsServer(metrics, metrics_port)
 
     # 2. Main Processing Loop
     print("🔄 Processing frames...")
     pbar = tqdm(total=total_frames)
+    first_frame = True
     
-    frame_idx = 0
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-
-        # S. Stabilization
-        frame = stabilizer.stabilize(frame)
+    for frame_idx, frame in source:
+        timestamp = source.timestamp # Capture time, kept even when frames are dropped
 
-        # A. Detection
-        detections = detector.detect(frame)
+        # Under load the latency controller may drop the frame entirely
+        if controller is not None and controller.should_drop(source.backlog()):
+            pbar.update(1)
+            continue
+        start_time = time.perf_counter()
 
-        # B. Tracking
-        tracked_detections = tracker.update(detections)       
-
-        # C. Lane Assignment
-        lane_assignments = lane_assigner.assign(tracked_detections)
-
-        # D. Anomaly Detection
-        frame_anomalies, current_speeds = anomaly_detector.analyze(tracked_detections, lane_assignments)
-        detected_anomalies.extend(frame_anomalies)
-        
-        # Update Evaluation Stats
-        evaluator.update(tracked_detections, frame_anomalies, frame_idx, current_speeds)
+        # S-D. Stabilization, Detection, Tracking, Lanes, Anomalies, Evaluation
+        detect = controller is None or controller.should_detect()
+        frame, tracked_detections, lane_assignments, frame_anomalies = pipeline.process_frame(frame, frame_idx, timestamp, detect)
 
         # E. Visualization
-        annotated_frame = visualization.draw_frame(frame, tracked_detections, lane_assignments, frame_anomalies)
-        video_writer.write(annotated_frame)
-
-        # F. Data Collection (for evaluation/export)
-        # Store basic info if needed
-        if tracked_detections.tracker_id is not None:
-             for tid in tracked_detections.tracker_id:
-                  all_tracks_data[int(tid)] = all_tracks_data.get(int(tid), 0) + 1 # Just counting frames for now
+        render_start = time.perf_counter()
+        rendered = controller is None or controller.should_render()
+        if rendered:
+            frame = visualization.draw_frame(frame, tracked_detections, lane_assignments, frame_anomalies, pipeline.scene)
+        video_writer.write(frame)
 
+        end_time = time.perf_counter()
+        if controller is not None:
+            controller.update(end_time - start_time, source.backlog())
+        if metrics is not None:
+            metrics.record_frame(end_time - start_time, pipeline.stage_seconds, end_time - render_start if rendered else None)
         pbar.update(1)
-        frame_idx += 1
 
+        if first_frame:
+            timer.mark("First frame")
+            first_frame = False
 
-    cap.release()
+        # Periodic checkpoint: state after this frame, written in the background
+        frames_done += 1
+        if checkpoint_writer is not None and frames_done % config.CHECKPOINT_INTERVAL_FRAMES == 0:
+            checkpoint_writer.save({
+                'video_path': video_path,
+                'next_frame': frame_idx + source.stride,
+                'end_frame': end_frame,
+                'stride': source.stride,
+                'frames_done': frames_done,
+                'output_videos': output_videos,
+                'pipeline': pipeline_state(pipeline),
+            })
+
+    source.release()
     video_writer.release()
     pbar.close()
+    if checkpoint_writer is not None:
+        checkpoint_writer.close()
+    if metrics_server is not None:
+        metrics_server.close()
 
     # 3. Post-Processing & Evaluation
     print("📊 Generating reports...")
-    evaluator.generate_report(all_tracks_data)
-    
-    # 4. Save Results
-    print(f"💾 Saving results to {config.RESULTS_DIR}...")
-    with open(config.TRACKING_RESULTS_PATH, 'w') as f:
-        json.dump(all_tracks_data, f, indent=4)
-    
-    pd.DataFrame(detected_anomalies).to_csv(config.ANOMALY_RESULTS_PATH, index=False)
+    timer.report()
+    print("\n--- CPU THREADS ---")
+    print(format_thread_plan(thread_plan))
+    if controller is not None:
+        controller.report()
+    if is_live_source(video_path):
+        print(f"Live capture: {source.captured} frames captured, {source.dropped} dropped by backpressure")
+    save_results(pipeline)
+
+    # The run finished: its checkpoint must not be resumed again
+    if checkpoint_writer is not None and os.path.exists(config.CHECKPOINT_PATH):
+        os.remove(config.CHECKPOINT_PATH)
     
-    print(f"✅ Analysis Complete! Video saved to {config.OUTPUT_VIDEO_PATH}")
+    print(f"✅ Analysis Complete! Video saved to {', '.join(output_videos)}")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Intersection traffic analysis.")
+    parser.add_argument("--video", type=str, default=None, help="Input video file, image folder, stream URL or device index (default: config.VIDEO_PATH)")
+    parser.add_argument("--start", type=int, default=0, help="First frame to process")
+    parser.add_argument("--end", type=int, default=None, help="Frame to stop before (default: end of input)")
+    parser.add_argument("--stride", type=int, default=1, help="Process every N-th frame")
+    parser.add_argument("--shards", type=int, default=1, help="Split the input into N overlapping time shards processed in parallel (no video output)")
+    parser.add_argument("--processes", action="store_true", help="Run decoding, analytics and rendering in separate processes sharing frames through shared memory")
+    parser.add_argument("--resume", action="store_true", help="Continue an interrupted run from its last checkpoint (config.CHECKPOINT_PATH)")
+    parser.add_argument("--bundle", type=str, default=None, help="Compiled scene bundle with lanes, zones, homography and lookup tables (see tools/draw_lanes.py --bundle)")
+    parser.add_argument("--cpu-slots", type=int, default=None, help="Processes sharing this node's cores (default: config.CPU_SLOTS)")
+    parser.add_argument("--cpu-slot", type=int, default=None, help="Slot of this process, 0 .. cpu-slots - 1 (default: config.CPU_SLOT)")
+    parser.add_argument("--pin", action="store_true", default=None, help="Pin this process to the cores of its slot (Linux)")
+    parser.add_argument("--metrics-port", type=int, default=None, help="Serve live Prometheus metrics on this port (default: config.METRICS_PORT)")
+    parser.add_argument("--streams", type=str, default=None, help="JSON file listing camera streams to process together (no video output)")
+    args = parser.parse_args()
+
+    main(args.video, args.start, args.end, args.stride, args.shards, args.streams, args.processes, args.resume, args.bundle,
+         args.cpu_slots, args.cpu_slot, args.pin, args.metrics_port)
@@ -0,0 +1,157 @@
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from utils import config
+
+# Upper bounds (s) of the latency histogram buckets, as Prometheus `le` labels
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+STAGES = ['stabilize', 'detect', 'track', 'lanes', 'anomalies', 'evaluate', 'render', 'frame']
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+class LatencyHistogram:
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        """
+        Fixed-bucket histogram. observe() is a bisect and three increments done by the processing thread only,
+        so it needs no lock; a scrape may see one frame more in the buckets than in the sum, which is harmless.
+        """
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1) # Last one: above the largest bucket (+Inf)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+
+class PipelineMetrics:
+    def __init__(self, pipeline, source=None, controller=None):
+        """
+        Live metrics of a main.py run. The main loop only bumps counters (record_frame); everything else
+        (active tracks, lane occupancy, anomaly counts, dropped frames) is read from the pipeline, the frame
+        source and the latency controller when the endpoint is scraped.
+        Args:
+            pipeline (TrafficPipeline): Pipeline whose stage timings, tracks and Evaluator counters are exported.
+            source: Frame source (live sources report frames dropped by backpressure).
+            controller (LatencyController): Reports frames dropped under load.
+        """
+        self.pipeline = pipeline
+        self.source = source
+        self.controller = controller
+        self.started = time.perf_counter()
+        self.frames_processed = 0
+        self.latency = {stage: LatencyHistogram() for stage in STAGES}
+
+    def record_frame(self, frame_seconds, stage_seconds, render_seconds=None):
+        """
+        Called once per processed frame by the main loop.
+        Args:
+            frame_seconds (float): Wall time of the whole frame.
+            stage_seconds (dict): {stage: seconds} of the pipeline stages that ran (TrafficPipeline.stage_seconds).
+            render_seconds (float): Drawing + writing time, if the frame was rendered.
+        """
+        self.frames_processed += 1
+        for stage, seconds in stage_seconds.items():
+            self.latency[stage].observe(seconds)
+        if render_seconds is not None:
+            self.latency['render'].observe(render_seconds)
+        self.latency['frame'].observe(frame_seconds)
+
+    def lane_occupancy(self):
+        """{lane_id: tracks currently in the lane} for the tracks of the last detection frame."""
+        tracked_detections, lane_assignments = self.pipeline.last_result
+        occupancy = {lane_id: 0 for lane_id in self.pipeline.settings.LANE_POLYGONS}
+        if tracked_detections.tracker_id is None:
+            return occupancy
+        for tracker_id in tracked_detections.tracker_id:
+            lane_id = lane_assignments.get(int(tracker_id), {}).get('current_lane')
+            if lane_id is not None:
+                occupancy[lane_id] = occupancy.get(lane_id, 0) + 1
+        return occupancy
+
+    def render(self):
+        """Prometheus text exposition of the current values."""
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ','.join(f'{key}="{escape_label(label)}"' for key, label in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+
+        elapsed = time.perf_counter() - self.started
+        evaluator = self.pipeline.evaluator
+        tracked_detections, _ = self.pipeline.last_result
+        lane_names = self.pipeline.settings.LANE_NAMES
+
+        metric('traffic_frames_processed_total', 'counter', "Frames processed by the main loop.",
+               [({}, self.frames_processed)])
+        metric('traffic_effective_fps', 'gauge', "Frames processed per second since the start of the run.",
+               [({}, round(self.frames_processed / elapsed, 3) if elapsed > 0 else 0.0)])
+
+        dropped = []
+        if self.controller is not None:
+            dropped.append(({'reason': 'latency_control'}, self.controller.dropped_frames))
+        if hasattr(self.source, 'dropped'):
+            dropped.append(({'reason': 'backpressure'}, self.source.dropped))
+        metric('traffic_dropped_frames_total', 'counter', "Frames dropped before processing.", dropped)
+
+        lines.append("# HELP traffic_stage_latency_seconds Processing time per pipeline stage.")
+        lines.append("# TYPE traffic_stage_latency_seconds histogram")
+        for stage, histogram in self.latency.items():
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + ('+Inf',), list(histogram.counts)):
+                cumulative += count
+                lines.append(f'traffic_stage_latency_seconds_bucket{{stage="{stage}",le="{bound}"}} {cumulative}')
+            lines.append(f'traffic_stage_latency_seconds_sum{{stage="{stage}"}} {histogram.sum}')
+            lines.append(f'traffic_stage_latency_seconds_count{{stage="{stage}"}} {cumulative}')
+
+        active = 0 if tracked_detections.tracker_id is None else len(tracked_detections.tracker_id)
+        metric('traffic_active_tracks', 'gauge', "Tracks in the last detection frame.", [({}, active)])
+        metric('traffic_tracks_total', 'counter', "Distinct track IDs seen.", [({}, len(evaluator.total_tracks))])
+        metric('traffic_lane_occupancy', 'gauge', "Tracks currently in each lane.",
+               [({'lane': lane_id, 'name': lane_names.get(lane_id, f"Lane {lane_id}")}, count)
+                for lane_id, count in self.lane_occupancy().items()])
+        metric('traffic_lane_queue_meters', 'gauge', "Queue of stopped vehicles in each lane (m).",
+               [({'lane': lane_id, 'name': lane_names.get(lane_id, f"Lane {lane_id}")}, round(length, 1))
+                for lane_id, (_, length) in self.pipeline.anomaly_detector.queues.lane_queues().items()])
+        metric('traffic_anomalies_total', 'counter', "Unique anomalies (track, type) detected.",
+               [({'type': anomaly_type}, count) for anomaly_type, count in dict(evaluator.anomalies_counts).items()])
+        return '\n'.join(lines) + '\n'
+
+def make_handler(metrics):
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?')[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = metrics.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass # Scrapes every few seconds would flood the console
+
+    return MetricsHandler
+
+class MetricsServer:
+    def __init__(self, metrics, port=config.METRICS_PORT, host=config.METRICS_HOST):
+        """Serves http://host:port/metrics from a daemon thread; the processing loop never waits for it."""
+        self.server = ThreadingHTTPServer((host, port), make_handler(metrics))
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, name="metrics-server", daemon=True)
+        self.thread.start()
+        print(f"📈 Metrics on http://{host}:{self.server.server_port}/metrics")
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,90 @@
+import cv2
+import numpy as np
+from utils import config
+
+class MotionGate:
+    def __init__(self, lane_polygons=None, settings=config):
+        """
+        Cheap motion check run before the detector. A running-average background model on a downscaled
+        gray frame, restricted to the lane polygons, tells whether anything moved on the road.
+        Args:
+            lane_polygons (dict): Lane polygons in full-frame pixels (defaults to the settings' LANE_POLYGONS).
+            settings: Scene settings (utils.config or a config.scene_settings() copy).
+        """
+        self.settings = settings
+        self.lane_polygons = settings.LANE_POLYGONS if lane_polygons is None else lane_polygons
+        self.scale = self.settings.MOTION_GATE_SCALE
+        self.background = None # float32 running average (plain array, so the gate state can be pickled)
+        self.mask = None       # bool lane ROI at the downscaled resolution
+        self.roi_pixels = 0
+
+        # Statistics
+        self.frames = 0
+        self.skipped = 0
+        self.audits = 0
+        self.audits_with_objects = 0
+        self.missed_objects = 0
+        self.skips_since_audit = 0
+
+    def _prepare(self, frame):
+        small = cv2.resize(frame, None, fx=self.scale, fy=self.scale, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def _build_mask(self, shape):
+        mask = np.zeros(shape, dtype=np.uint8)
+        for poly in self.lane_polygons.values():
+            pts = np.round(np.asarray(poly) * self.scale).astype(np.int32).reshape((-1, 1, 2))
+            cv2.fillPoly(mask, [pts], 1)
+        if not mask.any(): # No lanes configured: watch the whole frame
+            mask[:] = 1
+        self.mask = mask.astype(bool)
+        self.roi_pixels = int(self.mask.sum())
+
+    def has_motion(self, frame):
+        """
+        Updates the background model and returns True if enough lane pixels changed.
+        """
+        self.frames += 1
+        gray = self._prepare(frame)
+
+        if self.background is None:
+            self._build_mask(gray.shape)
+            self.background = gray.astype(np.float32)
+            return True
+
+        diff = cv2.absdiff(gray, cv2.convertScaleAbs(self.background))
+        moving = np.count_nonzero((diff > self.settings.MOTION_GATE_PIXEL_THRESHOLD) & self.mask)
+        cv2.accumulateWeighted(gray, self.background, self.settings.MOTION_GATE_LEARNING_RATE)
+
+        return moving > self.settings.MOTION_GATE_MIN_FRACTION * self.roi_pixels
+
+    def should_audit(self):
+        """
+        Every MOTION_GATE_AUDIT_INTERVAL-th skip the detector runs anyway, to measure what the gate misses.
+        """
+        if self.settings.MOTION_GATE_AUDIT_INTERVAL and self.skips_since_audit + 1 >= self.settings.MOTION_GATE_AUDIT_INTERVAL:
+            self.skips_since_audit = 0
+            return True
+        self.skips_since_audit += 1
+        return False
+
+    def record_skip(self):
+        self.skipped += 1
+
+    def record_audit(self, num_detections):
+        self.audits += 1
+        if num_detections > 0:
+            self.audits_with_objects += 1
+            self.missed_objects += num_detections
+
+    def report(self):
+        """Prints the skip rate and the missed-object statistics of the audits."""
+        skip_rate = self.skipped / self.frames if self.frames else 0.0
+        miss_rate = self.audits_with_objects / self.audits if self.audits else 0.0
+        print("\n--- MOTION GATE ---")
+        print(f"Inference skipped: {self.skipped}/{self.frames} frames ({skip_rate*100:.1f}%)")
+        print(f"Audited skips: {self.audits} | with objects: {self.audits_with_objects} ({miss_rate*100:.1f}%) | "
+              f"objects that would have been missed: {self.missed_objects}")
+        return {'frames': self.frames, 'skipped': self.skipped, 'skip_rate': skip_rate,
+                'audits': self.audits, 'audits_with_objects': self.audits_with_objects, 'missed_objects': self.missed_objects}
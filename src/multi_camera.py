@@ -0,0 +1,217 @@
+import collections
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import supervision as sv
+
+from utils import config
+from src.frame_source import open_frame_source
+from src.detection import VehicleDetector, scene_roi
+from src.pipeline import TrafficPipeline
+from utils.scene_bundle import apply_scene_bundle
+
+# Settings of the model call itself, which one shared detector can't vary per stream. CONFIDENCE_THRESHOLD and
+# TARGET_CLASSES can: the shared detector decodes at the lowest confidence of all streams and each stream's
+# detections are filtered with its own values.
+SHARED_DETECTOR_SETTINGS = ['MODEL_WEIGHTS', 'DETECTOR_BACKEND', 'DETECTOR_INPUT_SIZE', 'NMS_IOU_THRESHOLD',
+                            'DETECTION_ROI_MATCH_RESOLUTION']
+
+class StreamContext:
+    def __init__(self, name, source_path, detector, overrides=None, ground_truth_path=''):
+        """
+        Everything one camera needs: its frame source, its own copy of the scene settings
+        (lanes, zones, homography, FPS, thresholds) and its own pipeline stages. Only the detector is shared.
+        Args:
+            name (str): Stream name, also used as the results sub-folder.
+            source_path (str): Video file, image folder, stream URL or device index.
+            detector (VehicleDetector): Detector shared by all streams.
+            overrides (dict): Scene settings for this camera ({SETTING_NAME: value}, as in config.apply_overrides).
+            ground_truth_path (str): UA-DETRAC XML of the stream ('' = no evaluation).
+        """
+        self.name = name
+        self.source = open_frame_source(source_path)
+        self.settings = config.scene_settings(overrides)
+        self.settings.FPS = self.source.fps / self.source.stride
+        self.settings.RESULTS_DIR = os.path.join(config.RESULTS_DIR, name)
+        if self.settings.SCENE_BUNDLE_PATH:
+            apply_scene_bundle(self.settings.SCENE_BUNDLE_PATH, self.source.width, self.source.height, self.settings)
+
+        print(f"📷 Stream '{name}': {source_path} ({self.source.width}x{self.source.height} @ {self.source.fps} FPS)")
+        self.pipeline = TrafficPipeline(ground_truth_path, detector=detector, settings=self.settings,
+                                        od_output_path=os.path.join(self.settings.RESULTS_DIR, os.path.basename(config.OD_RESULTS_PATH)),
+                                        frame_size=(self.source.width, self.source.height),
+                                        heatmap_dir=os.path.join(self.settings.RESULTS_DIR, os.path.basename(config.HEATMAP_DIR)),
+                                        anomaly_output_path=os.path.join(self.settings.RESULTS_DIR, os.path.basename(config.ANOMALY_RESULTS_PATH)),
+                                        track_output_path=os.path.join(self.settings.RESULTS_DIR, os.path.basename(config.TRACKING_RESULTS_PATH)))
+        self.roi = scene_roi(self.settings)
+
+        self.frames = iter(self.source)
+        self.finished = False
+        self.pending = None # (frame_idx, timestamp, stabilized frame, gate) waiting for detections
+        self.frames_processed = 0
+
+    def read(self):
+        """
+        Decodes, stabilizes and gates the next frame (runs in a worker thread).
+        Returns:
+            bool: False once the stream has ended.
+        """
+        item = next(self.frames, None)
+        if item is None:
+            self.finished = True
+            self.pending = None
+            return False
+        frame_idx, frame = item
+        frame = self.pipeline.stabilizer.stabilize(frame)
+        self.pending = (frame_idx, self.source.timestamp, frame, self.pipeline.gate(frame))
+        return True
+
+    def needs_detection(self):
+        return self.pending[3] != 'skip'
+
+    def analyze(self, detections):
+        """Runs tracking, lanes, anomalies and evaluation on the pending frame (runs in a worker thread)."""
+        frame_idx, timestamp, _, gate = self.pending
+        self.pipeline.record_gate(gate, detections)
+        self.pipeline.process_detections(detections, frame_idx, timestamp)
+        self.pending = None
+        self.frames_processed += 1
+
+    def save(self):
+        """Closes the stream's anomaly CSV, track summaries, last origin-destination bin and heatmap in RESULTS_DIR/<name>."""
+        self.pipeline.od_aggregator.close(self.pipeline.lane_assigner)
+        if self.pipeline.heatmap is not None:
+            self.pipeline.heatmap.close()
+        self.pipeline.close_outputs()
+
+    def release(self):
+        self.source.release()
+
+class MultiCameraScheduler:
+    def __init__(self, streams, detector, workers=config.MULTI_CAMERA_WORKERS, batch_size=config.MULTI_CAMERA_BATCH_SIZE):
+        """
+        Runs many camera streams on one node in rounds. Each round, every active stream reads and gates a frame
+        in the worker pool, the frames that need it go through the shared detector in batches across streams,
+        and the per-stream tracking / analytics run in the worker pool again.
+        A stream's stages are only touched by one task at a time, so they need no locking.
+        Live streams keep dropping their oldest frames while a round waits for slower streams.
+        Args:
+            streams (list): StreamContext objects.
+            detector (VehicleDetector): The shared detector.
+            workers (int): Worker threads for the per-stream work.
+            batch_size (int): Maximum frames per detector call.
+        """
+        check_shared_detector(streams, detector)
+        self.streams = streams
+        self.detector = detector
+        self.batch_size = max(1, batch_size)
+        self.pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="stream")
+        self.rounds = 0
+        self.detector_calls = 0
+
+    def step(self):
+        """
+        Processes one frame of every active stream.
+        Returns:
+            int: Number of frames processed (0 once all streams have ended).
+        """
+        active = [stream for stream in self.streams if not stream.finished]
+        ready = [stream for stream, ok in zip(active, self.pool.map(StreamContext.read, active)) if ok]
+        if not ready:
+            return 0
+
+        detections = {}
+        to_detect = [stream for stream in ready if stream.needs_detection()]
+        for i in range(0, len(to_detect), self.batch_size):
+            batch = to_detect[i:i + self.batch_size]
+            outputs = self.detector.detect_batch([stream.pending[2] for stream in batch], [stream.roi for stream in batch],
+                                                 [stream.settings for stream in batch])
+            detections.update(zip(map(id, batch), outputs))
+            self.detector_calls += 1
+
+        list(self.pool.map(lambda stream: stream.analyze(detections.get(id(stream), sv.Detections.empty())), ready))
+        self.rounds += 1
+        return len(ready)
+
+    def run(self):
+        while self.step():
+            pass
+
+    def stop(self):
+        """Waits for the per-stream tasks still running, so the streams' results can be saved."""
+        self.pool.shutdown(wait=True)
+
+    def close(self):
+        self.stop()
+        for stream in self.streams:
+            stream.release()
+
+def check_shared_detector(streams, detector):
+    """Raises ValueError if a stream overrides a setting of the shared detector's model call."""
+    for stream in streams:
+        for name in SHARED_DETECTOR_SETTINGS:
+            if getattr(stream.settings, name) != getattr(detector.settings, name):
+                raise ValueError(f"Stream '{stream.name}' sets {name} = {getattr(stream.settings, name)!r}, but all "
+                                 f"streams share one detector ({name} = {getattr(detector.settings, name)!r}). "
+                                 f"Set it in utils/config.py for all streams instead.")
+
+def load_streams(streams_path):
+    """
+    Reads the streams file: {"streams": [{"name", "source", "config", "ground_truth"}, ...]}.
+    "config" is either a dict of scene settings or the path of a JSON file with them (as written for
+    tools/evaluate_dataset.py); "config" and "ground_truth" are optional.
+    Returns:
+        list: [(name, source, overrides, ground_truth_path), ...]
+    """
+    with open(streams_path) as f:
+        spec = json.load(f)
+    entries = spec['streams'] if isinstance(spec, dict) else spec
+    base_dir = os.path.dirname(os.path.abspath(streams_path))
+
+    streams = []
+    names = collections.Counter()
+    for i, entry in enumerate(entries):
+        name = entry.get('name') or f"stream_{i}"
+        names[name] += 1
+        overrides = entry.get('config') or {}
+        if isinstance(overrides, str):
+            with open(os.path.join(base_dir, overrides)) as f:
+                overrides = json.load(f)
+        streams.append((name, entry['source'], overrides, entry.get('ground_truth') or ''))
+
+    duplicates = [name for name, count in names.items() if count > 1]
+    if duplicates:
+        raise ValueError(f"Duplicate stream names in {streams_path}: {duplicates}")
+    return streams
+
+def run_multi_camera(streams_path, workers=config.MULTI_CAMERA_WORKERS, batch_size=config.MULTI_CAMERA_BATCH_SIZE):
+    """
+    Serves all streams of a streams file from this process with one shared detector.
+    Writes per-stream results to RESULTS_DIR/<name>. No output video is rendered in this mode.
+    """
+    specs = load_streams(streams_path)
+    # Decode at the lowest confidence any stream asks for; each stream's own threshold is applied after the batch
+    confidence = min(float(overrides.get('CONFIDENCE_THRESHOLD', config.CONFIDENCE_THRESHOLD)) for _, _, overrides, _ in specs)
+    detector = VehicleDetector(config.MODEL_WEIGHTS, settings=config.scene_settings({'CONFIDENCE_THRESHOLD': confidence}))
+    streams = [StreamContext(name, source, detector, overrides, ground_truth) for name, source, overrides, ground_truth in specs]
+    scheduler = MultiCameraScheduler(streams, detector, workers, batch_size)
+
+    print(f"🎥 Processing {len(streams)} streams ({workers} workers, detector batches of up to {batch_size})...")
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        print("⏹️ Interrupted, saving what was processed so far...")
+    finally:
+        scheduler.stop()
+
+    # Results first: releasing a stalled live source must not cost the other streams' results
+    try:
+        for stream in streams:
+            print(f"\n=== Stream '{stream.name}': {stream.frames_processed} frames ===")
+            stream.pipeline.evaluator.generate_report(stream.pipeline.tracks_seen)
+            stream.save()
+    finally:
+        scheduler.close()
+    print(f"\nRounds: {scheduler.rounds} | Detector calls: {scheduler.detector_calls}")
+    return streams
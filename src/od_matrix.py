@@ -0,0 +1,92 @@
+import collections
+
+from src.output_writers import CSVWriter
+from utils import config
+
+OD_COLUMNS = ['bin_start', 'bin_end', 'entry_lane', 'exit_lane', 'count']
+
+def lane_path(lane_runs):
+    """Lanes a track went through, in order, from its run-length lane sequence (outside-lane runs dropped)."""
+    path = []
+    for lane_id, _ in lane_runs:
+        if lane_id is not None and (not path or path[-1] != lane_id):
+            path.append(lane_id)
+    return path
+
+class ODAggregator:
+    def __init__(self, settings=config, output_path=None):
+        """
+        Online origin-destination (turning movement) counts. Tracks not seen by the LaneAssigner for
+        OD_TRACK_TIMEOUT_FRAMES detection frames are ended: their entry -> exit pair is counted and their
+        assignment is evicted. Counts are kept per OD_BIN_SECONDS time bin; a bin is handed to a CSVWriter
+        for output_path as soon as the stream time leaves it, so memory stays at one counter per lane pair.
+        A track is counted in the bin where its end is detected (at most the timeout after it left).
+        Args:
+            settings: Scene settings (FPS, bin size, timeout).
+            output_path (str): Streaming CSV of the binned counts (None = only the in-memory totals).
+        """
+        self.settings = settings
+        self.output_path = output_path
+        self.bin_seconds = settings.OD_BIN_SECONDS
+        self.track_timeout = settings.OD_TRACK_TIMEOUT_FRAMES or settings.TRACK_BUFFER
+        self.matrix = collections.Counter()      # {(entry_lane, exit_lane): tracks} over the whole run
+        self.transitions = collections.Counter() # {(from_lane, to_lane): lane changes}
+        self.bin_index = None                    # Index of the open time bin
+        self.bin_counts = collections.Counter()  # {(entry_lane, exit_lane): tracks} of the open bin
+        self.unassigned_tracks = 0               # Ended tracks that never entered a lane
+        self.writer = CSVWriter(output_path, OD_COLUMNS, settings) if output_path else None
+
+    def stream_time(self, frame_idx, timestamp=None):
+        return timestamp if timestamp is not None else frame_idx / self.settings.FPS
+
+    def update(self, lane_assigner, frame_idx, timestamp=None):
+        """Ends the stale tracks of the LaneAssigner and rolls the time bin over. Called once per detection frame."""
+        now = self.stream_time(frame_idx, timestamp)
+        bin_index = int(now // self.bin_seconds)
+        if self.bin_index is None:
+            self.bin_index = bin_index
+        elif bin_index != self.bin_index:
+            self.flush_bin()
+            self.bin_index = bin_index
+
+        for assignment in lane_assigner.end_stale_tracks(self.track_timeout).values():
+            self.count_track(assignment)
+
+    def count_track(self, assignment):
+        path = lane_path(assignment['lane_runs'])
+        if not path:
+            self.unassigned_tracks += 1
+            return
+        pair = (path[0], path[-1])
+        self.matrix[pair] += 1
+        self.bin_counts[pair] += 1
+        self.transitions.update(zip(path[:-1], path[1:]))
+
+    def flush_bin(self):
+        """Writes the open bin's counts to the CSV and clears them."""
+        if self.writer is not None and self.bin_index is not None:
+            start = self.bin_index * self.bin_seconds
+            self.writer.write_rows({'bin_start': start, 'bin_end': start + self.bin_seconds, 'entry_lane': entry,
+                                    'exit_lane': exit_, 'count': count}
+                                   for (entry, exit_), count in sorted(self.bin_counts.items()))
+        self.bin_counts.clear()
+
+    def close(self, lane_assigner):
+        """Ends all remaining tracks and writes the last (partial) bin."""
+        for assignment in lane_assigner.end_stale_tracks(-1).values():
+            self.count_track(assignment)
+        self.flush_bin()
+        if self.writer is not None:
+            self.writer.close()
+
+    def report(self, lane_names=None):
+        lane_names = lane_names or self.settings.LANE_NAMES
+        print("\n--- ORIGIN-DESTINATION COUNTS ---")
+        for (entry, exit_), count in self.matrix.most_common():
+            print(f"{lane_names.get(entry, entry)} -> {lane_names.get(exit_, exit_)}: {count}")
+        print(f"Tracks never in a lane: {self.unassigned_tracks}")
+        if self.transitions:
+            changes = ', '.join(f"{lane_names.get(a, a)} -> {lane_names.get(b, b)}: {n}" for (a, b), n in self.transitions.most_common(5))
+            print(f"Most frequent lane changes: {changes}")
+        if self.output_path:
+            print(f"Binned counts ({self.bin_seconds // 60:g} min): {self.output_path}")
@@ -0,0 +1,181 @@
+import csv
+import io
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from utils import config
+
+ANOMALY_COLUMNS = ['type', 'id', 'value', 'bbox', 'frame', 'timestamp']
+
+def json_value(value):
+    """NumPy scalars / arrays as plain Python values (json.dumps default)."""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+class StreamingWriter:
+    def __init__(self, path, settings=config):
+        """
+        Appends rows to a file while the pipeline runs. write() only adds the row to an in-memory buffer; a
+        background thread formats and writes the buffer every OUTPUT_FLUSH_SECONDS, and the caller flushes itself
+        when OUTPUT_BUFFER_ROWS are waiting, so memory stays bounded even if the disk is slow.
+        With OUTPUT_ROTATE_BYTES / OUTPUT_ROTATE_SECONDS the file is rotated: the full file is renamed to
+        <stem>.0001<ext>, <stem>.0002<ext>, ... and a new one is started at path.
+        The file is opened on the first flush, so a checkpoint position can be restored before that.
+        Args:
+            path (str): Output file.
+            settings: Flush / rotation settings.
+        """
+        self.path = path
+        self.flush_seconds = settings.OUTPUT_FLUSH_SECONDS
+        self.buffer_rows = settings.OUTPUT_BUFFER_ROWS
+        self.rotate_bytes = settings.OUTPUT_ROTATE_BYTES
+        self.rotate_seconds = settings.OUTPUT_ROTATE_SECONDS
+        self.buffer = []
+        self.buffer_lock = threading.Lock()
+        self.file_lock = threading.Lock() # One flush at a time (background thread or caller)
+        self.file = None
+        self.opened_at = None
+        self.rotations = 0 # Files rotated out so far
+        self.rows_written = 0
+        self.resume_position = None
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self._run, name=f"writer-{os.path.basename(path)}", daemon=True)
+        self.thread.start()
+
+    def header(self):
+        """Text written at the start of every file."""
+        return ''
+
+    def format_rows(self, rows):
+        raise NotImplementedError
+
+    def write(self, row):
+        with self.buffer_lock:
+            self.buffer.append(row)
+            full = len(self.buffer) >= self.buffer_rows
+        if full:
+            self.flush()
+
+    def write_rows(self, rows):
+        for row in rows:
+            self.write(row)
+
+    def _run(self):
+        while not self.stopped.wait(self.flush_seconds):
+            self.flush(create=False)
+
+    def flush(self, create=True):
+        """
+        Writes the buffered rows (rotating first if the file is due).
+        Args:
+            create (bool): Open the file even without rows. The background thread doesn't, so a resumed run
+                           can restore() its checkpoint position while the pipeline is still starting.
+        """
+        with self.file_lock:
+            with self.buffer_lock:
+                rows, self.buffer = self.buffer, []
+            if self.file is None:
+                if not rows and not create:
+                    return
+                self._open()
+            if rows:
+                if self._rotation_due():
+                    self._rotate()
+                self.file.write(self.format_rows(rows))
+                self.rows_written += len(rows)
+            self.file.flush()
+
+    def _rotation_due(self):
+        if self.rotate_bytes and self.file.tell() >= self.rotate_bytes:
+            return True
+        return bool(self.rotate_seconds) and time.time() - self.opened_at >= self.rotate_seconds
+
+    def rotated_path(self, index):
+        stem, ext = os.path.splitext(self.path)
+        return f"{stem}.{index:04d}{ext}"
+
+    def _rotate(self):
+        self.file.close()
+        self.rotations += 1
+        os.replace(self.path, self.rotated_path(self.rotations))
+        self._start_file()
+
+    def _start_file(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        self.file = open(self.path, 'w', newline='', encoding='utf-8')
+        self.file.write(self.header())
+        self.opened_at = time.time()
+
+    def _open(self):
+        if self.resume_position is None:
+            self._start_file()
+            return
+        # Back to the state of the checkpoint: drop the files rotated after it and the rows written after it
+        position = self.resume_position
+        if os.path.exists(self.rotated_path(position['rotations'] + 1)): # The file open at the checkpoint
+            os.replace(self.rotated_path(position['rotations'] + 1), self.path)
+        index = position['rotations'] + 2
+        while os.path.exists(self.rotated_path(index)):
+            os.remove(self.rotated_path(index))
+            index += 1
+        if not os.path.exists(self.path):
+            self._start_file()
+            return
+        self.file = open(self.path, 'r+', newline='', encoding='utf-8')
+        self.file.seek(position['offset'])
+        self.file.truncate()
+        self.opened_at = time.time()
+
+    def position(self):
+        """Flushes and returns where the output stands, for a checkpoint."""
+        self.flush()
+        return {'rotations': self.rotations, 'offset': self.file.tell(), 'rows': self.rows_written}
+
+    def restore(self, position):
+        """Continues the output of a checkpointed run at position (before anything is written)."""
+        self.resume_position = position
+        self.rotations = position['rotations']
+        self.rows_written = position['rows']
+
+    def close(self):
+        self.stopped.set()
+        self.thread.join()
+        self.flush()
+        self.file.close()
+
+class CSVWriter(StreamingWriter):
+    def __init__(self, path, columns, settings=config):
+        """Streaming CSV with a fixed header; missing values are written as empty cells."""
+        self.columns = list(columns)
+        super().__init__(path, settings)
+
+    def header(self):
+        return self.format_rows([dict(zip(self.columns, self.columns))])
+
+    def format_rows(self, rows):
+        text = io.StringIO()
+        writer = csv.writer(text)
+        for row in rows:
+            writer.writerow(['' if row.get(column) is None else format_cell(row[column]) for column in self.columns])
+        return text.getvalue()
+
+class JSONLWriter(StreamingWriter):
+    """Streaming JSON Lines: one JSON object per row."""
+
+    def format_rows(self, rows):
+        return ''.join(json.dumps(row, default=json_value) + '\n' for row in rows)
+
+def format_cell(value):
+    """CSV text of a value: boxes as [x1, y1, x2, y2] rounded to 0.1 px, floats to 3 decimals."""
+    if isinstance(value, (np.ndarray, list, tuple)):
+        return '[' + ', '.join(f"{float(v):.1f}" for v in value) + ']'
+    if isinstance(value, (float, np.floating)):
+        return f"{float(value):.3f}".rstrip('0').rstrip('.')
+    return value
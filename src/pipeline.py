@@ -0,0 +1,210 @@
+import time
+
+import supervision as sv
+from utils import config
+from src.detection import VehicleDetector
+from src.tracking import TrafficTracker
+from src.lane_assignment import LaneAssigner
+from src.od_matrix import ODAggregator
+from src.heatmap import OccupancyHeatmap
+from src.anomaly_detection import AnomalyDetector
+from src.evaluation import Evaluator
+from src.stabilization import VideoStabilizer
+from src.motion_gate import MotionGate
+from src.output_writers import ANOMALY_COLUMNS, CSVWriter, JSONLWriter
+from utils.scene_bundle import load_scene_bundle
+
+class TrafficPipeline:
+    def __init__(self, ground_truth_path=None, detector=None, load_detector=True, settings=config, od_output_path=None,
+                 frame_size=None, heatmap_dir=None, anomaly_output_path=None, track_output_path=None):
+        """
+        Bundles the per-frame stages (stabilization, detection, tracking, lane assignment,
+        anomaly detection and evaluation) so they can be driven by main.py or by batch tools.
+        Args:
+            ground_truth_path (str): UA-DETRAC XML for the sequence (defaults to the settings' GROUND_TRUTH_PATH).
+            detector (VehicleDetector): Optional pre-loaded detector to share the model weights.
+            load_detector (bool): Set to False to only run the post-detection stages (e.g. on cached detections).
+            settings: Scene settings (lanes, zones, homography, FPS, thresholds) for every stage.
+                      Defaults to the utils.config module; use config.scene_settings() for one of several cameras.
+            od_output_path (str): CSV the time-binned origin-destination counts are streamed to (None = not written).
+            frame_size (tuple): (width, height) of the frames; with heatmap_dir, enables the occupancy heatmap.
+            heatmap_dir (str): Folder of the heatmap snapshots and per-lane density CSV.
+            anomaly_output_path (str): CSV the anomalies are streamed to (None = only returned per frame).
+            track_output_path (str): JSONL a summary of each finished track is streamed to (None = not written).
+        """
+        print("▶️ Initializing modules...")
+        if detector is None and load_detector:
+            detector = VehicleDetector(settings.MODEL_WEIGHTS, settings=settings)
+        self.settings = settings
+        self.scene = load_scene_bundle(settings.SCENE_BUNDLE_PATH) if settings.SCENE_BUNDLE_PATH else None
+        self.detector = detector
+        self.tracker = TrafficTracker(settings)
+        self.lane_assigner = LaneAssigner(settings.LANE_POLYGONS, self.scene)
+        self.od_aggregator = ODAggregator(settings, od_output_path)
+        self.heatmap = None
+        if settings.HEATMAP_ENABLED and frame_size is not None and heatmap_dir:
+            self.heatmap = OccupancyHeatmap(*frame_size, settings, heatmap_dir)
+        self.anomaly_detector = AnomalyDetector(settings, self.scene)
+        self.evaluator = Evaluator(ground_truth_path, settings)
+        self.stabilizer = VideoStabilizer()
+        self.motion_gate = MotionGate(settings=settings) if settings.MOTION_GATE_ENABLED and self.detector is not None else None
+
+        # Streamed outputs: nothing is accumulated for the end of the run
+        self.anomaly_writer = CSVWriter(anomaly_output_path, ANOMALY_COLUMNS, settings) if anomaly_output_path else None
+        self.track_writer = JSONLWriter(track_output_path, settings) if track_output_path else None
+        self.active_tracks = {} # {track_id: summary} of the tracks the tracker still follows
+        self.tracks_seen = 0
+        self.last_result = (sv.Detections.empty(), {}) # (tracked_detections, lane_assignments) of the last detection frame
+        self.stage_seconds = {} # {stage: seconds} of the stages run on the last frame (live metrics)
+
+    def process_frame(self, frame, frame_idx, timestamp=None, detect=True, stabilize=True):
+        """
+        Runs all stages on a single frame.
+        Args:
+            timestamp (float): Capture time of the frame in seconds (used for speeds).
+            detect (bool): If False (detection stride under load), only stabilizes the frame and returns
+                           the tracks of the last detection frame without updating any state.
+            stabilize (bool): Set to False if the frame was already stabilized (e.g. by the decoder process).
+        Returns:
+            tuple: (stabilized_frame, tracked_detections, lane_assignments, frame_anomalies)
+        """
+        self.stage_seconds = {}
+
+        # S. Stabilization
+        if stabilize:
+            start = time.perf_counter()
+            frame = self.stabilizer.stabilize(frame)
+            self._lap('stabilize', start)
+
+        if not detect:
+            tracked_detections, lane_assignments = self.last_result
+            return frame, tracked_detections, lane_assignments, []
+
+        # A. Detection (skipped when the road is static and nothing is being tracked)
+        start = time.perf_counter()
+        gate = self.gate(frame)
+        detections = self.detector.detect(frame) if gate != 'skip' else sv.Detections.empty()
+        self.record_gate(gate, detections)
+        self._lap('detect', start)
+
+        tracked_detections, lane_assignments, frame_anomalies = self.process_detections(detections, frame_idx, timestamp)
+        return frame, tracked_detections, lane_assignments, frame_anomalies
+
+    def _lap(self, stage, start):
+        """Records the time since `start` as the stage's latency and returns the current time."""
+        now = time.perf_counter()
+        self.stage_seconds[stage] = now - start
+        return now
+
+    def gate(self, frame):
+        """
+        Motion gate decision for a stabilized frame.
+        Returns:
+            str: 'detect' (motion or active tracks), 'audit' (static, periodic check) or 'skip' (static).
+        """
+        if self.motion_gate is None or self.motion_gate.has_motion(frame) or self.tracker.has_active_tracks():
+            return 'detect'
+        return 'audit' if self.motion_gate.should_audit() else 'skip'
+
+    def record_gate(self, gate, detections):
+        """Updates the motion gate statistics once the frame's detections are known."""
+        if gate == 'audit':
+            self.motion_gate.record_audit(len(detections))
+        elif gate == 'skip':
+            self.motion_gate.record_skip()
+
+    def process_detections(self, detections, frame_idx, timestamp=None):
+        """
+        Runs the post-detection stages (tracking, lanes, anomalies, evaluation) on a frame's detections.
+        Returns:
+            tuple: (tracked_detections, lane_assignments, frame_anomalies)
+        """
+        start = time.perf_counter()
+
+        # B. Tracking
+        tracked_detections = self.tracker.update(detections)
+        start = self._lap('track', start)
+        for tid in self.tracker.events['ended']:
+            self.finish_track(tid)
+            self.anomaly_detector.end_track(tid)
+
+        # C. Lane Assignment
+        lane_assignments = self.lane_assigner.assign(tracked_detections)
+        self.od_aggregator.update(self.lane_assigner, frame_idx, timestamp)
+        if self.heatmap is not None:
+            self.heatmap.update(tracked_detections, self.lane_assigner.frame_lanes, frame_idx, timestamp)
+        start = self._lap('lanes', start)
+
+        # D. Anomaly Detection
+        frame_anomalies, current_speeds = self.anomaly_detector.analyze(tracked_detections, lane_assignments, timestamp)
+        for anomaly in frame_anomalies:
+            anomaly['frame'] = frame_idx
+            anomaly['timestamp'] = timestamp
+        if self.anomaly_writer is not None:
+            self.anomaly_writer.write_rows(frame_anomalies)
+        start = self._lap('anomalies', start)
+
+        # Update Evaluation Stats
+        self.evaluator.update(tracked_detections, frame_anomalies, frame_idx, current_speeds, self.lane_assigner.frame_lanes)
+        self._lap('evaluate', start)
+
+        # F. Per-track summaries, written when the track ends
+        if tracked_detections.tracker_id is not None:
+            for i, tid in enumerate(tracked_detections.tracker_id):
+                self.update_track(int(tid), int(tracked_detections.class_id[i]), lane_assignments.get(int(tid), {}), frame_idx, timestamp)
+
+        self.last_result = (tracked_detections, lane_assignments)
+        return tracked_detections, lane_assignments, frame_anomalies
+
+    def update_track(self, tid, class_id, assignment, frame_idx, timestamp):
+        if update_track_summary(self.active_tracks, tid, class_id, assignment, frame_idx, timestamp):
+            self.tracks_seen += 1
+
+    def finish_track(self, tid):
+        summary = self.active_tracks.pop(int(tid), None)
+        if summary is not None and self.track_writer is not None:
+            self.track_writer.write(summary)
+
+    def output_writers(self):
+        """{name: StreamingWriter} of the streamed outputs (None = not written)."""
+        return {'anomalies': self.anomaly_writer, 'tracks': self.track_writer, 'od': self.od_aggregator.writer,
+                'density': self.heatmap.writer if self.heatmap is not None else None}
+
+    def output_positions(self):
+        """{writer: position} of the streamed outputs, stored in checkpoints."""
+        return {name: writer.position() for name, writer in self.output_writers().items() if writer is not None}
+
+    def restore_outputs(self, positions):
+        """Truncates the streamed outputs back to a checkpoint's positions (called before the first frame)."""
+        writers = self.output_writers()
+        for name, position in positions.items():
+            if writers.get(name) is not None:
+                writers[name].restore(position)
+
+    def close_outputs(self):
+        """Writes the summaries of the tracks still followed and closes the streamed outputs."""
+        for tid in list(self.active_tracks):
+            self.finish_track(tid)
+        for writer in (self.anomaly_writer, self.track_writer):
+            if writer is not None:
+                writer.close()
+
+def update_track_summary(summaries, tid, class_id, assignment, frame_idx, timestamp):
+    """
+    Adds a frame to the summary of track tid in summaries (the records of tracks.jsonl).
+    Returns:
+        bool: True if the track is new.
+    """
+    summary = summaries.get(tid)
+    new = summary is None
+    if new:
+        summary = summaries[tid] = {
+            'id': tid, 'class_id': class_id, 'first_frame': frame_idx, 'first_timestamp': timestamp, 'frames': 0,
+        }
+    summary['last_frame'] = frame_idx
+    summary['last_timestamp'] = timestamp
+    summary['frames'] += 1
+    # Lanes are copied while the track is live: the LaneAssigner may evict it before the tracker ends it
+    summary['entry_lane'] = assignment.get('entry_lane')
+    summary['exit_lane'] = assignment.get('exit_lane')
+    return new
@@ -0,0 +1,134 @@
+import multiprocessing
+import queue
+
+from tqdm import tqdm
+
+from utils import config
+from utils.threads import apply_thread_plan, plan_threads
+from src.frame_source import open_frame_source
+from src.shm_ring import SharedFrameRing
+
+def decoder_process(ring_spec, source_path, start, end, stride, free_slots, decoded, thread_plan):
+    """
+    Decodes and stabilizes frames straight into free ring slots, then hands (slot, frame_idx, timestamp)
+    to the analytics process.
+    """
+    apply_thread_plan(thread_plan)
+    from src.stabilization import VideoStabilizer
+
+    ring = SharedFrameRing(**ring_spec)
+    stabilizer = VideoStabilizer()
+    try:
+        with open_frame_source(source_path, start=start, end=end, stride=stride) as source:
+            for frame_idx, frame in source:
+                slot = free_slots.get()
+                ring.slot(slot)[:] = stabilizer.stabilize(frame)
+                decoded.put((slot, frame_idx, source.timestamp))
+    finally:
+        decoded.put(None)
+        ring.close()
+
+def renderer_process(ring_spec, output_path, width, height, fps, rendered, free_slots, thread_plan, bundle_path=None):
+    """
+    Draws the analytics results on the slot's frame in place, writes it to the output video
+    and returns the slot to the free list.
+    """
+    apply_thread_plan(thread_plan)
+    from utils import visualization
+    from utils.scene_bundle import apply_scene_bundle
+
+    scene = apply_scene_bundle(bundle_path, width, height) if bundle_path else None
+    ring = SharedFrameRing(**ring_spec)
+    video_writer = visualization.setup_video_writer(output_path, width, height, int(fps))
+    try:
+        while True:
+            item = rendered.get()
+            if item is None:
+                break
+            slot, tracked_detections, lane_labels, frame_anomalies = item
+            frame = visualization.draw_frame(ring.slot(slot), tracked_detections, lane_labels, frame_anomalies, scene)
+            video_writer.write(frame)
+            free_slots.put(slot)
+    finally:
+        video_writer.release()
+        ring.close()
+
+def lane_labels(tracked_detections, lane_assignments):
+    """Entry / exit lanes of the frame's tracks only: all the renderer needs, instead of the full assignment history."""
+    if tracked_detections.tracker_id is None:
+        return {}
+    labels = {}
+    for tracker_id in tracked_detections.tracker_id:
+        assignment = lane_assignments.get(int(tracker_id), {})
+        labels[int(tracker_id)] = {'entry_lane': assignment.get('entry_lane'), 'exit_lane': assignment.get('exit_lane')}
+    return labels
+
+def run_process_pipeline(video_path, start_frame=0, end_frame=None, stride=1,
+                         num_slots=config.SHM_RING_SLOTS, stage_threads=config.PROCESS_STAGE_THREADS):
+    """
+    Runs decoding + stabilization, analytics (detection, tracking, lanes, anomalies, evaluation) and rendering
+    in three processes, so they use separate cores despite the GIL. Frames live in a SharedFrameRing;
+    only slot indices and small per-frame results go through the queues.
+    Returns:
+        TrafficPipeline: The analytics pipeline (tracks, anomalies, evaluator) after the run.
+    """
+    from src.pipeline import TrafficPipeline
+    from utils.scene_bundle import apply_scene_bundle
+
+    with open_frame_source(video_path, start=start_frame, end=end_frame, stride=stride) as probe:
+        width, height = probe.width, probe.height
+        fps = probe.fps / probe.stride
+        total_frames = probe.total_frames
+    config.FPS = fps
+    if config.SCENE_BUNDLE_PATH:
+        apply_scene_bundle(config.SCENE_BUNDLE_PATH, width, height)
+
+    pipeline = TrafficPipeline(config.GROUND_TRUTH_PATH, od_output_path=config.OD_RESULTS_PATH,
+                               frame_size=(width, height), heatmap_dir=config.HEATMAP_DIR,
+                               anomaly_output_path=config.ANOMALY_RESULTS_PATH, track_output_path=config.TRACKING_RESULTS_PATH)
+    if pipeline.detector is not None and config.DETECTOR_WARMUP_RUNS:
+        pipeline.detector.warmup((height, width, 3))
+
+    # Decoder and renderer: OpenCV / BLAS threads only, on the cores of this process's slot
+    stage_plan = plan_threads(detector_threads=1, opencv_threads=stage_threads, blas_threads=stage_threads)
+    context = multiprocessing.get_context('spawn')
+    free_slots, decoded, rendered = context.Queue(), context.Queue(), context.Queue()
+    with SharedFrameRing(num_slots, (height, width, 3)) as ring:
+        for slot in range(num_slots):
+            free_slots.put(slot)
+
+        decoder = context.Process(target=decoder_process, name="decoder", daemon=True,
+                                  args=(ring.spec(), video_path, start_frame, end_frame, stride, free_slots, decoded, stage_plan))
+        renderer = context.Process(target=renderer_process, name="renderer", daemon=True,
+                                   args=(ring.spec(), config.OUTPUT_VIDEO_PATH, width, height, fps, rendered, free_slots, stage_plan,
+                                         config.SCENE_BUNDLE_PATH))
+        decoder.start()
+        renderer.start()
+        print(f"🔀 Process pipeline: decoder / analytics / renderer, {num_slots} shared frame slots of {width}x{height}")
+
+        pbar = tqdm(total=total_frames)
+        try:
+            while True:
+                try:
+                    item = decoded.get(timeout=1.0)
+                except queue.Empty:
+                    if not decoder.is_alive() or not renderer.is_alive():
+                        raise RuntimeError("A pipeline process exited unexpectedly")
+                    continue
+                if item is None:
+                    break
+
+                slot, frame_idx, timestamp = item
+                _, tracked_detections, lane_assignments, frame_anomalies = pipeline.process_frame(
+                    ring.slot(slot), frame_idx, timestamp, stabilize=False)
+                rendered.put((slot, tracked_detections, lane_labels(tracked_detections, lane_assignments), frame_anomalies))
+                pbar.update(1)
+        finally:
+            pbar.close()
+            rendered.put(None)
+            renderer.join()
+            if decoder.is_alive():
+                decoder.terminate()
+            decoder.join()
+
+    return pipeline
@@ -0,0 +1,97 @@
+import cv2
+import numpy as np
+
+from utils.geometry import pixels_to_world
+
+LANE_ANOMALY_TYPES = ['CONGESTION'] # Anomalies whose 'id' is a lane id, not a track id
+
+def lane_axes(lane_polygons, to_world):
+    """
+    Unit direction (world coordinates) of each lane: the long side of the minimum-area rectangle
+    around its projected polygon. Returns an (max_lane_id + 1, 2) array indexed by lane id.
+    """
+    axes = np.zeros((max(lane_polygons, default=-1) + 1, 2))
+    for lane_id, poly in lane_polygons.items():
+        corners = cv2.boxPoints(cv2.minAreaRect(to_world(poly).astype(np.float32)))
+        edges = [corners[1] - corners[0], corners[2] - corners[1]]
+        axis = max(edges, key=np.linalg.norm)
+        norm = np.linalg.norm(axis)
+        axes[lane_id] = axis / norm if norm > 0 else (1.0, 0.0)
+    return axes
+
+class QueueEstimator:
+    def __init__(self, settings, scene=None):
+        """
+        Queue length per lane in meters: the span, along the lane direction, of the vehicles in the lane moving
+        slower than QUEUE_STOPPED_SPEED, plus one vehicle length. Computed once per frame with grouped array
+        operations (np.minimum.at / np.maximum.at / np.bincount), so the cost is linear in the tracks and
+        constant per lane. A lane whose queue stays above CONGESTION_QUEUE_LENGTH for CONGESTION_MIN_SECONDS
+        raises a CONGESTION anomaly with the lane id as 'id'.
+        Args:
+            settings: Scene settings (lanes, homography, thresholds). Only the values are kept, so the
+                      estimator can be checkpointed with the AnomalyDetector.
+            scene (SceneBundle): Compiled scene; its world coordinate map replaces the homography.
+        """
+        self.homography = settings.HOMOGRAPHY_MATRIX
+        self.calibration_factor = settings.CAMERA_CALIBRATION_FACTOR
+        self.stopped_speed = settings.QUEUE_STOPPED_SPEED
+        self.vehicle_length = settings.QUEUE_VEHICLE_LENGTH
+        self.congestion_length = settings.CONGESTION_QUEUE_LENGTH
+        self.congestion_seconds = settings.CONGESTION_MIN_SECONDS
+
+        self.lane_ids = np.array(sorted(settings.LANE_POLYGONS), dtype=np.int64)
+        self.axes = lane_axes(settings.LANE_POLYGONS, self.to_world)
+        self.num_labels = len(self.axes)
+        self.queue_lengths = np.zeros(self.num_labels)        # m, last frame
+        self.queued_vehicles = np.zeros(self.num_labels, dtype=np.int64)
+        self.congested_since = np.full(self.num_labels, np.nan) # Time each lane's queue went above the threshold
+        self.max_queue_lengths = np.zeros(self.num_labels)
+
+    def to_world(self, points, scene=None):
+        if scene is not None:
+            return scene.lookup(scene.world_map, points, np.nan).astype(np.float64)
+        if self.homography is not None:
+            return pixels_to_world(points, self.homography)
+        return np.asarray(points, dtype=np.float64).reshape(-1, 2) * self.calibration_factor
+
+    def update(self, feet, lanes, speeds, speed_known, timestamp, scene=None):
+        """
+        Args:
+            feet (np.ndarray): (N, 2) feet points (pixels) of the frame's tracks.
+            lanes (np.ndarray): (N,) lane id of each track (-1 = none).
+            speeds (np.ndarray): (N,) speeds in km/h.
+            speed_known (np.ndarray): (N,) bool, False for tracks too young for a speed estimate.
+            timestamp (float): Frame time in seconds.
+        Returns:
+            list: CONGESTION anomalies of the frame.
+        """
+        queued = (lanes >= 0) & (lanes < self.num_labels) & speed_known & (speeds < self.stopped_speed)
+        queue_lanes = lanes[queued]
+        world = self.to_world(feet[queued], scene)
+        valid = np.isfinite(world).all(axis=1)
+        queue_lanes, world = queue_lanes[valid], world[valid]
+
+        # Position of each queued vehicle along its lane, then the span per lane
+        position = np.einsum('ij,ij->i', world, self.axes[queue_lanes])
+        low = np.full(self.num_labels, np.inf)
+        high = np.full(self.num_labels, -np.inf)
+        np.minimum.at(low, queue_lanes, position)
+        np.maximum.at(high, queue_lanes, position)
+        self.queued_vehicles = np.bincount(queue_lanes, minlength=self.num_labels)
+        self.queue_lengths = np.where(self.queued_vehicles > 0, high - low + self.vehicle_length, 0.0)
+        self.max_queue_lengths = np.maximum(self.max_queue_lengths, self.queue_lengths)
+
+        congested = self.queue_lengths >= self.congestion_length
+        self.congested_since[~congested] = np.nan
+        self.congested_since[congested & np.isnan(self.congested_since)] = timestamp
+        sustained = congested & (timestamp - self.congested_since >= self.congestion_seconds)
+        return [{
+            'type': 'CONGESTION',
+            'id': int(lane_id),
+            'value': round(float(self.queue_lengths[lane_id]), 1),
+            'bbox': None
+        } for lane_id in np.flatnonzero(sustained)]
+
+    def lane_queues(self):
+        """{lane_id: (queued vehicles, queue length in m)} of the last frame."""
+        return {int(lane_id): (int(self.queued_vehicles[lane_id]), float(self.queue_lengths[lane_id])) for lane_id in self.lane_ids}
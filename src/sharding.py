@@ -0,0 +1,216 @@
+import collections
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import lap
+import numpy as np
+
+from utils import config
+from utils.geometry import box_iou_batch
+from utils.threads import available_cores, init_worker
+from src.output_writers import ANOMALY_COLUMNS, CSVWriter, JSONLWriter
+from src.queue_length import LANE_ANOMALY_TYPES
+
+def plan_shards(start, end, num_shards, overlap):
+    """
+    Splits the frame range [start, end) into contiguous shards. Every shard except the first also reads
+    the `overlap` frames before its own range, to warm up its tracker and to stitch IDs with its neighbour.
+    Returns:
+        list: [{'shard': i, 'read_start': int, 'own_start': int, 'own_end': int}, ...]
+    """
+    size = math.ceil((end - start) / num_shards)
+    shards = []
+    for i in range(num_shards):
+        own_start = start + i * size
+        own_end = min(end, own_start + size)
+        if own_start >= own_end:
+            break
+        shards.append({
+            'shard': i,
+            'read_start': max(start, own_start - overlap) if i > 0 else own_start,
+            'own_start': own_start,
+            'own_end': own_end,
+        })
+    return shards
+
+def process_shard(video_path, shard, fps, overlap, bundle_path=None):
+    """
+    Runs the full pipeline (own detector, tracker, lanes, anomalies) over one shard in a worker process.
+    Returns:
+        dict: Shard info plus 'boxes' (N, 6) [frame, track_id, x1, y1, x2, y2] of the overlap windows,
+              'anomalies' and 'tracks' ({track_id: summary}, as in tracks.jsonl) of the frames the shard owns.
+    """
+    from src.pipeline import TrafficPipeline, update_track_summary
+    from src.frame_source import open_frame_source
+    from utils.scene_bundle import apply_scene_bundle
+
+    config.FPS = fps
+    if bundle_path: # Spawned workers start from the default config
+        with open_frame_source(video_path) as probe:
+            apply_scene_bundle(bundle_path, probe.width, probe.height)
+    # No GT evaluation per shard: the overlap frames would be counted twice
+    pipeline = TrafficPipeline(ground_truth_path='')
+
+    tail_start = shard['own_end'] - overlap
+    boxes = []
+    anomalies = []
+    tracks = {}
+
+    with open_frame_source(video_path, start=shard['read_start'], end=shard['own_end']) as source:
+        for frame_idx, frame in source:
+            _, tracked_detections, lane_assignments, frame_anomalies = pipeline.process_frame(frame, frame_idx, source.timestamp)
+            owned = frame_idx >= shard['own_start']
+
+            if tracked_detections.tracker_id is not None and len(tracked_detections) > 0:
+                track_ids = np.asarray(tracked_detections.tracker_id)
+                # Keep boxes of the leading (warm-up) and trailing overlap windows for stitching
+                if not owned or frame_idx >= tail_start:
+                    boxes.append(np.column_stack([np.full(len(track_ids), frame_idx), track_ids, tracked_detections.xyxy]))
+                if owned:
+                    for tid, class_id in zip(track_ids.tolist(), np.asarray(tracked_detections.class_id).tolist()):
+                        update_track_summary(tracks, tid, class_id, lane_assignments.get(tid, {}), frame_idx, source.timestamp)
+
+            if owned:
+                anomalies.extend(frame_anomalies)
+
+    result = dict(shard)
+    result['boxes'] = np.concatenate(boxes) if boxes else np.zeros((0, 6))
+    result['anomalies'] = anomalies
+    result['tracks'] = tracks
+    return result
+
+def stitch_track_ids(previous, current):
+    """
+    Links the tracks of a shard to its predecessor using the frames both shards processed.
+    Per frame, boxes are matched one-to-one by IoU; each match is a vote for the (previous, current) ID pair.
+    The pairs are then chosen with a global assignment maximizing the votes.
+    Returns:
+        dict: {current_track_id: previous_track_id}
+    """
+    window = current['boxes'][current['boxes'][:, 0] < current['own_start']]
+    reference = previous['boxes'][previous['boxes'][:, 0] >= current['read_start']]
+    if len(window) == 0 or len(reference) == 0:
+        return {}
+
+    votes = collections.Counter()
+    for frame_idx in np.unique(window[:, 0]):
+        a = reference[reference[:, 0] == frame_idx]
+        b = window[window[:, 0] == frame_idx]
+        if len(a) == 0:
+            continue
+        ious = box_iou_batch(a[:, 2:], b[:, 2:])
+        _, a_to_b, _ = lap.lapjv(1.0 - ious, extend_cost=True, cost_limit=1.0 - config.SHARD_STITCH_IOU)
+        for i in np.nonzero(a_to_b >= 0)[0]:
+            votes[(int(a[i, 1]), int(b[a_to_b[i], 1]))] += 1
+
+    if not votes:
+        return {}
+
+    prev_ids = sorted({p for p, _ in votes})
+    curr_ids = sorted({c for _, c in votes})
+    counts = np.zeros((len(prev_ids), len(curr_ids)))
+    for (p, c), n in votes.items():
+        counts[prev_ids.index(p), curr_ids.index(c)] = n
+
+    _, row_to_col, _ = lap.lapjv(counts.max() - counts, extend_cost=True)
+    links = {}
+    for row, col in enumerate(row_to_col):
+        if col >= 0 and counts[row, col] >= config.SHARD_STITCH_MIN_VOTES:
+            links[curr_ids[col]] = prev_ids[row]
+    return links
+
+def merge_shards(results):
+    """
+    Assigns global track IDs across shards and merges their anomalies and track summaries.
+    Returns:
+        tuple: (anomalies list, {global_track_id: summary})
+    """
+    next_id = 1
+    previous_mapping = {}
+    anomalies = []
+    tracks = {}
+
+    for k, result in enumerate(results):
+        links = stitch_track_ids(results[k - 1], result) if k > 0 else {}
+        local_ids = set(result['tracks']) | {a['id'] for a in result['anomalies'] if a['type'] not in LANE_ANOMALY_TYPES}
+
+        mapping = {}
+        for local_id in sorted(local_ids):
+            linked = links.get(local_id)
+            if linked is not None and linked in previous_mapping:
+                mapping[local_id] = previous_mapping[linked]
+            else:
+                mapping[local_id] = next_id
+                next_id += 1
+
+        for local_id, summary in result['tracks'].items():
+            global_id = mapping[local_id]
+            if global_id in tracks:
+                merge_track_summary(tracks[global_id], summary)
+            else:
+                tracks[global_id] = dict(summary, id=global_id)
+        for anomaly in result['anomalies']:
+            if anomaly['type'] not in LANE_ANOMALY_TYPES: # Lane anomalies keep their lane id
+                anomaly['id'] = mapping[anomaly['id']]
+            anomalies.append(anomaly)
+
+        print(f"  Shard {result['shard']}: {len(local_ids)} tracks, {len(links)} stitched to the previous shard")
+        previous_mapping = mapping
+
+    return anomalies, tracks
+
+def merge_track_summary(summary, later):
+    """Extends the summary of a stitched track with its summary from the next shard."""
+    summary['frames'] += later['frames']
+    summary['last_frame'] = later['last_frame']
+    summary['last_timestamp'] = later['last_timestamp']
+    if summary['entry_lane'] is None:
+        summary['entry_lane'] = later['entry_lane']
+    if later['exit_lane'] is not None:
+        summary['exit_lane'] = later['exit_lane']
+
+def run_sharded(video_path, num_shards, start_frame=0, end_frame=None, overlap=config.SHARD_OVERLAP_FRAMES):
+    """
+    Processes a long video as N overlapping time shards in parallel processes and writes a single,
+    ID-consistent anomaly CSV and track JSONL. No output video is rendered in this mode.
+    """
+    from src.frame_source import open_frame_source
+
+    with open_frame_source(video_path, start=start_frame, end=end_frame) as source:
+        fps = source.fps
+        first = source.start
+        last = source.end
+        if source.total_frames is None: # The container doesn't report its length: the shards need it
+            print("ℹ️ Frame count not reported by the container, counting frames...")
+            last = first + source.count_frames()
+        elif last is None:
+            last = first + source.total_frames
+    if last <= first:
+        raise ValueError(f"No frames to shard in {video_path} (frames {first}-{last})")
+
+    shards = plan_shards(first, last, num_shards, overlap)
+    threads_per_shard = max(1, len(available_cores()) // len(shards))
+    print(f"🧩 Processing frames {first}-{last} as {len(shards)} shards ({threads_per_shard} threads each, {overlap} frames overlap)...")
+
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=len(shards), mp_context=context,
+                             initializer=init_worker, initargs=(len(shards), threads_per_shard)) as pool:
+        futures = [pool.submit(process_shard, video_path, shard, fps, overlap, config.SCENE_BUNDLE_PATH) for shard in shards]
+        results = [future.result() for future in futures]
+
+    print("🔗 Stitching track IDs across shards...")
+    anomalies, tracks = merge_shards(results)
+
+    print(f"💾 Saving results to {config.RESULTS_DIR}...")
+    anomaly_writer = CSVWriter(config.ANOMALY_RESULTS_PATH, ANOMALY_COLUMNS)
+    anomaly_writer.write_rows(anomalies)
+    anomaly_writer.close()
+    track_writer = JSONLWriter(config.TRACKING_RESULTS_PATH)
+    track_writer.write_rows(summary for _, summary in sorted(tracks.items()))
+    track_writer.close()
+
+    counts = collections.Counter(a['type'] for a in anomalies)
+    print(f"Total Unique Tracks: {len(tracks)}")
+    print(f"Anomaly detections: {dict(counts)}")
+    return anomalies, tracks
@@ -0,0 +1,55 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+
+class SharedFrameRing:
+    def __init__(self, num_slots, shape, dtype=np.uint8, name=None):
+        """
+        Fixed-size ring of frame buffers in one multiprocessing.shared_memory block.
+        Processes exchange slot indices (small ints) instead of pickled frames; each side reads and
+        writes the frames in place as NumPy views. Slot ownership is handed over through queues:
+        free -> decoder -> analytics -> renderer -> free.
+        Args:
+            num_slots (int): Number of frame buffers (bounds the frames in flight).
+            shape (tuple): Frame shape, e.g. (height, width, 3).
+            dtype: Frame dtype.
+            name (str): Name of an existing ring to attach to (None = create a new one).
+        """
+        self.num_slots = num_slots
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.slot_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=self.slot_bytes * num_slots)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.frames = np.ndarray((num_slots,) + self.shape, dtype=self.dtype, buffer=self.shm.buf)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def spec(self):
+        """Picklable description used by other processes to attach: SharedFrameRing(**ring.spec())."""
+        return {'num_slots': self.num_slots, 'shape': self.shape, 'dtype': self.dtype.str, 'name': self.name}
+
+    def slot(self, index):
+        """Zero-copy view of a slot's frame."""
+        return self.frames[index]
+
+    def close(self):
+        """Detaches from the block; the creating process also frees it."""
+        self.frames = None
+        try:
+            self.shm.close()
+        except BufferError:
+            pass # A caller still holds a slot view; the mapping goes away with it
+        if self.owner:
+            self.shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
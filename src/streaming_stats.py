@@ -0,0 +1,142 @@
+import numpy as np
+
+# Log-spaced histogram edges shared by every accumulator, so any two can be merged.
+# 0.01 .. 10000 in 240 bins: each bin spans ~6%, which bounds the relative error of the quantiles.
+HISTOGRAM_EDGES = np.geomspace(0.01, 1e4, 241)
+QUANTILES = (0.5, 0.9, 0.99)
+
+class StreamingStats:
+    def __init__(self):
+        """
+        Fixed-memory summary of a stream of non-negative errors: count, mean and variance (Welford / Chan
+        updates, numerically stable for long runs), min / max and a log-spaced histogram for quantiles.
+        Two accumulators merge exactly (histograms add, moments combine), so per-worker or per-sequence
+        results can be combined afterwards.
+        """
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0 # Sum of squared deviations from the mean
+        self.min = np.inf
+        self.max = -np.inf
+        self.histogram = np.zeros(len(HISTOGRAM_EDGES) + 1, dtype=np.int64) # + underflow and overflow bins
+
+    def update(self, values):
+        """Adds a batch of values (one vectorized pass, merged like another accumulator)."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        if len(values) == 0:
+            return self
+        batch_mean = values.mean()
+        self._combine(len(values), batch_mean, float(((values - batch_mean) ** 2).sum()))
+        self.min = min(self.min, float(values.min()))
+        self.max = max(self.max, float(values.max()))
+        np.add.at(self.histogram, np.searchsorted(HISTOGRAM_EDGES, values, side='right'), 1)
+        return self
+
+    def _combine(self, count, mean, m2):
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta ** 2 * self.count * count / total
+        self.count = total
+
+    def merge(self, other):
+        if other.count:
+            self._combine(other.count, other.mean, other.m2)
+            self.min = min(self.min, other.min)
+            self.max = max(self.max, other.max)
+            self.histogram += other.histogram
+        return self
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    def quantile(self, q):
+        """Approximate q-quantile: linear interpolation inside the histogram bin, clipped to [min, max]."""
+        if not self.count:
+            return None
+        cumulative = np.cumsum(self.histogram)
+        rank = q * self.count
+        index = int(np.searchsorted(cumulative, rank, side='left'))
+        lower = HISTOGRAM_EDGES[index - 1] if index > 0 else self.min
+        upper = HISTOGRAM_EDGES[index] if index < len(HISTOGRAM_EDGES) else self.max
+        before = cumulative[index - 1] if index > 0 else 0
+        in_bin = self.histogram[index]
+        value = lower + (upper - lower) * ((rank - before) / in_bin if in_bin else 0.0)
+        return float(np.clip(value, self.min, self.max))
+
+    def to_dict(self):
+        """JSON-serializable form (histogram stored sparsely)."""
+        nonzero = np.flatnonzero(self.histogram)
+        return {
+            'count': self.count,
+            'mean': self.mean,
+            'm2': self.m2,
+            'min': self.min if self.count else None,
+            'max': self.max if self.count else None,
+            'histogram': {int(i): int(self.histogram[i]) for i in nonzero},
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        stats = cls()
+        stats.count, stats.mean, stats.m2 = data['count'], data['mean'], data['m2']
+        if stats.count:
+            stats.min, stats.max = data['min'], data['max']
+        for index, count in data['histogram'].items():
+            stats.histogram[int(index)] = count
+        return stats
+
+    def describe(self):
+        """Mean, standard deviation and QUANTILES as a dict (None when empty)."""
+        if not self.count:
+            return None
+        described = {'count': self.count, 'mean': self.mean, 'std': self.variance ** 0.5, 'max': self.max}
+        for q in QUANTILES:
+            described[f"p{int(q * 100)}"] = self.quantile(q)
+        return described
+
+class GroupedStats:
+    def __init__(self):
+        """StreamingStats per group key ('all', 'class=2', 'lane=3', 'speed=20-40', ...), created on first use."""
+        self.groups = {}
+
+    def group(self, key):
+        if key not in self.groups:
+            self.groups[key] = StreamingStats()
+        return self.groups[key]
+
+    def update(self, values, breakdowns=None):
+        """
+        Args:
+            values (np.ndarray): (N,) errors of the frame.
+            breakdowns (dict): {prefix: (N,) labels}, e.g. {'class': class_ids, 'lane': lane_ids}; every distinct
+                               label gets its own accumulator. Labels that are None / negative are skipped.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if len(values) == 0:
+            return
+        self.group('all').update(values)
+        for prefix, labels in (breakdowns or {}).items():
+            labels = np.asarray(labels)
+            for label in np.unique(labels):
+                if label is None or (isinstance(label, (int, np.integer)) and label < 0):
+                    continue
+                self.group(f"{prefix}={label}").update(values[labels == label])
+
+    def merge(self, other):
+        for key, stats in other.groups.items():
+            self.group(key).merge(stats)
+        return self
+
+    def to_dict(self):
+        return {key: stats.to_dict() for key, stats in self.groups.items()}
+
+    @classmethod
+    def from_dict(cls, data):
+        grouped = cls()
+        grouped.groups = {key: StreamingStats.from_dict(stats) for key, stats in data.items()}
+        return grouped
+
+    def all(self):
+        return self.groups.get('all', StreamingStats())
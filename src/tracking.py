@@ -1,20 +1,35 @@
 import supervision as sv
 from utils import config
 
+TRACKER_BACKENDS = ['supervision', 'numpy']
+
 class TrafficTracker:
-    def __init__(self):
+    def __init__(self, settings=config, backend=None):
         """
         Initialize ByteTrack tracker.
+        Args:
+            settings: Scene settings (utils.config or a config.scene_settings() copy).
+            backend (str): 'supervision' (sv.ByteTrack) or 'numpy' (src.bytetrack, same IDs, state in arrays).
+                           Defaults to settings.TRACKER_BACKEND.
         """
-        print("Initializing ByteTrack...")
-        # Note: Parameters might need streaming depending on supervision version, 
-        # but these are standard ByteTrack params.
-        self.tracker = sv.ByteTrack(
-            track_activation_threshold=config.TRACKER_THRESH,
-            lost_track_buffer=config.TRACK_BUFFER,
-            minimum_matching_threshold=config.TRACKER_MATCH_THRESH,
-            frame_rate=config.FPS
+        self.settings = settings
+        self.backend = backend or self.settings.TRACKER_BACKEND
+        if self.backend not in TRACKER_BACKENDS:
+            raise ValueError(f"Unknown tracker backend '{self.backend}' (expected one of {TRACKER_BACKENDS})")
+        print(f"Initializing ByteTrack ({self.backend})...")
+        if self.backend == 'numpy':
+            from src.bytetrack import ByteTrack
+        else:
+            ByteTrack = sv.ByteTrack
+        self.tracker = ByteTrack(
+            track_activation_threshold=self.settings.TRACKER_THRESH,
+            lost_track_buffer=self.settings.TRACK_BUFFER,
+            minimum_matching_threshold=self.settings.TRACKER_MATCH_THRESH,
+            frame_rate=self.settings.FPS
         )
+        self.events = {'started': [], 'lost': [], 'ended': []}
+        self.known_ids = set() # supervision backend: IDs in its tracked / lost lists after the last frame
+        self.lost_ids = set()
 
     def update(self, detections: sv.Detections) -> sv.Detections:
         """
@@ -24,6 +39,33 @@ class TrafficTracker:
         Returns:
             sv.Detections: Detections with assigned tracker_id.
         """
-        # supervision's update_with_detections returns the detections that are currently tracked
+        # update_with_detections returns the detections that are currently tracked
         tracked_detections = self.tracker.update_with_detections(detections)
+        if self.backend == 'numpy':
+            self.events = self.tracker.events
+        else:
+            self.events = self.diff_events()
         return tracked_detections
+
+    def diff_events(self):
+        """
+        Started / lost / ended track IDs of the last frame for sv.ByteTrack, which doesn't report them:
+        derived from its tracked and lost lists, with the same meaning as src.bytetrack's events.
+        """
+        tracked_ids = {t.external_track_id for t in self.tracker.tracked_tracks if t.external_track_id >= 0}
+        listed_lost = [t for t in self.tracker.lost_tracks if t.external_track_id >= 0]
+        lost_ids = {t.external_track_id for t in listed_lost if t.state.name == 'Lost'}
+        known_ids = tracked_ids | {t.external_track_id for t in listed_lost}
+        events = {
+            'started': sorted(tracked_ids - self.known_ids),
+            'lost': sorted(lost_ids - self.lost_ids),
+            'ended': sorted(self.known_ids - known_ids),
+        }
+        self.known_ids, self.lost_ids = known_ids, lost_ids
+        return events
+
+    def has_active_tracks(self):
+        """
+        Returns True if any track is currently being followed (lost tracks are left to expire).
+        """
+        return len(self.tracker.tracked_tracks) > 0
@@ -0,0 +1,151 @@
+import numpy as np
+
+from utils.geometry import pixels_to_world
+
+def world_jacobians(points, to_world, step=1.0):
+    """
+    (N, 2, 2) derivative of the world position with respect to the pixel position at each point (finite
+    differences). A pixel of jitter is a few centimeters near the camera and up to meters at the far end.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    base = to_world(points)
+    du = (to_world(points + (step, 0.0)) - base) / step
+    dv = (to_world(points + (0.0, step)) - base) / step
+    return np.stack([du, dv], axis=2)
+
+class WorldKalman:
+    def __init__(self, settings, initial_capacity=256):
+        """
+        Constant-velocity Kalman filter of every track's ground position, in meters. The state of all tracks is
+        kept in stacked arrays ((N, 4) [X, Y, VX, VY] and (N, 4, 4) covariances) and each frame runs one batched
+        predict / update over the tracks seen in it, instead of one filterpy KalmanFilter per track. The speed is
+        the norm of the velocity state, so it needs no window of past positions.
+        The measurement noise is the pixel jitter (KALMAN_PIXEL_STD) projected through the homography at the
+        track's position, so far-away tracks, where a pixel spans meters, are smoothed more.
+        Args:
+            settings: Scene settings (homography, noise levels). Only the values are kept, so the filter can be
+                      checkpointed with the AnomalyDetector.
+        """
+        self.homography = settings.HOMOGRAPHY_MATRIX
+        self.calibration_factor = settings.CAMERA_CALIBRATION_FACTOR
+        self.acceleration_var = settings.KALMAN_ACCELERATION_STD ** 2
+        self.pixel_var = settings.KALMAN_PIXEL_STD ** 2
+        self.initial_speed_var = (settings.KALMAN_INITIAL_SPEED_STD / 3.6) ** 2
+        self.max_speed_std = settings.KALMAN_MAX_SPEED_STD / 3.6
+        self.track_timeout = settings.TRACK_BUFFER / settings.FPS # s without a measurement before a track is dropped
+
+        self.slots = {} # {track_id: row of the state arrays}
+        self.state = np.zeros((initial_capacity, 4))
+        self.covariance = np.zeros((initial_capacity, 4, 4))
+        self.track_id = np.full(initial_capacity, -1, dtype=np.int64)
+        self.last_time = np.zeros(initial_capacity)
+        self.updates = np.zeros(initial_capacity, dtype=np.int64)
+        self.free = np.ones(initial_capacity, dtype=bool)
+
+    def to_world(self, points):
+        if self.homography is not None:
+            return pixels_to_world(points, self.homography)
+        return np.asarray(points, dtype=np.float64).reshape(-1, 2) * self.calibration_factor
+
+    def _slots_for(self, track_ids):
+        """Rows of the tracks (allocated for new ones) and a mask of the new ones."""
+        slots = np.array([self.slots.get(int(track_id), -1) for track_id in track_ids], dtype=np.int64)
+        new = slots < 0
+        if new.any():
+            available = np.flatnonzero(self.free)
+            if len(available) < new.sum():
+                self._grow(len(self.free) + new.sum())
+                available = np.flatnonzero(self.free)
+            slots[new] = available[:new.sum()]
+            self.free[slots[new]] = False
+            self.track_id[slots[new]] = np.asarray(track_ids)[new]
+            for track_id, slot in zip(np.asarray(track_ids)[new], slots[new]):
+                self.slots[int(track_id)] = int(slot)
+        return slots, new
+
+    def _grow(self, needed):
+        extra = max(needed, 2 * len(self.free)) - len(self.free)
+        self.state = np.concatenate([self.state, np.zeros((extra, 4))])
+        self.covariance = np.concatenate([self.covariance, np.zeros((extra, 4, 4))])
+        self.track_id = np.concatenate([self.track_id, np.full(extra, -1, dtype=np.int64)])
+        self.last_time = np.concatenate([self.last_time, np.zeros(extra)])
+        self.updates = np.concatenate([self.updates, np.zeros(extra, dtype=np.int64)])
+        self.free = np.concatenate([self.free, np.ones(extra, dtype=bool)])
+
+    def update(self, track_ids, feet, timestamp):
+        """
+        Args:
+            track_ids (np.ndarray): (N,) track IDs of the frame.
+            feet (np.ndarray): (N, 2) feet points (pixels).
+            timestamp (float): Frame time in seconds.
+        Returns:
+            tuple: ((N,) speeds in km/h, (N,) bool: filter has settled, i.e. speed std below KALMAN_MAX_SPEED_STD)
+        """
+        speeds = np.zeros(len(track_ids))
+        known = np.zeros(len(track_ids), dtype=bool)
+        self._expire(timestamp)
+        if len(track_ids) == 0:
+            return speeds, known
+
+        world = self.to_world(feet)
+        jacobians = world_jacobians(feet, self.to_world)
+        noise = self.pixel_var * jacobians @ jacobians.transpose(0, 2, 1)
+        valid = np.isfinite(world).all(axis=1) & np.isfinite(noise).all(axis=(1, 2))
+        slots, new = self._slots_for(np.asarray(track_ids)[valid])
+        world, noise = world[valid], noise[valid]
+
+        # New tracks start at their measurement, at rest, with a wide velocity prior
+        started = slots[new]
+        self.state[started] = 0.0
+        self.state[started, :2] = world[new]
+        self.covariance[started] = 0.0
+        self.covariance[started, :2, :2] = noise[new]
+        self.covariance[started, 2, 2] = self.covariance[started, 3, 3] = self.initial_speed_var
+
+        # Known tracks: predict over their own time step, then correct with the measurement
+        known_slots, z, r = slots[~new], world[~new], noise[~new]
+        dt = np.maximum(timestamp - self.last_time[known_slots], 0.0)
+        x, P = self.state[known_slots], self.covariance[known_slots]
+        transition = np.tile(np.eye(4), (len(dt), 1, 1))
+        transition[:, 0, 2] = transition[:, 1, 3] = dt
+        x = np.einsum('kij,kj->ki', transition, x)
+        P = transition @ P @ transition.transpose(0, 2, 1) + self.acceleration_var * white_noise_acceleration(dt)
+
+        innovation_cov = P[:, :2, :2] + r
+        gain = np.linalg.solve(innovation_cov, P[:, :2, :]).transpose(0, 2, 1) # (K, 4, 2)
+        x = x + np.einsum('kij,kj->ki', gain, z - x[:, :2])
+        P = P - gain @ innovation_cov @ gain.transpose(0, 2, 1)
+        self.state[known_slots], self.covariance[known_slots] = x, P
+
+        self.last_time[slots] = timestamp
+        self.updates[slots] += 1
+
+        velocity = self.state[slots, 2:]
+        speed_std = np.sqrt(self.covariance[slots, 2, 2] + self.covariance[slots, 3, 3])
+        speeds[valid] = np.linalg.norm(velocity, axis=1) * 3.6
+        known[valid] = (self.updates[slots] > 1) & (speed_std <= self.max_speed_std)
+        return speeds, known
+
+    def end_track(self, track_id):
+        """Frees the row of a track the tracker has ended (before the timeout would)."""
+        slot = self.slots.pop(int(track_id), None)
+        if slot is not None:
+            self.free[slot] = True
+
+    def _expire(self, timestamp):
+        """Frees the rows of tracks without a measurement for longer than the tracker keeps lost tracks."""
+        stale = np.flatnonzero(~self.free & (timestamp - self.last_time > self.track_timeout))
+        for track_id in self.track_id[stale]:
+            del self.slots[int(track_id)]
+        self.free[stale] = True
+
+def white_noise_acceleration(dt):
+    """
+    (K, 4, 4) process noise of a constant-velocity model driven by unit-variance white acceleration, for
+    per-track time steps (filterpy's Q_discrete_white_noise(dim=2) per axis).
+    """
+    q = np.zeros((len(dt), 4, 4))
+    q[:, 0, 0] = q[:, 1, 1] = dt ** 4 / 4
+    q[:, 0, 2] = q[:, 2, 0] = q[:, 1, 3] = q[:, 3, 1] = dt ** 3 / 2
+    q[:, 2, 2] = q[:, 3, 3] = dt ** 2
+    return q
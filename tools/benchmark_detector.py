@@ -0,0 +1,81 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+# Add project root to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from utils import config
+from src.detection import VehicleDetector
+from src.frame_source import open_frame_source
+from src.evaluation import compare_detections
+
+def load_frames(source_path, num_frames, stride):
+    with open_frame_source(source_path, end=num_frames * stride, stride=stride) as source:
+        return [frame for _, frame in source]
+
+def run_backend(backend, frames, warmup=5):
+    """
+    Runs a detector backend over the frames.
+    Returns:
+        tuple: (list of sv.Detections, per-frame latencies in ms)
+    """
+    detector = VehicleDetector(config.MODEL_WEIGHTS, backend=backend)
+    for frame in frames[:warmup]:
+        detector.detect(frame)
+
+    outputs, latencies = [], []
+    for frame in frames:
+        t0 = time.perf_counter()
+        outputs.append(detector.detect(frame))
+        latencies.append((time.perf_counter() - t0) * 1000)
+    return outputs, np.array(latencies)
+
+def benchmark(source_path, backends, num_frames=100, stride=5, min_agreement=0.95):
+    """
+    Parity test and latency comparison of the detector backends against the PyTorch path.
+    Returns:
+        bool: True if every backend agrees with torch at least `min_agreement` (recall and precision).
+    """
+    frames = load_frames(source_path, num_frames, stride)
+    print(f"Benchmarking on {len(frames)} frames from {source_path}")
+
+    results = {}
+    for backend in ['torch'] + [b for b in backends if b != 'torch']:
+        results[backend] = run_backend(backend, frames)
+
+    reference, _ = results['torch']
+    passed = True
+    print("\n--- DETECTOR BACKENDS ---")
+    print(f"{'Backend':<10} {'mean ms':>8} {'p50 ms':>8} {'p90 ms':>8} {'FPS':>7} {'recall':>7} {'prec.':>7} {'IoU':>6}")
+    for backend, (outputs, latencies) in results.items():
+        parity = compare_detections(reference, outputs)
+        print(f"{backend:<10} {latencies.mean():>8.1f} {np.percentile(latencies, 50):>8.1f} {np.percentile(latencies, 90):>8.1f} "
+              f"{1000 / latencies.mean():>7.1f} {parity['recall']:>7.3f} {parity['precision']:>7.3f} {parity['mean_iou']:>6.3f}")
+        if backend != 'torch' and min(parity['recall'], parity['precision']) < min_agreement:
+            print(f"❌ {backend} disagrees with torch (max confidence diff {parity['max_conf_diff']:.3f})")
+            passed = False
+
+    if passed:
+        print("✅ All backends match the PyTorch detections.")
+    return passed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parity test and latency comparison of the detector backends.")
+    parser.add_argument("--video", type=str, default=config.VIDEO_PATH, help="Input video file or image folder")
+    parser.add_argument("--backends", nargs="+", default=["onnx"], help="Backends to compare with torch (onnx, openvino)")
+    parser.add_argument("--frames", type=int, default=100, help="Number of frames to sample")
+    parser.add_argument("--stride", type=int, default=5, help="Sample every N-th frame")
+    parser.add_argument("--min-agreement", type=float, default=0.95, help="Minimum recall/precision vs torch to pass")
+    #python tools/benchmark_detector.py --video data/input_video.mp4 --backends onnx openvino
+
+    args = parser.parse_args()
+
+    ok = benchmark(args.video, args.backends, args.frames, args.stride, args.min_agreement)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,45 @@
+import argparse
+import os
+import sys
+
+from tqdm import tqdm
+
+# Add project root to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from utils import config
+from src.detection import VehicleDetector
+from src.stabilization import VideoStabilizer
+from src.detection_cache import DetectionCache
+from src.frame_source import open_frame_source
+
+def cache_detections(source, output_path, fps=None):
+    """
+    Runs stabilization + detection once over a video (or image folder) and stores the per-frame detections.
+    """
+    frames = open_frame_source(source, fps=fps)
+    detector = VehicleDetector(config.MODEL_WEIGHTS)
+    stabilizer = VideoStabilizer()
+    cache = DetectionCache(fps=fps or frames.fps)
+
+    for _, frame in tqdm(frames, total=frames.total_frames):
+        frame = stabilizer.stabilize(frame)
+        cache.append(detector.detect(frame))
+    frames.release()
+
+    cache.save(output_path)
+    print(f"✅ Cached detections for {len(cache)} frames to {output_path}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the detector once and cache per-frame detections.")
+    parser.add_argument("source", help="Input video file or folder of images")
+    parser.add_argument("output", help="Output .npz file (e.g. results/detections.npz)")
+    parser.add_argument("--fps", type=float, default=None, help="Frame rate (read from the video if omitted)")
+    #python tools/cache_detections.py data/input_video.mp4 results/detections.npz
+
+    args = parser.parse_args()
+
+    cache_detections(args.source, args.output, args.fps)
@@ -10,7 +10,7 @@ project_root = os.path.dirname(current_dir)
 if project_root not in sys.path:
     sys.path.append(project_root)
 
-def calibrate_camera(video_path):
+def calibrate_camera(video_path, bundle_path=None):
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         print(f"Error: Could not open video {video_path}")
@@ -104,6 +104,10 @@ def calibrate_camera(video_path):
                 print(f"    [{row[0]}, {row[1]}, {row[2]}],")
             print("])")
             print("-------------------------")
+
+            if bundle_path:
+                from utils.scene_bundle import update_scene_bundle
+                update_scene_bundle(bundle_path, w, h, HOMOGRAPHY_MATRIX=H)
             break
 
     cv2.destroyAllWindows()
@@ -111,6 +115,7 @@ def calibrate_camera(video_path):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Calibrate camera homography.")
     parser.add_argument("--video", type=str, default="data/input_video.mp4", help="Path to input video")
+    parser.add_argument("--bundle", type=str, default=None, help="Also write the homography into this compiled scene bundle (e.g. data/scene.bundle)")
     args = parser.parse_args()
     
-    calibrate_camera(args.video)
+    calibrate_camera(args.video, args.bundle)
@@ -0,0 +1,93 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import supervision as sv
+
+# Add project root to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from utils import config
+from src.detection_cache import load_detections
+from src.tracking import TRACKER_BACKENDS, TrafficTracker
+
+def tile_detections(frames, copies, offset=10000.0):
+    """
+    Repeats each frame's detections `copies` times, shifted far apart so the copies never overlap:
+    a dense scene (200+ objects per frame) from an ordinary detection cache.
+    """
+    if copies <= 1:
+        return frames
+    tiled = []
+    for detections in frames:
+        shifts = np.repeat(np.arange(copies) * offset, len(detections))[:, None]
+        tiled.append(sv.Detections(
+            xyxy=np.tile(detections.xyxy, (copies, 1)) + shifts,
+            confidence=np.tile(detections.confidence, copies),
+            class_id=np.tile(detections.class_id, copies),
+        ))
+    return tiled
+
+def run_backend(backend, frames, fps):
+    """
+    Tracks the cached detections with one backend.
+    Returns:
+        tuple: (per-frame tracker_id arrays, per-frame events, per-frame latencies in ms)
+    """
+    settings = config.scene_settings({'FPS': fps} if fps else None)
+    tracker = TrafficTracker(settings, backend=backend)
+    ids, events, latencies = [], [], []
+    for detections in frames:
+        t0 = time.perf_counter()
+        tracked_detections = tracker.update(detections)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        ids.append(np.asarray(tracked_detections.tracker_id))
+        events.append({kind: sorted(track_ids) for kind, track_ids in tracker.events.items()})
+    return ids, events, np.array(latencies)
+
+def compare(cache_path, copies=1):
+    """
+    Parity test and latency comparison of the tracker backends against sv.ByteTrack.
+    Returns:
+        bool: True if every backend gives the same track IDs on every frame.
+    """
+    frames, fps = load_detections(cache_path)
+    frames = tile_detections(frames, copies)
+    objects = np.mean([len(detections) for detections in frames]) if frames else 0
+    print(f"Tracking {len(frames)} frames from {cache_path} ({objects:.0f} detections per frame)")
+
+    results = {backend: run_backend(backend, frames, fps) for backend in TRACKER_BACKENDS}
+    reference_ids, reference_events, _ = results['supervision']
+
+    passed = True
+    print("\n--- TRACKER BACKENDS ---")
+    print(f"{'Backend':<12} {'mean ms':>8} {'p50 ms':>8} {'p90 ms':>8} {'ID diff':>8} {'event diff':>10}")
+    for backend, (ids, events, latencies) in results.items():
+        id_diffs = sum(not np.array_equal(a, b) for a, b in zip(reference_ids, ids))
+        event_diffs = sum(a != b for a, b in zip(reference_events, events))
+        print(f"{backend:<12} {latencies.mean():>8.2f} {np.percentile(latencies, 50):>8.2f} "
+              f"{np.percentile(latencies, 90):>8.2f} {id_diffs:>8} {event_diffs:>10}")
+        if id_diffs:
+            first = next(i for i, (a, b) in enumerate(zip(reference_ids, ids)) if not np.array_equal(a, b))
+            print(f"❌ {backend} IDs differ from sv.ByteTrack on {id_diffs} frames (first: frame {first})")
+            passed = False
+
+    if passed:
+        print("✅ All backends give the same track IDs.")
+    return passed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parity test and latency comparison of the tracker backends.")
+    parser.add_argument("cache", type=str, help="Detection cache (.npz) written by tools/cache_detections.py")
+    parser.add_argument("--copies", type=int, default=1, help="Tile each frame's detections N times (dense-scene timing)")
+    #python tools/compare_trackers.py results/detections.npz --copies 10
+
+    args = parser.parse_args()
+
+    ok = compare(args.cache, args.copies)
+    sys.exit(0 if ok else 1)
@@ -1,28 +1,29 @@
 import cv2
 import os
+import sys
 import argparse
-import glob
 from tqdm import tqdm
 
-def convert_images_to_video(input_folder, output_file, fps=25):
-    # Search for images
-    extensions = ['*.jpg', '*.jpeg', '*.png', '*.bmp']
-    images = []
-    for ext in extensions:
-        images.extend(glob.glob(os.path.join(input_folder, ext)))
-    
-    # Sort images to ensure correct order
-    images.sort()
-    
-    if not images:
+# Add project root to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.frame_source import ImageSequenceSource
+
+def convert_images_to_video(input_folder, output_file, fps=25, workers=4):
+    # Images are decoded in parallel by the source's thread pool
+    try:
+        source = ImageSequenceSource(input_folder, fps=fps, workers=workers)
+    except IOError:
         print(f"Error: No images found in {input_folder}")
         return
 
-    print(f"Found {len(images)} images in {input_folder}")
+    print(f"Found {source.total_frames} images in {input_folder}")
     
-    # Read first image to get dimensions
-    frame = cv2.imread(images[0])
-    height, width, layers = frame.shape
+    # Dimensions come from the first image
+    width, height = source.width, source.height
     
     # Define codec and create VideoWriter object
     fourcc = cv2.VideoWriter_fourcc(*'mp4v') # Be sure to use lower case
@@ -30,8 +31,7 @@ def convert_images_to_video(input_folder, output_file, fps=25):
     
     print(f"Converting to {output_file} ({width}x{height} @ {fps}fps)...")
     
-    for filename in tqdm(images):
-        img = cv2.imread(filename)
+    for _, img in tqdm(source, total=source.total_frames):
         out.write(img)
         
     out.release()
@@ -42,8 +42,9 @@ if __name__ == "__main__":
     parser.add_argument("input_folder", help="Path to the folder containing images")
     parser.add_argument("output_file", help="Path for the output video (e.g., data/video.mp4)")
     parser.add_argument("--fps", type=int, default=25, help="Frame rate (default: 25)")
+    parser.add_argument("--workers", type=int, default=4, help="Threads reading images in parallel (default: 4)")
     #python tools/convert_images_to_video.py /path/to/your/images /path/to/your/video.mp4 --fps 30
 
     args = parser.parse_args()
     
-    convert_images_to_video(args.input_folder, args.output_file, args.fps)
+    convert_images_to_video(args.input_folder, args.output_file, args.fps, args.workers)
@@ -10,7 +10,7 @@ project_root = os.path.dirname(current_dir)
 if project_root not in sys.path:
     sys.path.append(project_root)
 
-def draw_lanes(video_path):
+def draw_lanes(video_path, bundle_path=None):
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         print(f"Error: Could not open video {video_path}")
@@ -116,9 +116,15 @@ def draw_lanes(video_path):
         print(f"    {idx}: \"Lane {idx}\",")
     print("}")
 
+    if bundle_path and all_polygons:
+        from utils.scene_bundle import update_scene_bundle
+        update_scene_bundle(bundle_path, w, h, LANE_POLYGONS=all_polygons,
+                            LANE_NAMES={idx: f"Lane {idx}" for idx in all_polygons})
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Draw lanes on a video frame.")
     parser.add_argument("--video", type=str, default="data/input_video.mp4", help="Path to input video")
+    parser.add_argument("--bundle", type=str, default=None, help="Also write the lanes into this compiled scene bundle (e.g. data/scene.bundle)")
     args = parser.parse_args()
     
-    draw_lanes(args.video)
+    draw_lanes(args.video, args.bundle)
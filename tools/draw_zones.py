@@ -10,7 +10,7 @@ project_root = os.path.dirname(current_dir)
 if project_root not in sys.path:
     sys.path.append(project_root)
 
-def draw_zones(video_path):
+def draw_zones(video_path, bundle_path=None):
     cap = cv2.VideoCapture(video_path)
     if not cap.isOpened():
         print(f"Error: Could not open video {video_path}")
@@ -112,9 +112,14 @@ def draw_zones(video_path):
         print(f"    {idx}: np.array({poly_list}),")
     print("}")
 
+    if bundle_path and all_polygons:
+        from utils.scene_bundle import update_scene_bundle
+        update_scene_bundle(bundle_path, w, h, FORBIDDEN_ZONES=all_polygons)
+
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Draw forbidden zones on a video frame.")
     parser.add_argument("--video", type=str, default="data/input_video.mp4", help="Path to input video")
+    parser.add_argument("--bundle", type=str, default=None, help="Also write the zones into this compiled scene bundle (e.g. data/scene.bundle)")
     args = parser.parse_args()
     
-    draw_zones(args.video)
+    draw_zones(args.video, args.bundle)
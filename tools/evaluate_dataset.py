@@ -0,0 +1,163 @@
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+
+# Add project root to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from utils.threads import init_worker
+
+def load_sequence_overrides(config_dir, sequence):
+    """
+    Reads the config overrides for a sequence: <config_dir>/default.json, then <config_dir>/<sequence>.json.
+    """
+    overrides = {}
+    if config_dir:
+        for name in ('default', sequence):
+            path = os.path.join(config_dir, f"{name}.json")
+            if os.path.exists(path):
+                with open(path) as f:
+                    overrides.update(json.load(f))
+    return overrides
+
+def write_json_atomic(path, data):
+    """Writes JSON to a temporary file and renames it, so an interrupted run never leaves a partial result."""
+    tmp_path = path + ".tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=4)
+    os.replace(tmp_path, path)
+
+def evaluate_sequence(sequence, image_dir, xml_path, overrides, fps, result_path):
+    """
+    Processes one DETRAC sequence end to end in a worker process and stores its Evaluator summary.
+    """
+    from utils import config
+    from src.pipeline import TrafficPipeline
+    from src.frame_source import ImageSequenceSource
+
+    # A copy of the settings, not the module: pool workers are reused, so the overrides of one sequence
+    # must not leak into the next sequence the worker picks up
+    settings = config.scene_settings(overrides)
+    settings.FPS = fps
+
+    pipeline = TrafficPipeline(xml_path, settings=settings)
+
+    with ImageSequenceSource(image_dir, fps=fps) as source:
+        for frame_idx, frame in source:
+            pipeline.process_frame(frame, frame_idx, source.timestamp)
+
+    summary = pipeline.evaluator.summary()
+    summary['SEQUENCE'] = sequence
+    summary['OVERRIDES'] = sorted(overrides)
+    write_json_atomic(result_path, summary)
+    return summary
+
+def print_report(per_sequence, aggregated):
+    from src.evaluation import print_error_stats
+    from src.streaming_stats import GroupedStats
+
+    print("\n--- DATASET EVALUATION REPORT ---")
+    print(f"{'Sequence':<12} {'Frames':>7} {'MOTA':>8} {'MOTP':>6} {'IDF1':>8} {'IDSW':>6} {'FP':>7} {'FN':>7}")
+    for summary in per_sequence:
+        print(f"{summary['SEQUENCE']:<12} {summary['FRAMES']:>7} {summary['MOTA']*100:>7.2f}% {summary['MOTP']:>6.3f} "
+              f"{summary['IDF1']*100:>7.2f}% {summary['ID_SWITCHES']:>6} {summary['FALSE_POSITIVES']:>7} {summary['MISSES']:>7}")
+    print("-" * 68)
+    print(f"{'TOTAL':<12} {aggregated['FRAMES']:>7} {aggregated['MOTA']*100:>7.2f}% {aggregated['MOTP']:>6.3f} "
+          f"{aggregated['IDF1']*100:>7.2f}% {aggregated['ID_SWITCHES']:>6} {aggregated['FALSE_POSITIVES']:>7} {aggregated['MISSES']:>7}")
+    if aggregated['MEAN_CENTROID_ERROR'] is not None:
+        print(f"Mean Centroid Position Error: {aggregated['MEAN_CENTROID_ERROR']:.2f} pixels")
+    if aggregated['MEAN_SPEED_ERROR'] is not None:
+        print(f"Mean Absolute Speed Error: {aggregated['MEAN_SPEED_ERROR']:.2f} km/h")
+    for key, title, unit in (('CENTROID_ERROR_STATS', "Centroid Position Error", "pixels"),
+                             ('SPEED_ERROR_STATS', "Absolute Speed Error", "km/h")):
+        if aggregated[key]:
+            print_error_stats(title, unit, GroupedStats.from_dict(aggregated[key]))
+
+def evaluate_dataset(images_root, annotations_dir, output_dir, workers=2, threads_per_worker=1,
+                     config_dir=None, sequences=None, fps=25):
+    """
+    Evaluates every sequence of a UA-DETRAC split in a process pool and aggregates the metrics.
+    Finished sequences are stored in <output_dir>/sequences/ and skipped when the run is resumed.
+    """
+    from src.evaluation import aggregate_summaries
+
+    sequence_dir = os.path.join(output_dir, 'sequences')
+    os.makedirs(sequence_dir, exist_ok=True)
+
+    # Sequences that have both images and annotations
+    available = sorted(
+        name for name in os.listdir(images_root)
+        if os.path.isdir(os.path.join(images_root, name)) and os.path.exists(os.path.join(annotations_dir, f"{name}.xml"))
+    )
+    if sequences:
+        available = [name for name in available if name in sequences]
+    if not available:
+        print(f"Error: No annotated sequences found in {images_root}")
+        return None
+
+    results = {}
+    pending = []
+    for name in available:
+        result_path = os.path.join(sequence_dir, f"{name}.json")
+        if os.path.exists(result_path):
+            with open(result_path) as f:
+                results[name] = json.load(f)
+        else:
+            pending.append(name)
+
+    print(f"Found {len(available)} sequences ({len(results)} already evaluated, {len(pending)} pending).")
+
+    if pending:
+        context = multiprocessing.get_context('spawn')
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                 initializer=init_worker, initargs=(workers, threads_per_worker)) as pool:
+            futures = {
+                pool.submit(
+                    evaluate_sequence, name,
+                    os.path.join(images_root, name),
+                    os.path.join(annotations_dir, f"{name}.xml"),
+                    load_sequence_overrides(config_dir, name),
+                    fps,
+                    os.path.join(sequence_dir, f"{name}.json"),
+                ): name
+                for name in pending
+            }
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    results[name] = future.result()
+                    print(f"✅ {name} done ({len(results)}/{len(available)})")
+                except Exception as e:
+                    # Leave it pending so a rerun retries it
+                    print(f"❌ {name} failed: {e}")
+
+    per_sequence = [results[name] for name in available if name in results]
+    aggregated = aggregate_summaries(per_sequence)
+    report = {'aggregated': aggregated, 'sequences': per_sequence, 'missing': [n for n in available if n not in results]}
+    write_json_atomic(os.path.join(output_dir, 'report.json'), report)
+
+    print_report(per_sequence, aggregated)
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evaluate the pipeline over all UA-DETRAC sequences in parallel.")
+    parser.add_argument("images_root", help="DETRAC-Images directory (one MVI_* folder per sequence)")
+    parser.add_argument("annotations_dir", help="Directory with the MVI_*.xml annotation files")
+    parser.add_argument("--output", default=os.path.join("results", "dataset_eval"), help="Output directory (reused to resume)")
+    parser.add_argument("--workers", type=int, default=2, help="Number of worker processes")
+    parser.add_argument("--threads-per-worker", type=int, default=1, help="CPU threads each worker may use")
+    parser.add_argument("--config-dir", default=None, help="Directory with default.json / <sequence>.json config overrides")
+    parser.add_argument("--sequences", nargs="*", default=None, help="Only evaluate these sequences")
+    parser.add_argument("--fps", type=float, default=25, help="Frame rate of the image sequences (default: 25)")
+    #python tools/evaluate_dataset.py ./data/ua-detrac-orig/DETRAC-Images/DETRAC-Images ./data/ua-detrac-orig/DETRAC-Train-Annotations-XML/DETRAC-Train-Annotations-XML --workers 4
+
+    args = parser.parse_args()
+
+    evaluate_dataset(args.images_root, args.annotations_dir, args.output, args.workers, args.threads_per_worker,
+                     args.config_dir, args.sequences, args.fps)
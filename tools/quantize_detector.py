@@ -0,0 +1,206 @@
+import argparse
+import json
+import os
+import sys
+import time
+
+# Add project root to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from utils import config
+from src.frame_source import open_frame_source
+from src.inference_backends import export_model, quantized_model_path, letterbox
+from src.evaluation import compare_detections
+
+# Post-processing ops of the YOLOv8 Detect head (DFL decoding, box / class concat) are kept in float:
+# quantizing them costs most of the accuracy for little speed.
+HEAD_PREFIX = '/model.22/'
+HEAD_FLOAT_OPS = {'Concat', 'Split', 'Sigmoid', 'Softmax', 'Mul', 'Add', 'Sub', 'Div', 'Reshape', 'Transpose'}
+
+def total_frames(source_path):
+    with open_frame_source(source_path) as probe:
+        return probe.total_frames if probe.total_frames is not None else probe.count_frames()
+
+def sample_frames(source_path, num_frames, start=0, end=None):
+    """
+    Yields num_frames frames sampled evenly over the frames [start, end) of the input (video file or image folder).
+    Frames are read as they are consumed, so the sample is never held in memory.
+    """
+    end = total_frames(source_path) if end is None else end
+    stride = max(1, (end - start) // max(1, num_frames))
+    with open_frame_source(source_path, start=start, end=end, stride=stride) as source:
+        for count, (_, frame) in enumerate(source):
+            if count == num_frames:
+                break
+            yield frame
+
+class FrameCalibrationReader:
+    def __init__(self, frames, input_name, input_size):
+        """
+        Feeds letterboxed frames to the ONNX Runtime static quantization calibrator, one blob per get_next() call.
+        """
+        self.frames = iter(frames)
+        self.input_name = input_name
+        self.input_size = input_size
+
+    def get_next(self):
+        frame = next(self.frames, None)
+        return None if frame is None else {self.input_name: letterbox(frame, self.input_size)[0]}
+
+    def rewind(self):
+        pass
+
+def quantize(float_path, int8_path, frames, num_frames):
+    """
+    Post-training static INT8 quantization (QDQ, per-channel weights) calibrated on the sampled frames.
+    """
+    import onnx
+    import onnxruntime as ort
+    from onnxruntime.quantization import quantize_static, QuantFormat, QuantType, CalibrationMethod
+
+    session = ort.InferenceSession(float_path, providers=['CPUExecutionProvider'])
+    model_input = session.get_inputs()[0]
+    input_size = tuple(model_input.shape[2:4])
+
+    graph = onnx.load(float_path).graph
+    excluded = [node.name for node in graph.node if node.name.startswith(HEAD_PREFIX) and node.op_type in HEAD_FLOAT_OPS]
+
+    print(f"Quantizing {float_path} -> {int8_path} with {num_frames} calibration frames "
+          f"({len(excluded)} head nodes kept in float)...")
+    quantize_static(
+        float_path, int8_path,
+        FrameCalibrationReader(frames, model_input.name, input_size),
+        quant_format=QuantFormat.QDQ,
+        per_channel=True,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        calibrate_method=CalibrationMethod.MinMax,
+        nodes_to_exclude=excluded,
+    )
+
+def run_detectors(detectors, frames):
+    """
+    Runs the detectors side by side over frames, so each frame is read once.
+    Returns:
+        tuple: (per detector: list of detections, per detector: mean latency in ms)
+    """
+    outputs = [[] for _ in detectors]
+    seconds = [0.0] * len(detectors)
+    for count, frame in enumerate(frames):
+        for i, detector in enumerate(detectors):
+            if count == 0:
+                detector.detect(frame) # warm-up
+            start = time.perf_counter()
+            outputs[i].append(detector.detect(frame))
+            seconds[i] += time.perf_counter() - start
+    frames_run = max(1, len(outputs[0]))
+    return outputs, [total * 1000 / frames_run for total in seconds]
+
+def evaluate_against_ground_truth(detector, source_path, ground_truth_path, start, num_frames):
+    """Runs the full pipeline with a detector on num_frames frames from start and returns the Evaluator summary."""
+    from src.pipeline import TrafficPipeline
+    from src.evaluation import aggregate_summaries
+
+    with open_frame_source(source_path, start=start, end=start + num_frames) as source:
+        config.FPS = source.fps
+        pipeline = TrafficPipeline(ground_truth_path, detector=detector)
+        for frame_idx, frame in source:
+            pipeline.process_frame(frame, frame_idx)
+    return aggregate_summaries([pipeline.evaluator.summary()])
+
+def quantize_detector(source_path, calibration_frames=200, eval_frames=200, ground_truth_path=None,
+                      gt_frames=500, min_recall=0.95, max_mota_drop=0.02, eval_source_path=None, calibration_split=0.5):
+    """
+    Calibrates and quantizes the detector, then writes an accuracy / latency report next to the model.
+    The accuracy is measured on frames the calibration never saw: the separate eval_source_path if given,
+    otherwise the part of source_path after calibration_split (calibration samples the part before it).
+    Neighbouring frames are nearly identical, so a held-out set interleaved with the calibration frames
+    would make the accuracy loss look smaller than it is.
+    """
+    from src.detection import VehicleDetector
+
+    float_path = export_model(config.MODEL_WEIGHTS, 'onnx')
+    int8_path = quantized_model_path(config.MODEL_WEIGHTS)
+
+    total = total_frames(source_path)
+    if eval_source_path:
+        calibration_end, eval_start, eval_end = total, 0, total_frames(eval_source_path)
+    else:
+        eval_source_path = source_path
+        calibration_end = eval_start = int(total * calibration_split)
+        eval_end = total
+    quantize(float_path, int8_path, sample_frames(source_path, calibration_frames, end=calibration_end), calibration_frames)
+
+    # Accuracy vs the float model on the held-out frames
+    float_detector = VehicleDetector(config.MODEL_WEIGHTS, backend='onnx')
+    int8_detector = VehicleDetector(config.MODEL_WEIGHTS, backend='onnx-int8')
+    evaluation = sample_frames(eval_source_path, eval_frames, start=eval_start, end=eval_end)
+    (float_outputs, int8_outputs), (float_ms, int8_ms) = run_detectors([float_detector, int8_detector], evaluation)
+    agreement = compare_detections(float_outputs, int8_outputs)
+
+    report = {
+        'float_model': float_path,
+        'int8_model': int8_path,
+        'calibration_source': source_path,
+        'calibration_range': [0, calibration_end],
+        'evaluation_source': eval_source_path,
+        'evaluation_range': [eval_start, eval_end],
+        'evaluation_frames': len(float_outputs),
+        'recall_vs_float': agreement['recall'],
+        'precision_vs_float': agreement['precision'],
+        'mean_iou_vs_float': agreement['mean_iou'],
+        'float_latency_ms': float_ms,
+        'int8_latency_ms': int8_ms,
+        'speedup': float_ms / int8_ms if int8_ms else None,
+    }
+    acceptable = agreement['recall'] >= min_recall
+
+    # Accuracy vs UA-DETRAC ground truth through the Evaluator, on the held-out frames as well
+    if ground_truth_path:
+        gt_frames = min(gt_frames, eval_end - eval_start)
+        float_gt = evaluate_against_ground_truth(float_detector, eval_source_path, ground_truth_path, eval_start, gt_frames)
+        int8_gt = evaluate_against_ground_truth(int8_detector, eval_source_path, ground_truth_path, eval_start, gt_frames)
+        for name, summary in (('float', float_gt), ('int8', int8_gt)):
+            report[f'{name}_gt'] = {
+                'MOTA': summary['MOTA'], 'MOTP': summary['MOTP'], 'IDF1': summary['IDF1'],
+                'RECALL': summary['NUM_MATCHES'] / summary['NUM_GT'] if summary['NUM_GT'] else None,
+            }
+        report['mota_drop'] = float_gt['MOTA'] - int8_gt['MOTA']
+        acceptable = acceptable and report['mota_drop'] <= max_mota_drop
+
+    report['acceptable'] = bool(acceptable)
+    report_path = os.path.splitext(int8_path)[0] + '.report.json'
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=4)
+
+    print("\n--- INT8 QUANTIZATION REPORT ---")
+    print(f"Latency: float {float_ms:.1f} ms -> int8 {int8_ms:.1f} ms (x{report['speedup']:.2f})")
+    print(f"Recall vs float: {agreement['recall']*100:.2f}% | Precision vs float: {agreement['precision']*100:.2f}%")
+    if ground_truth_path:
+        print(f"MOTA vs GT: float {report['float_gt']['MOTA']*100:.2f}% -> int8 {report['int8_gt']['MOTA']*100:.2f}%")
+    print(f"{'✅' if acceptable else '❌'} Accuracy loss {'acceptable' if acceptable else 'NOT acceptable'} "
+          f"(min recall {min_recall}, max MOTA drop {max_mota_drop}). Report: {report_path}")
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quantize the detector to INT8 and report accuracy / latency.")
+    parser.add_argument("--video", type=str, default=config.VIDEO_PATH, help="Video file or image folder to sample frames from")
+    parser.add_argument("--calibration-frames", type=int, default=200, help="Frames used for calibration")
+    parser.add_argument("--eval-frames", type=int, default=200, help="Frames used to compare with the float model")
+    parser.add_argument("--eval-video", type=str, default=None,
+                        help="Separate sequence for the accuracy check (default: the part of --video after --calibration-split)")
+    parser.add_argument("--calibration-split", type=float, default=0.5,
+                        help="Fraction of --video used for calibration; the rest is held out for the accuracy check")
+    parser.add_argument("--ground-truth", type=str, default=None, help="UA-DETRAC XML matching the evaluated sequence (optional)")
+    parser.add_argument("--gt-frames", type=int, default=500, help="Frames evaluated against the ground truth")
+    parser.add_argument("--min-recall", type=float, default=0.95, help="Minimum recall vs float to accept the model")
+    parser.add_argument("--max-mota-drop", type=float, default=0.02, help="Maximum MOTA drop vs float to accept the model")
+    #python tools/quantize_detector.py --video ./data/ua-detrac-orig/DETRAC-Images/DETRAC-Images/MVI_40171 --ground-truth <MVI_40171.xml>
+
+    args = parser.parse_args()
+
+    quantize_detector(args.video, args.calibration_frames, args.eval_frames, args.ground_truth,
+                      args.gt_frames, args.min_recall, args.max_mota_drop, args.eval_video, args.calibration_split)
@@ -0,0 +1,108 @@
+import argparse
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import cv2
+
+# Add project root to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from src.frame_source import open_frame_source
+
+BOUNDARY = "frame"
+
+class FrameBroadcaster:
+    def __init__(self, source_path, fps=None, loop=True, quality=85):
+        """
+        Plays a video file / image folder at its real frame rate and keeps the latest JPEG,
+        like a camera would: slow clients miss frames instead of slowing the stream down.
+        """
+        self.source_path = source_path
+        self.fps = fps
+        self.loop = loop
+        self.quality = quality
+        self.latest = None
+        self.sequence = 0
+        self.condition = threading.Condition()
+        self.finished = False
+
+    def run(self):
+        while True:
+            with open_frame_source(self.source_path, fps=self.fps) as source:
+                interval = 1.0 / (self.fps or source.fps or 25)
+                next_time = time.monotonic()
+                for _, frame in source:
+                    ok, jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, self.quality])
+                    if ok:
+                        with self.condition:
+                            self.latest = jpeg.tobytes()
+                            self.sequence += 1
+                            self.condition.notify_all()
+                    next_time += interval
+                    time.sleep(max(0.0, next_time - time.monotonic()))
+            if not self.loop:
+                break
+        with self.condition:
+            self.finished = True
+            self.condition.notify_all()
+
+    def frames(self):
+        """Yields each new JPEG once (blocking until it's produced)."""
+        seen = 0
+        while True:
+            with self.condition:
+                while self.sequence == seen and not self.finished:
+                    self.condition.wait()
+                if self.sequence == seen:
+                    return
+                seen = self.sequence
+                jpeg = self.latest
+            yield jpeg
+
+def make_handler(broadcaster):
+    class MJPEGHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            self.send_response(200)
+            self.send_header('Content-Type', f'multipart/x-mixed-replace; boundary={BOUNDARY}')
+            self.end_headers()
+            try:
+                for jpeg in broadcaster.frames():
+                    self.wfile.write(f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg)}\r\n\r\n".encode())
+                    self.wfile.write(jpeg)
+                    self.wfile.write(b"\r\n")
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def log_message(self, format, *args):
+            pass
+    return MJPEGHandler
+
+def serve(source_path, port=8090, fps=None, loop=True):
+    broadcaster = FrameBroadcaster(source_path, fps, loop)
+    threading.Thread(target=broadcaster.run, daemon=True).start()
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(broadcaster))
+    print(f"Streaming {source_path} as MJPEG on http://127.0.0.1:{port}/stream.mjpg (Ctrl+C to stop)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for a live camera: serves a video as an MJPEG HTTP stream.")
+    parser.add_argument("source", help="Video file or image folder to stream")
+    parser.add_argument("--port", type=int, default=8090, help="HTTP port (default: 8090)")
+    parser.add_argument("--fps", type=float, default=None, help="Playback frame rate (default: source FPS)")
+    parser.add_argument("--no-loop", action="store_true", help="Stop at the end of the source instead of looping")
+    #python tools/stream_server.py data/input_video.mp4 --port 8090
+    #python src/main.py --video http://127.0.0.1:8090/stream.mjpg
+
+    args = parser.parse_args()
+
+    serve(args.source, args.port, args.fps, not args.no_loop)
@@ -0,0 +1,157 @@
+import argparse
+import csv
+import itertools
+import json
+import os
+import random
+import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import multiprocessing
+
+# Add project root to path
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.dirname(current_dir)
+if project_root not in sys.path:
+    sys.path.append(project_root)
+
+from utils.threads import init_worker
+
+REPORT_METRICS = ['MOTA', 'MOTP', 'IDF1', 'ID_SWITCHES', 'FALSE_POSITIVES', 'MISSES', 'MEAN_SPEED_ERROR', 'TRACKS', 'TOTAL_ANOMALIES']
+
+# Per-worker state, filled once by init_sweep_worker
+_worker = {}
+
+def expand_spec(spec):
+    """
+    Turns a sweep spec into a list of candidate overrides.
+    Grid:   {"TRACKER_THRESH": [0.2, 0.3], "TRACK_BUFFER": [30, 60]}  (or {"mode": "grid", "params": {...}})
+    Random: {"mode": "random", "samples": 50, "seed": 0,
+             "params": {"TRACKER_THRESH": {"min": 0.1, "max": 0.5}, "TRACK_BUFFER": [30, 60, 90]}}
+    """
+    mode = spec.get('mode', 'grid')
+    params = spec.get('params', spec if 'mode' not in spec else {})
+
+    if mode == 'grid':
+        names = list(params)
+        return [dict(zip(names, values)) for values in itertools.product(*(params[n] for n in names))]
+
+    if mode == 'random':
+        rng = random.Random(spec.get('seed', 0))
+        candidates = []
+        for _ in range(spec.get('samples', 20)):
+            candidate = {}
+            for name, domain in params.items():
+                if isinstance(domain, dict):
+                    low, high = domain['min'], domain['max']
+                    if isinstance(low, int) and isinstance(high, int):
+                        candidate[name] = rng.randint(low, high)
+                    else:
+                        candidate[name] = rng.uniform(low, high)
+                else:
+                    candidate[name] = rng.choice(domain)
+            candidates.append(candidate)
+        return candidates
+
+    raise ValueError(f"Unknown sweep mode: {mode}")
+
+def init_sweep_worker(workers, threads_per_worker, detections_path, ground_truth_path, swept_names):
+    """Loads the cached detections once per worker and remembers the default settings."""
+    init_worker(workers, threads_per_worker)
+
+    from utils import config
+    from src.detection_cache import load_detections
+
+    frames, fps = load_detections(detections_path)
+    _worker['frames'] = frames
+    _worker['fps'] = fps or config.FPS
+    _worker['ground_truth_path'] = ground_truth_path
+    _worker['defaults'] = {name: getattr(config, name) for name in swept_names}
+
+def evaluate_candidate(overrides):
+    """
+    Runs tracking, lane assignment, anomaly detection and evaluation on the cached detections.
+    """
+    from utils import config
+    from src.evaluation import aggregate_summaries
+    from src.pipeline import TrafficPipeline
+
+    # Workers are reused, so restore the defaults before applying this candidate
+    config.apply_overrides(_worker['defaults'])
+    config.apply_overrides(overrides)
+    config.FPS = _worker['fps']
+
+    pipeline = TrafficPipeline(_worker['ground_truth_path'], load_detector=False)
+    for frame_idx, detections in enumerate(_worker['frames']):
+        pipeline.process_detections(detections, frame_idx)
+
+    # Recompute derived means from the raw sums
+    metrics = aggregate_summaries([pipeline.evaluator.summary()])
+    metrics['TOTAL_ANOMALIES'] = sum(metrics['ANOMALIES'].values())
+    return metrics
+
+def sweep(detections_path, spec, ground_truth_path=None, workers=2, threads_per_worker=1,
+          metric='MOTA', ascending=False, output_path=None):
+    """
+    Evaluates every candidate of the spec in parallel and writes a ranked table.
+    """
+    candidates = expand_spec(spec)
+    swept_names = sorted({name for candidate in candidates for name in candidate})
+    print(f"Evaluating {len(candidates)} candidates on {workers} workers...")
+
+    rows = []
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=init_sweep_worker,
+                             initargs=(workers, threads_per_worker, detections_path, ground_truth_path, swept_names)) as pool:
+        futures = {pool.submit(evaluate_candidate, candidate): candidate for candidate in candidates}
+        for future in as_completed(futures):
+            candidate = futures[future]
+            try:
+                metrics = future.result()
+            except Exception as e:
+                print(f"❌ Candidate {candidate} failed: {e}")
+                continue
+            row = {name: candidate.get(name) for name in swept_names}
+            row.update({name: metrics.get(name) for name in REPORT_METRICS})
+            rows.append(row)
+            print(f"  {len(rows)}/{len(candidates)} {metric}={metrics.get(metric)}")
+
+    # Missing values (e.g. no speed matches) always rank last
+    rows.sort(key=lambda r: (r[metric] is None, r[metric] if ascending else -(r[metric] or 0)))
+    for rank, row in enumerate(rows, start=1):
+        row['rank'] = rank
+
+    columns = ['rank'] + REPORT_METRICS + swept_names
+    if output_path:
+        os.makedirs(os.path.dirname(output_path) or '.', exist_ok=True)
+        with open(output_path, 'w', newline='') as f:
+            writer = csv.DictWriter(f, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(rows)
+        print(f"💾 Ranked results saved to {output_path}")
+
+    print(f"\n--- TOP CANDIDATES (by {metric}) ---")
+    for row in rows[:10]:
+        settings = ", ".join(f"{name}={row[name]}" for name in swept_names)
+        value = row[metric]
+        print(f"#{row['rank']:<3} {metric}={value if value is None else round(value, 4)} | {settings}")
+    return rows
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Parallel parameter sweep over cached detections.")
+    parser.add_argument("detections", help="Cached detections (.npz from tools/cache_detections.py)")
+    parser.add_argument("spec", help="JSON file with the parameter grid or random search spec")
+    parser.add_argument("--ground-truth", default=None, help="UA-DETRAC XML (defaults to config.GROUND_TRUTH_PATH)")
+    parser.add_argument("--workers", type=int, default=2, help="Number of worker processes")
+    parser.add_argument("--threads-per-worker", type=int, default=1, help="CPU threads each worker may use")
+    parser.add_argument("--metric", default="MOTA", choices=REPORT_METRICS, help="Metric to rank by")
+    parser.add_argument("--ascending", action="store_true", help="Lower is better (e.g. MEAN_SPEED_ERROR)")
+    parser.add_argument("--output", default=os.path.join("results", "sweep_results.csv"), help="Ranked CSV output")
+    #python tools/sweep_parameters.py results/detections.npz sweep.json --workers 4
+
+    args = parser.parse_args()
+
+    with open(args.spec) as f:
+        sweep_spec = json.load(f)
+
+    sweep(args.detections, sweep_spec, args.ground_truth, args.workers, args.threads_per_worker,
+          args.metric, args.ascending, args.output)
@@ -1,5 +1,7 @@
 import numpy as np
 import os
+import copy
+import types
 
 # --- PATHS ---
 DATA_DIR = "data"
@@ -7,13 +9,56 @@ RESULTS_DIR = "results"
 VIDEO_FILENAME = "input_video.mp4" # Default filename, can be overridden
 VIDEO_PATH = os.path.join(DATA_DIR, VIDEO_FILENAME)
 OUTPUT_VIDEO_PATH = os.path.join(RESULTS_DIR, "output_video.mp4")
-TRACKING_RESULTS_PATH = os.path.join(RESULTS_DIR, "tracking_results.json")
+TRACKING_RESULTS_PATH = os.path.join(RESULTS_DIR, "tracks.jsonl") # One summary line per finished track
 ANOMALY_RESULTS_PATH = os.path.join(RESULTS_DIR, "anomaly_detection.csv")
 LANE_ACCURACY_PATH = os.path.join(RESULTS_DIR, "lane_accuracy.csv")
+CHECKPOINT_PATH = os.path.join(RESULTS_DIR, "checkpoint.pkl")
+OD_RESULTS_PATH = os.path.join(RESULTS_DIR, "od_counts.csv")
+HEATMAP_DIR = os.path.join(RESULTS_DIR, "heatmaps")
 
 # Path to the UA-DETRAC XML Ground Truth for the current video
 # Note: Adjust path if folder structure differs
 GROUND_TRUTH_PATH = os.path.join(DATA_DIR, "ua-detrac-orig", "DETRAC-Train-Annotations-XML", "DETRAC-Train-Annotations-XML", "MVI_40171.xml")
+# --- FRAME SOURCE ---
+# VIDEO_PATH may also point to a folder of images (e.g. a DETRAC sequence), read without re-encoding.
+PREFETCH_WORKERS = 4 # Threads decoding images in parallel
+PREFETCH_QUEUE_SIZE = 16 # Maximum decoded frames buffered ahead of the pipeline
+# VIDEO_PATH may also be a stream URL (rtsp://, http://...) or a device index ("0"): read as a live source
+LIVE_BUFFER_SIZE = 4 # Latest frames kept from a live stream; older ones are dropped when processing lags
+
+# --- SHARDED PROCESSING ---
+SHARD_OVERLAP_FRAMES = 75 # Frames processed by two neighbouring shards, used to stitch track IDs
+SHARD_STITCH_IOU = 0.5 # Minimum IoU for two shards' boxes of the same frame to vote for the same vehicle
+SHARD_STITCH_MIN_VOTES = 5 # Overlap frames two tracks must agree on to be stitched
+
+# --- MULTI-CAMERA ---
+MULTI_CAMERA_WORKERS = 4 # Threads running per-stream decoding, stabilization, tracking and analytics
+MULTI_CAMERA_BATCH_SIZE = 8 # Frames of different streams sent to the shared detector in one call
+
+# --- PROCESS PIPELINE ---
+SHM_RING_SLOTS = 8 # Shared-memory frame buffers between the decoder, analytics and renderer processes
+PROCESS_STAGE_THREADS = 2 # OpenCV / BLAS threads of the decoder and renderer processes
+
+# --- CHECKPOINTS ---
+CHECKPOINT_INTERVAL_FRAMES = 1000 # Save the pipeline state every N processed frames (0 = off); resume with --resume
+
+# --- OUTPUT FILES (anomaly CSV, track summaries) ---
+OUTPUT_FLUSH_SECONDS = 2.0 # The rows are written by a background thread at this interval
+OUTPUT_BUFFER_ROWS = 10000 # Rows waiting in memory before the processing loop writes them itself
+OUTPUT_ROTATE_BYTES = None # Start a new file when the current one is this large (None = never)
+OUTPUT_ROTATE_SECONDS = None # ...or this old, e.g. 86400 for daily files in continuous deployments (None = never)
+
+# --- CPU THREADS ---
+CPU_SLOTS = 1 # Processes sharing this node (e.g. one main.py per camera): the cores are split evenly between them
+CPU_SLOT = 0 # Slot of this process, 0 .. CPU_SLOTS-1 (also --cpu-slot)
+CPU_PINNING = False # Pin each process / pool worker to the cores of its slot (Linux)
+OPENCV_THREADS = None # cv2 threads for stabilization and drawing (None = the slot's cores)
+BLAS_THREADS = 1 # NumPy / BLAS threads for the analytics (small arrays: more threads only add overhead)
+
+# --- MONITORING ---
+METRICS_PORT = None # Serve live Prometheus metrics on http://METRICS_HOST:<port>/metrics during main.py runs (None = off)
+METRICS_HOST = "127.0.0.1" # Local only by default
+
 # --- CAMERA & REAL WORLD ---
 # Factor to convert pixel distance to meters.
 # This must be calibrated for the specific camera view.
@@ -27,11 +72,46 @@ CONFIDENCE_THRESHOLD = 0.3
 IOU_THRESHOLD = 0.5
 TARGET_CLASSES = [2, 3, 5, 7] # COCO classes: 2=car, 3=motorcycle, 5=bus, 7=truck (and maybe 0=person)
 PEDESTRIAN_CLASS_ID = 0
+DETECTOR_BACKEND = "torch" # "torch" (PyTorch), "onnx" (ONNX Runtime), "onnx-int8" (quantized) or "openvino" - faster on CPU-only nodes
+DETECTOR_THREADS = 4 # Intra-op threads of the detector (capped to the cores of the process's CPU slot)
+DETECTOR_INPUT_SIZE = 640 # Input size the CPU backends are exported with
+NMS_IOU_THRESHOLD = 0.7 # NMS IoU of the CPU backends (the ultralytics default used by the torch backend)
+DETECTOR_WARMUP_RUNS = 2 # Blank-frame inferences at startup, so the first real frame isn't slow (0 = off)
+DETECTION_ROI_ENABLED = True # Run inference only on the bounding box of LANE_POLYGONS + FORBIDDEN_ZONES
+DETECTION_ROI_MARGIN = 40 # Pixels added around that bounding box
+DETECTION_ROI_MATCH_RESOLUTION = True # Keep the full-frame scale for the crop (torch backend) instead of upscaling it
+
+# --- MOTION GATE ---
+# Skips inference on frames where nothing moves inside the lanes and no track is alive (night / off-peak)
+MOTION_GATE_ENABLED = False
+MOTION_GATE_SCALE = 0.25 # Downscale factor of the gray frame used for the check
+MOTION_GATE_PIXEL_THRESHOLD = 15 # Gray-level difference vs background that counts as a changed pixel
+MOTION_GATE_MIN_FRACTION = 0.002 # Fraction of lane pixels that must change to count as motion
+MOTION_GATE_LEARNING_RATE = 0.05 # Background running-average update rate
+MOTION_GATE_AUDIT_INTERVAL = 50 # Run the detector anyway on every N-th skipped frame to measure misses (0 = never)
+
+# --- LATENCY CONTROL (live streams) ---
+LATENCY_CONTROL_ENABLED = False
+LATENCY_TARGET_FPS = None # Frame rate to keep up with (None = source FPS)
+LATENCY_EWMA_ALPHA = 0.1 # Smoothing of the per-frame latency
+LATENCY_HIGH_WATERMARK = 0.95 # Degrade when latency > this fraction of the frame budget...
+LATENCY_LOW_WATERMARK = 0.6 # ...restore when below this fraction (and no backlog)
+LATENCY_MAX_BACKLOG = 8 # Frames waiting before degrading / dropping
+LATENCY_COOLDOWN_FRAMES = 30 # Frames between quality changes
+# Quality ladder, from best to cheapest
+LATENCY_QUALITY_LEVELS = [
+    {'input_size': 640, 'detect_stride': 1, 'render_stride': 1},
+    {'input_size': 640, 'detect_stride': 1, 'render_stride': 2},
+    {'input_size': 512, 'detect_stride': 1, 'render_stride': 3},
+    {'input_size': 416, 'detect_stride': 2, 'render_stride': 4},
+    {'input_size': 320, 'detect_stride': 3, 'render_stride': 6},
+]
 
 # --- TRACKING (ByteTrack) ---
 TRACKER_THRESH = 0.25 # high_thresh
 TRACKER_MATCH_THRESH = 0.8
 TRACK_BUFFER = 30 # Number of frames to keep lost tracks
+TRACKER_BACKEND = "numpy" # "numpy" (src/bytetrack.py, track state in arrays, reports track events) or "supervision" (sv.ByteTrack)
 
 # --- LANE ASSIGNMENT ---
 # Virtual lanes defined as polygons (List of [x, y] points).
@@ -63,10 +143,26 @@ LANE_NAMES = {
     10: "Lane 10",
     11: "Lane 11",
 }
+
+OD_BIN_SECONDS = 900 # Time bins of the streamed origin-destination (turning movement) counts: 15 min
+OD_TRACK_TIMEOUT_FRAMES = None # Frames without a track before it counts as ended (None = TRACK_BUFFER)
 # --- ANOMALY DETECTION ---
 SPEED_THRESHOLD = 50.0 # km/h
-SPEED_HISTORY_WINDOW = 15 # Number of frames to average speed
+SPEED_ESTIMATOR = "kalman" # "kalman": velocity of a world-space Kalman filter per track; "regression": fit over SPEED_HISTORY_WINDOW
+SPEED_HISTORY_WINDOW = 15 # Number of frames to average speed (regression) and of the motion vectors (wrong-way)
+KALMAN_PIXEL_STD = 2.0 # px of feet point jitter, projected through the homography as measurement noise
+KALMAN_ACCELERATION_STD = 3.0 # m/s^2 of unmodelled acceleration (process noise)
+KALMAN_INITIAL_SPEED_STD = 60.0 # km/h, velocity uncertainty of a new track
+KALMAN_MAX_SPEED_STD = 8.0 # km/h, speed uncertainty below which a track's speed is used for alerts
 TRAJECTORY_DEVIATION_SIGMA = 2.0 # Standard deviations for clustering outlier detection
+RELATIVE_SPEED_FACTOR = 1.3 # Speeding if faster than this factor x the lane average...
+RELATIVE_SPEED_MIN = 30.0 # ...and faster than this (km/h), so slow lanes don't flag slow cars
+WRONG_DIRECTION_COSINE = -0.86 # Cosine vs dominant lane flow below which a vehicle is wrong-way (cos 150 deg)
+WRONG_DIRECTION_MIN_SAMPLES = 20 # Motion vectors needed in a lane before wrong-way checks start
+QUEUE_STOPPED_SPEED = 5.0 # km/h below which a vehicle in a lane counts as queued
+QUEUE_VEHICLE_LENGTH = 5.0 # m added to the span of the queued vehicles (length of the last one)
+CONGESTION_QUEUE_LENGTH = 40.0 # m of queue in a lane...
+CONGESTION_MIN_SECONDS = 30.0 # ...sustained this long raises a CONGESTION anomaly for the lane
 
 # Polygons where vehicles should NOT be (e.g. sidewalks, central islands)
 # Similar format to LANE_POLYGONS
@@ -79,6 +175,19 @@ HOMOGRAPHY_MATRIX = np.array([
     [-0.001126423188883012, 0.19261836529899712, -57.915611468015136],
     [-0.0005714525377025321, 0.013517905837176747, 0.9999999999999999],
 ])
+# Compiled scene bundle (tools/draw_lanes.py / draw_zones.py / calibrate_camera.py --bundle). When set, its lanes,
+# zones and homography replace the ones above and the stages use its precomputed lookup tables.
+SCENE_BUNDLE_PATH = None
+
+# --- EVALUATION ---
+EVAL_IOU_THRESHOLD = 0.5 # Minimum IoU for a track to match a GT vehicle (CLEAR MOT / IDF1)
+EVAL_SPEED_BANDS = [0, 20, 40, 60, 80] # km/h band edges (by GT speed) of the error breakdown; the last band is open
+
+# --- HEATMAPS ---
+HEATMAP_ENABLED = True # Dwell heatmap and per-lane occupancy / density time series (main.py, multi-camera)
+HEATMAP_CELL_SIZE = 8 # Pixels per heatmap cell: the grid is the frame downscaled by this factor
+HEATMAP_INTERVAL_SECONDS = 60 # Period of the per-lane occupancy / density rows
+HEATMAP_SNAPSHOT_SECONDS = 900 # Period of the heatmap .npz / .png snapshots
 
 # --- VISUALIZATION ---
 DRAW_TRAJECTORIES = True
@@ -89,3 +198,46 @@ TEXT_THICKNESS = 2
 COLOR_PALETTE = [
     (255, 0, 0), (0, 255, 0), (0, 0, 255), (255, 255, 0), (0, 255, 255), (255, 0, 255)
 ]
+
+
+# --- OVERRIDES ---
+# Settings that hold polygons / matrices and must be rebuilt as numpy arrays when loaded from JSON
+POLYGON_SETTINGS = ['LANE_POLYGONS', 'FORBIDDEN_ZONES']
+ARRAY_SETTINGS = ['HOMOGRAPHY_MATRIX']
+
+def convert_setting(name, value):
+    """Rebuilds numpy polygons / matrices from their JSON form."""
+    if name in POLYGON_SETTINGS and value is not None:
+        return {int(k): np.array(v) for k, v in value.items()}
+    if name in ARRAY_SETTINGS and value is not None:
+        return np.array(value)
+    return value
+
+def apply_overrides(overrides):
+    """
+    Overrides module-level settings in place (e.g. from a per-sequence JSON file).
+    Args:
+        overrides (dict): {SETTING_NAME: value}. Polygon dicts may use string keys as produced by JSON.
+    """
+    module = globals()
+    for name, value in overrides.items():
+        if name not in module:
+            raise KeyError(f"Unknown config setting: {name}")
+        module[name] = convert_setting(name, value)
+
+def scene_settings(overrides=None):
+    """
+    Independent copy of the settings for one camera / scene, with overrides applied.
+    Stages given this object read it instead of the module, so several scenes can run in one process.
+    Args:
+        overrides (dict): {SETTING_NAME: value}, as for apply_overrides.
+    Returns:
+        types.SimpleNamespace: All upper-case settings.
+    """
+    module = globals()
+    settings = types.SimpleNamespace(**{name: copy.deepcopy(value) for name, value in module.items() if name.isupper()})
+    for name, value in (overrides or {}).items():
+        if name not in module:
+            raise KeyError(f"Unknown config setting: {name}")
+        setattr(settings, name, convert_setting(name, value))
+    return settings
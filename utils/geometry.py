@@ -0,0 +1,69 @@
+import lap
+import numpy as np
+
+
+def box_iou_batch(boxes_a, boxes_b):
+    """
+    Computes the pairwise IoU between two sets of boxes in one vectorized pass.
+    Args:
+        boxes_a (np.ndarray): (N, 4) boxes in [x1, y1, x2, y2] format.
+        boxes_b (np.ndarray): (M, 4) boxes in [x1, y1, x2, y2] format.
+    Returns:
+        np.ndarray: (N, M) IoU matrix.
+    """
+    boxes_a = np.asarray(boxes_a, dtype=np.float64).reshape(-1, 4)
+    boxes_b = np.asarray(boxes_b, dtype=np.float64).reshape(-1, 4)
+
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+
+    # Intersection rectangle for every (a, b) pair via broadcasting
+    top_left = np.maximum(boxes_a[:, None, :2], boxes_b[None, :, :2])
+    bottom_right = np.minimum(boxes_a[:, None, 2:], boxes_b[None, :, 2:])
+    wh = np.clip(bottom_right - top_left, 0, None)
+    intersection = wh[..., 0] * wh[..., 1]
+
+    union = area_a[:, None] + area_b[None, :] - intersection
+    return np.divide(intersection, union, out=np.zeros_like(intersection), where=union > 0)
+
+
+def box_centers(boxes):
+    """
+    Returns the (N, 2) centers of [x1, y1, x2, y2] boxes.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    return (boxes[:, :2] + boxes[:, 2:]) / 2
+
+
+def feet_points(boxes):
+    """
+    Returns the (N, 2) bottom centers of [x1, y1, x2, y2] boxes: where vehicles touch the road.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    return np.column_stack([(boxes[:, 0] + boxes[:, 2]) / 2, boxes[:, 3]])
+
+
+def pixels_to_world(points, homography):
+    """
+    Maps (N, 2) pixel points to ground-plane coordinates (meters) through a 3x3 homography.
+    """
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    projected = np.column_stack([points, np.ones(len(points))]) @ np.asarray(homography, dtype=np.float64).T
+    return projected[:, :2] / projected[:, 2:3]
+
+
+def match_boxes(boxes_a, boxes_b, iou_threshold):
+    """
+    Optimal one-to-one matching of two box sets by IoU (LAPJV).
+    Returns:
+        tuple: (indices into a, indices into b, IoU of each match), only pairs with IoU >= iou_threshold.
+    """
+    ious = box_iou_batch(boxes_a, boxes_b)
+    if ious.size == 0:
+        empty = np.zeros(0, dtype=int)
+        return empty, empty, np.zeros(0)
+    _, a_to_b, _ = lap.lapjv(1.0 - ious, extend_cost=True, cost_limit=1.0 - iou_threshold)
+    idx_a = np.nonzero(a_to_b >= 0)[0]
+    idx_b = a_to_b[idx_a]
+    valid = ious[idx_a, idx_b] >= iou_threshold
+    return idx_a[valid], idx_b[valid], ious[idx_a[valid], idx_b[valid]]
@@ -0,0 +1,230 @@
+import functools
+import json
+import os
+import struct
+
+import cv2
+import numpy as np
+
+from utils import config
+
+MAGIC = b'TRSCENE\0'
+BUNDLE_VERSION = 1
+ALIGNMENT = 64 # Array offsets are aligned so the memory maps are cache-line / SIMD friendly
+NO_LABEL = -1
+OVERLAY_ALPHA = 0.3 # Lane fill opacity, as in utils/visualization.draw_lanes
+
+# Scene settings stored in the bundle header, as JSON-friendly values
+SCENE_SETTINGS = ['LANE_POLYGONS', 'LANE_NAMES', 'FORBIDDEN_ZONES', 'HOMOGRAPHY_MATRIX']
+
+def _aligned(offset):
+    return (offset + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+def rasterize_labels(polygons, width, height):
+    """
+    Label map (H, W) int16 with the id of the polygon containing each pixel (NO_LABEL elsewhere).
+    Where polygons overlap the first one wins, like the first-match lookup of LaneAssigner.
+    """
+    labels = np.full((height, width), NO_LABEL, dtype=np.int16)
+    for label, poly in reversed(list(polygons.items())):
+        pts = np.round(np.asarray(poly)).astype(np.int32).reshape((-1, 1, 2))
+        cv2.fillPoly(labels, [pts], int(label))
+    return labels
+
+def world_coordinate_map(homography, width, height):
+    """
+    World coordinates (meters) of every pixel (H, W, 2) float32 through the homography (NaN without one).
+    """
+    if homography is None:
+        return np.full((height, width, 2), np.nan, dtype=np.float32)
+    xs, ys = np.meshgrid(np.arange(width, dtype=np.float64), np.arange(height, dtype=np.float64))
+    pixels = np.stack([xs, ys, np.ones_like(xs)], axis=-1) # (H, W, 3)
+    projected = pixels @ np.asarray(homography, dtype=np.float64).T
+    with np.errstate(divide='ignore', invalid='ignore'):
+        world = projected[..., :2] / projected[..., 2:3]
+    return world.astype(np.float32)
+
+def render_overlay(lane_polygons, lane_names, width, height):
+    """
+    Lane visualization drawn once: colors (H, W, 3) uint8 and per-pixel opacity (H, W) uint8
+    (OVERLAY_ALPHA on lane fills, opaque on borders and labels, 0 elsewhere).
+    """
+    color = np.zeros((height, width, 3), dtype=np.uint8)
+    fill = np.zeros((height, width), dtype=np.uint8)
+    lines = np.zeros((height, width), dtype=np.uint8)
+    for lane_id, poly in lane_polygons.items():
+        pts = np.asarray(poly).astype(np.int32).reshape((-1, 1, 2))
+        lane_color = config.COLOR_PALETTE[lane_id % len(config.COLOR_PALETTE)]
+        cv2.fillPoly(color, [pts], lane_color)
+        cv2.fillPoly(fill, [pts], 1)
+    for lane_id, poly in lane_polygons.items():
+        pts = np.asarray(poly).astype(np.int32).reshape((-1, 1, 2))
+        lane_color = config.COLOR_PALETTE[lane_id % len(config.COLOR_PALETTE)]
+        center = tuple(np.mean(poly, axis=0).astype(int))
+        label = lane_names.get(lane_id, f"Lane {lane_id}")
+        cv2.polylines(color, [pts], True, lane_color, 2)
+        cv2.polylines(lines, [pts], True, 1, 2)
+        cv2.putText(color, label, center, cv2.FONT_HERSHEY_SIMPLEX, 0.6, (255, 255, 255), 2)
+        cv2.putText(lines, label, center, cv2.FONT_HERSHEY_SIMPLEX, 0.6, 1, 2)
+    alpha = np.where(lines > 0, 255, np.where(fill > 0, int(round(OVERLAY_ALPHA * 255)), 0)).astype(np.uint8)
+    return color, alpha
+
+def build_artifacts(scene, width, height):
+    """All precomputed arrays of a scene at a frame size."""
+    lanes = scene['LANE_POLYGONS'] or {}
+    overlay_color, overlay_alpha = render_overlay(lanes, scene['LANE_NAMES'] or {}, width, height)
+    return {
+        'lane_map': rasterize_labels(lanes, width, height),
+        'zone_map': rasterize_labels(scene['FORBIDDEN_ZONES'] or {}, width, height),
+        'world_map': world_coordinate_map(scene['HOMOGRAPHY_MATRIX'], width, height),
+        'overlay_color': overlay_color,
+        'overlay_alpha': overlay_alpha,
+        'overlay_index': np.flatnonzero(overlay_alpha).astype(np.int64), # Pixels the overlay touches
+    }
+
+def _to_json(name, value):
+    if value is None:
+        return None
+    if name in config.POLYGON_SETTINGS:
+        return {str(k): np.asarray(v).tolist() for k, v in value.items()}
+    if name in config.ARRAY_SETTINGS:
+        return np.asarray(value).tolist()
+    return {str(k): v for k, v in value.items()}
+
+def _from_json(name, value):
+    if name == 'LANE_NAMES' and value is not None:
+        return {int(k): v for k, v in value.items()}
+    return config.convert_setting(name, value)
+
+def write_scene_bundle(path, scene, width, height):
+    """
+    Writes a scene bundle: magic, version, header length, JSON header (scene settings, frame size, array table),
+    then the precomputed arrays at aligned offsets from the start of the data section. Written to a temporary
+    file and renamed, so processes that have the old bundle mapped keep a consistent view.
+    Args:
+        scene (dict): {LANE_POLYGONS, LANE_NAMES, FORBIDDEN_ZONES, HOMOGRAPHY_MATRIX} in config format.
+        width, height (int): Frame size the lookup tables are computed for.
+    """
+    arrays = build_artifacts(scene, width, height)
+    table, offset = {}, 0
+    for name, array in arrays.items():
+        table[name] = {'dtype': array.dtype.str, 'shape': list(array.shape), 'offset': offset}
+        offset = _aligned(offset + array.nbytes)
+    header = {
+        'width': width,
+        'height': height,
+        'settings': {name: _to_json(name, scene[name]) for name in SCENE_SETTINGS},
+        'arrays': table,
+    }
+    header_bytes = json.dumps(header).encode('utf-8')
+    data_start = _aligned(len(MAGIC) + 8 + len(header_bytes))
+
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<II', BUNDLE_VERSION, len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(data_start + table[name]['offset'])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+    print(f"💾 Scene bundle written to {path} ({width}x{height}, {(data_start + offset) / 1e6:.1f} MB)")
+
+def read_scene_header(path):
+    """
+    Returns:
+        tuple: (header dict, file offset of the data section)
+    """
+    with open(path, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a scene bundle")
+        version, header_length = struct.unpack('<II', f.read(8))
+        if version != BUNDLE_VERSION:
+            raise ValueError(f"Unsupported scene bundle version {version} in {path} (expected {BUNDLE_VERSION})")
+        header = json.loads(f.read(header_length).decode('utf-8'))
+    return header, _aligned(len(MAGIC) + 8 + header_length)
+
+class SceneBundle:
+    def __init__(self, path):
+        """
+        Opens a scene bundle. The lookup tables are read-only np.memmap views: opening is instant and
+        processes mapping the same bundle share its pages through the OS page cache.
+        """
+        self.path = path
+        header, data_start = read_scene_header(path)
+        self.width = header['width']
+        self.height = header['height']
+        self.settings = {name: _from_json(name, value) for name, value in header['settings'].items()}
+        self.arrays = {
+            name: np.memmap(path, dtype=np.dtype(spec['dtype']), mode='r', offset=data_start + spec['offset'],
+                            shape=tuple(spec['shape']))
+            for name, spec in header['arrays'].items()
+        }
+        self.lane_map = self.arrays['lane_map']           # (H, W) int16 lane id, NO_LABEL outside lanes
+        self.zone_map = self.arrays['zone_map']           # (H, W) int16 forbidden zone id
+        self.world_map = self.arrays['world_map']         # (H, W, 2) float32 world coordinates (m)
+        self.overlay_color = self.arrays['overlay_color'] # (H, W, 3) uint8 lane visualization
+        self.overlay_alpha = self.arrays['overlay_alpha'] # (H, W) uint8 opacity
+        self.overlay_index = self.arrays['overlay_index'] # Flat indices of the pixels the overlay covers
+
+    def overrides(self):
+        """Scene settings to apply on top of the config (setattr / config.scene_settings)."""
+        return {name: value for name, value in self.settings.items() if value is not None}
+
+    def matches(self, width, height):
+        return (width, height) == (self.width, self.height)
+
+    def lookup(self, table, points, default=NO_LABEL):
+        """
+        Values of a per-pixel table at (N, 2) pixel points (rounded down); points outside the frame get `default`.
+        """
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        xs, ys = np.floor(points[:, 0]).astype(int), np.floor(points[:, 1]).astype(int)
+        inside = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+        values = np.full((len(points),) + table.shape[2:], default, dtype=table.dtype)
+        values[inside] = table[ys[inside], xs[inside]]
+        return values
+
+    def blend_overlay(self, frame):
+        """Draws the cached lane overlay on the frame in place (only the pixels it covers)."""
+        frame = np.ascontiguousarray(frame)
+        flat = frame.reshape(-1, 3)
+        index = self.overlay_index
+        alpha = self.overlay_alpha.reshape(-1)[index].astype(np.int32)[:, None]
+        color = self.overlay_color.reshape(-1, 3)[index]
+        flat[index] = ((flat[index] * (255 - alpha) + color * alpha + 127) // 255).astype(np.uint8)
+        return frame
+
+@functools.lru_cache(maxsize=None)
+def load_scene_bundle(path):
+    """Opens a bundle once per process; every stream / stage using it shares the same maps."""
+    return SceneBundle(path)
+
+def apply_scene_bundle(path, width, height, settings=config):
+    """
+    Takes the lanes, zones and homography of a bundle into the settings (utils.config or a scene_settings() copy)
+    and points SCENE_BUNDLE_PATH at it, so the stages use its lookup tables.
+    Raises:
+        ValueError: If the bundle was compiled for another frame size.
+    """
+    bundle = load_scene_bundle(path)
+    if not bundle.matches(width, height):
+        raise ValueError(f"Scene bundle {path} is for {bundle.width}x{bundle.height} frames, the input is {width}x{height}. "
+                         f"Recompile it with tools/draw_lanes.py --bundle.")
+    for name, value in bundle.overrides().items():
+        setattr(settings, name, value)
+    settings.SCENE_BUNDLE_PATH = path
+    return bundle
+
+def update_scene_bundle(path, width, height, **settings):
+    """
+    Replaces some scene settings in a bundle (created from the current config if missing) and recompiles it.
+    Used by tools/draw_lanes.py, tools/draw_zones.py and tools/calibrate_camera.py.
+    """
+    scene = {name: getattr(config, name) for name in SCENE_SETTINGS}
+    if os.path.exists(path):
+        header, _ = read_scene_header(path)
+        scene.update({name: _from_json(name, value) for name, value in header['settings'].items()})
+    scene.update(settings)
+    write_scene_bundle(path, scene, width, height)
@@ -0,0 +1,105 @@
+import multiprocessing
+import os
+import sys
+
+THREAD_ENV_VARS = ['OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'NUMEXPR_NUM_THREADS']
+
+applied_plan = None # Plan applied in this process (read by the detector when it loads torch)
+
+def available_cores():
+    """CPU cores this process may run on (respects container / taskset limits on Linux)."""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+def plan_threads(slots=None, slot=None, pin=None, detector_threads=None, opencv_threads=None, blas_threads=None):
+    """
+    Splits the node's cores evenly between `slots` processes (or pool workers / streams) and returns the
+    thread budget of one slot, so several of them don't oversubscribe the CPU. Unset values come from the config.
+    Args:
+        slots (int): Processes sharing the node (config.CPU_SLOTS).
+        slot (int): Slot of this process, 0 .. slots-1 (config.CPU_SLOT).
+        pin (bool): Pin the process to the slot's cores (config.CPU_PINNING).
+        detector_threads (int): Intra-op threads of the detector (config.DETECTOR_THREADS, capped to the slot).
+        opencv_threads (int): cv2 threads for stabilization / drawing (config.OPENCV_THREADS or the slot's cores).
+        blas_threads (int): NumPy / BLAS threads for the analytics (config.BLAS_THREADS).
+    Returns:
+        dict: {'slot', 'slots', 'cores', 'pinned', 'detector_threads', 'opencv_threads', 'blas_threads'}
+              (apply_thread_plan adds 'blas_limited': whether the BLAS thread limit took effect)
+    """
+    from utils import config
+
+    slots = max(1, slots or config.CPU_SLOTS)
+    slot = (config.CPU_SLOT if slot is None else slot) % slots
+    pin = config.CPU_PINNING if pin is None else pin
+
+    cores = available_cores()
+    per_slot = len(cores) // slots
+    if per_slot >= 1:
+        slot_cores = cores[slot * per_slot:(slot + 1) * per_slot]
+    else: # More slots than cores: slots share cores round-robin
+        slot_cores = [cores[slot % len(cores)]]
+
+    return {
+        'slot': slot,
+        'slots': slots,
+        'cores': slot_cores,
+        'pinned': bool(pin),
+        'detector_threads': max(1, min(detector_threads or config.DETECTOR_THREADS, len(slot_cores))),
+        'opencv_threads': max(1, opencv_threads or config.OPENCV_THREADS or len(slot_cores)),
+        'blas_threads': max(1, blas_threads or config.BLAS_THREADS),
+    }
+
+def apply_thread_plan(plan):
+    """
+    Applies a plan_threads() plan to this process: CPU affinity, BLAS / OpenMP threads, cv2 threads and the
+    detector's intra-op threads. Call it at process startup (main.py) or as a pool initializer.
+    """
+    global applied_plan
+
+    if plan['pinned'] and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, plan['cores'])
+
+    # Environment for libraries not loaded yet (and child processes); threadpoolctl for the ones already loaded
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(plan['blas_threads'])
+    try:
+        from threadpoolctl import threadpool_limits
+        threadpool_limits(limits=plan['blas_threads'], user_api='blas')
+        plan['blas_limited'] = True
+    except ImportError: # The environment only reaches a BLAS that isn't loaded yet
+        plan['blas_limited'] = 'numpy' not in sys.modules
+
+    import cv2
+    cv2.setNumThreads(plan['opencv_threads'])
+
+    from utils import config
+    config.DETECTOR_THREADS = plan['detector_threads'] # Used by the ONNX Runtime / OpenVINO backends
+    applied_plan = plan
+    if 'torch' in sys.modules: # Otherwise set by the detector when it imports torch
+        apply_torch_threads()
+    return plan
+
+def apply_torch_threads():
+    """Gives torch the detector threads of the applied plan (OMP_NUM_THREADS only holds the BLAS budget)."""
+    if applied_plan is not None:
+        import torch
+        torch.set_num_threads(applied_plan['detector_threads'])
+
+def worker_slot():
+    """0-based index of the current pool worker process (0 in the main process)."""
+    identity = multiprocessing.current_process()._identity
+    return identity[0] - 1 if identity else 0
+
+def init_worker(slots, num_threads=None, pin=None):
+    """
+    Pool initializer: applies the plan of this worker's slot, with num_threads for the detector and OpenCV.
+    """
+    apply_thread_plan(plan_threads(slots, worker_slot(), pin, num_threads, num_threads))
+
+def format_thread_plan(plan):
+    cores = plan['cores']
+    core_text = f"cores {cores[0]}-{cores[-1]}" if len(cores) > 1 else f"core {cores[0]}"
+    blas_note = " (BLAS limit not applied: BLAS already loaded and threadpoolctl missing)" if plan.get('blas_limited') is False else ""
+    return (f"slot {plan['slot'] + 1}/{plan['slots']} ({core_text}{', pinned' if plan['pinned'] else ''}) | "
+            f"detector {plan['detector_threads']} | OpenCV {plan['opencv_threads']} | BLAS {plan['blas_threads']} threads{blas_note}")
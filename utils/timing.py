@@ -0,0 +1,26 @@
+import time
+
+class StartupTimer:
+    def __init__(self, start=None):
+        """
+        Records how long each startup phase takes (imports, opening the input, loading the model, warm-up, ...).
+        Args:
+            start (float): time.perf_counter() value the first phase started at (defaults to now).
+        """
+        self.start = time.perf_counter() if start is None else start
+        self.last = self.start
+        self.phases = [] # [(name, seconds)]
+
+    def mark(self, name):
+        """Ends the current phase under `name` and starts the next one."""
+        now = time.perf_counter()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    def report(self):
+        print("\n--- STARTUP TIME ---")
+        for name, seconds in self.phases:
+            print(f"{name:<16} {seconds * 1000:9.1f} ms")
+        total = sum(seconds for _, seconds in self.phases)
+        print(f"{'Total':<16} {total * 1000:9.1f} ms")
+        return dict(self.phases, total=total)
@@ -15,12 +15,13 @@ def setup_video_writer(output_path, width, height, fps):
     fourcc = cv2.VideoWriter_fourcc(*'mp4v')
     return cv2.VideoWriter(output_path, fourcc, fps, (width, height))
 
-def draw_frame(frame, detections, lane_assignments, anomalies):
+def draw_frame(frame, detections, lane_assignments, anomalies, scene=None):
     """
     Draws bounding boxes, lanes, labels, and anomalies on the frame.
+    With a compiled scene bundle, the lanes come from its cached overlay.
     """
     # 1. Draw Lanes
-    frame = draw_lanes(frame)
+    frame = scene.blend_overlay(frame) if scene is not None else draw_lanes(frame)
 
     # 2. Draw Detections & Tracks
     if detections.tracker_id is not None:
@@ -38,9 +39,15 @@ def draw_frame(frame, detections, lane_assignments, anomalies):
         frame = label_annotator.annotate(scene=frame, detections=detections, labels=labels)
 
     # 3. Draw Anomalies
+    lane_alerts = 0
     for anomaly in anomalies:
         bbox = anomaly.get('bbox')
-        if bbox is not None:
+        if bbox is None and anomaly['type'] == 'CONGESTION':
+            # Lane-level alert: listed in the top-left corner
+            text = f"ALERT: CONGESTION {config.LANE_NAMES.get(anomaly['id'], anomaly['id'])} ({anomaly['value']} m queue)"
+            cv2.putText(frame, text, (10, 30 + 30 * lane_alerts), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
+            lane_alerts += 1
+        elif bbox is not None:
             x1, y1, x2, y2 = map(int, bbox)
             text = f"ALERT: {anomaly['type']}"
             if anomaly.get('value'):